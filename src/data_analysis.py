@@ -1,21 +1,211 @@
 import pandas as pd
 import numpy as np
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Union
 
+from data_cleaning import KvantilSkisse
+
+def _beskriv_grupper(df, nøkler):
+    """
+    Gjennomsnitt, median og standardavvik per gruppe og variabel. Ligger på modulnivå
+    slik at den kan sendes til en prosesspool.
+    """
+    verdikolonner = [kol for kol in df.columns if kol not in nøkler]
+    grupper = df.groupby(nøkler, observed=True, sort=True)[verdikolonner]
+    # hver aggregering for seg bruker pandas sine kompilerte gruppefunksjoner
+    agg = pd.concat({
+        "Gjennomsnitt": grupper.mean().stack(future_stack=True),
+        "Median": grupper.median().stack(future_stack=True),
+        "Standardavvik": grupper.std().stack(future_stack=True),
+    }, axis=1)
+    agg.index = agg.index.set_names(list(nøkler) + ["Variabel"])
+    return agg
+
+
 class DataAnalyse:
     """
     Klasse av metoder for å beregne statistiske mål og utføre analyse. 
+    Oppsummerende statistikk beregnes i én gjennomgang og caches til dataene
+    endres. Nye rader kan legges til med oppdater() uten å gå gjennom historikken igjen.
     """
 
-    def __init__(self, df):
+    def __init__(self, df, kapasitet: int = 10_000):
         """
         Initialiserer analysemodulen med en numerisk DataFrame
 
         Args:
             df: renset pandas DataFrame med numeriske miljødata.
                 det er forvented at dette er cleaned data til Trondhiem Forecast
+            kapasitet: kapasitet for kvantilskissene som brukes til median etter oppdater()
         """
+        self.kapasitet = kapasitet
         self.df = df.select_dtypes(include=[np.number])
+        # hele DataFramen beholdes for gruppering på lokasjon og tid
+        self._kilde = df
+
+    @property
+    def df(self):
+        # rader fra oppdater() slås sammen først når hele DataFramen trengs
+        if self._nye:
+            self._df = pd.concat([self._df, *self._nye])
+            self._nye = []
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self._kilde = df
+        self._nye = []
+        self._nye_kilde = []
+        self._stats = None
+        self._skisser = None
+        self._mad = None
+        self._korr = {}
+        self._fft = {}
+        self._kumulativ = {}
+
+    @property
+    def kilde(self):
+        """
+        Hele DataFramen, inkludert ikke-numeriske kolonner som Lokasjon og Tid.
+        """
+        if self._nye_kilde:
+            self._kilde = pd.concat([self._kilde, *self._nye_kilde])
+            self._nye_kilde = []
+        return self._kilde
+
+    def _tid(self):
+        """
+        Returnerer Tid som datetime-Series, fra kolonnen Tid eller en DatetimeIndex.
+
+        Raises:
+            ValueError: dersom det ikke finnes noen tid
+        """
+        kilde = self.kilde
+        if "Tid" in kilde.columns:
+            tid = kilde["Tid"]
+        elif isinstance(kilde.index, pd.DatetimeIndex):
+            tid = kilde.index.to_series()
+        else:
+            raise ValueError("krever kolonnen Tid eller en DatetimeIndex")
+        if not pd.api.types.is_datetime64_any_dtype(tid):
+            tid = pd.to_datetime(tid, format="%d.%m.%y - %H:%M")
+        return tid
+
+    def _gruppenøkler(self, by=None, tidsbøtte=None):
+        """
+        Lager grupperingsnøkler fra kolonner eller indeksnavn i kilde, og eventuelt en
+        tidsbøtte ("Tidsbøtte") fra Tid avrundet ned til frekvensen tidsbøtte.
+
+        Raises:
+            ValueError: dersom en nøkkel eller Tid ikke finnes
+        """
+        kilde = self.kilde
+        nøkler = {}
+        for navn in ([by] if isinstance(by, str) else list(by or [])):
+            if navn in kilde.columns:
+                nøkler[navn] = kilde[navn].array
+            elif navn in kilde.index.names:
+                nøkler[navn] = kilde.index.get_level_values(navn).array
+            else:
+                raise ValueError(f"kolonnen {navn} finnes ikke i df")
+        if tidsbøtte is not None:
+            nøkler["Tidsbøtte"] = self._tid().dt.floor(tidsbøtte).array
+        return {navn: pd.Index(verdier, name=navn) for navn, verdier in nøkler.items()}
+
+    @staticmethod
+    def _beregn_statistikk(df):
+        """
+        Beregner antall, gjennomsnitt, M2 (sum av kvadrerte avvik), median, min og maks
+        for alle kolonner i én gjennomgang over en float64-matrise.
+        """
+        verdier = df.to_numpy(dtype=np.float64, na_value=np.nan)
+        gyldig = ~np.isnan(verdier)
+        antall = gyldig.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            gjennomsnitt = np.nansum(verdier, axis=0) / antall
+            m2 = np.nansum((verdier - gjennomsnitt) ** 2, axis=0)
+            median = np.nanmedian(verdier, axis=0) if len(verdier) else np.full(len(df.columns), np.nan)
+            minimum = np.nanmin(verdier, axis=0) if len(verdier) else np.full(len(df.columns), np.nan)
+            maksimum = np.nanmax(verdier, axis=0) if len(verdier) else np.full(len(df.columns), np.nan)
+        return pd.DataFrame({
+            "Antall": antall,
+            "Gjennomsnitt": gjennomsnitt,
+            "M2": m2,
+            "Median": median,
+            "Min": minimum,
+            "Maks": maksimum,
+        }, index=df.columns)
+
+    def statistikk(self):
+        """
+        Returnerer cachet oppsummerende statistikk per kolonne, og beregner den 
+        i én gjennomgang dersom den mangler.
+
+        Returns:
+            pd.DataFrame: Antall, Gjennomsnitt, M2, Median, Min og Maks per kolonne
+        """
+        if self._stats is None:
+            self._stats = self._beregn_statistikk(self.df)
+        return self._stats
+
+    def _stat(self, navn):
+        serie = self.statistikk()[navn].copy()
+        serie.name = None
+        return serie
+
+    def oppdater(self, ny_df):
+        """
+        Legger til nye rader og oppdaterer statistikken inkrementelt. Gjennomsnitt og
+        varians slås sammen med Chan/Welford sin parallelle formel, og medianen
+        estimeres fra en kvantilskisse per kolonne (eksakt så lenge antallet rader er
+        innenfor kapasiteten). Kolonner som ikke fantes fra før ignoreres.
+
+        Args:
+            ny_df: DataFrame med nye rader
+
+        Returns:
+            DataAnalyse: self, slik at kall kan kjedes
+        """
+        ny = ny_df.select_dtypes(include=[np.number]).reindex(columns=self._df.columns)
+        if ny.empty:
+            return self
+        gammel = self.statistikk()
+        if self._skisser is None:
+            historikk = self.df
+            self._skisser = {kol: KvantilSkisse(self.kapasitet).oppdater(
+                historikk[kol].to_numpy(dtype=np.float64, na_value=np.nan)) for kol in historikk.columns}
+        batch = self._beregn_statistikk(ny)
+
+        n_a, n_b = gammel["Antall"], batch["Antall"]
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = batch["Gjennomsnitt"] - gammel["Gjennomsnitt"]
+            gjennomsnitt = (gammel["Gjennomsnitt"] + delta * n_b / n).where(n_b > 0, gammel["Gjennomsnitt"])
+            gjennomsnitt = gjennomsnitt.where(n_a > 0, batch["Gjennomsnitt"])
+            m2 = (gammel["M2"] + batch["M2"] + delta ** 2 * n_a * n_b / n).where((n_a > 0) & (n_b > 0),
+                                                                               gammel["M2"] + batch["M2"])
+        for kol in ny.columns:
+            self._skisser[kol].oppdater(ny[kol].to_numpy(dtype=np.float64, na_value=np.nan))
+
+        self._stats = pd.DataFrame({
+            "Antall": n,
+            "Gjennomsnitt": gjennomsnitt,
+            "M2": m2,
+            "Median": [self._skisser[kol].median() for kol in ny.columns],
+            "Min": np.fmin(gammel["Min"], batch["Min"]),
+            "Maks": np.fmax(gammel["Maks"], batch["Maks"]),
+        }, index=ny.columns)
+        self._nye.append(ny)
+        self._nye_kilde.append(ny_df)
+        self._mad = None
+        self._korr = {}
+        self._fft = {}
+        self._kumulativ = {}
+        return self
     
     def beregn_gjennomsnitt(self):
         """
@@ -24,7 +214,7 @@ class DataAnalyse:
         Returnes:
             pd.Series: gjennomsnittsverider per variabel
         """
-        return self.df.mean()
+        return self._stat("Gjennomsnitt")
     
     def beregn_median(self):
         """
@@ -33,7 +223,7 @@ class DataAnalyse:
         Returns:
             pd.Series: Medianverdier per varaibel
         """
-        return self.df.median()
+        return self._stat("Median")
 
     def beregn_standardavvik(self):
         """
@@ -42,22 +232,104 @@ class DataAnalyse:
         Returns:
             pd.Series: Standardavvik per variabel
         """
-        return self.df.std()
+        stats = self.statistikk()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(stats["M2"] / (stats["Antall"] - 1))
+        std[stats["Antall"] < 2] = np.nan
+        std.name = None
+        return std
 
-    def beskriv_data(self):
-        return pd.DataFrame({
-            "Gjennomsnitt": self.beregn_gjennomsnitt(),
-            "Median": self.beregn_median(),
-            "Standardavvik": self.beregn_standardavvik()
-        })
+    def beskriv_data(self, by=None, tidsbøtte=None, arbeidere=None):
+        """
+        Oppsummerer gjennomsnitt, median og standardavvik, enten for hele datasettet
+        eller per gruppe (f.eks. per lokasjon og dag).
+
+        Args:
+            by: kolonne eller liste med kolonner å gruppere på, f.eks. "Lokasjon"
+            tidsbøtte: pandas-frekvens for tidsbøtter, f.eks. "D" for dag eller "h" for time
+            arbeidere: antall prosesser. Gruppene fordeles på en prosesspool når det er
+                flere grupper enn arbeidere. Lønner seg bare for store datasett
+
+        Returns:
+            pd.DataFrame: én rad per variabel, eller per (gruppe..., Variabel) ved gruppering
+        """
+        if by is None and tidsbøtte is None:
+            return pd.DataFrame({
+                "Gjennomsnitt": self.beregn_gjennomsnitt(),
+                "Median": self.beregn_median(),
+                "Standardavvik": self.beregn_standardavvik()
+            })
 
-    def korrelasjon(self, kol1, kol2):
+        nøkler = self._gruppenøkler(by, tidsbøtte)
+        df = self.df.reset_index(drop=True).assign(**{navn: verdier for navn, verdier in nøkler.items()})
+        navn = list(nøkler)
+        koder = df.groupby(navn, observed=True, sort=False).ngroup().to_numpy()
+        antall_grupper = koder.max() + 1 if len(koder) else 0
+        if not arbeidere or arbeidere < 2 or antall_grupper <= arbeidere:
+            return _beskriv_grupper(df, navn)
+
+        # hver gruppe havner i nøyaktig én del, så delresultatene kan bare slås sammen
+        deler = [df[koder % arbeidere == i] for i in range(arbeidere)]
+        with ProcessPoolExecutor(max_workers=arbeidere) as pool:
+            resultater = list(pool.map(_beskriv_grupper, deler, repeat(navn)))
+        return pd.concat(resultater).sort_index()
+
+    @staticmethod
+    def _parvis_korrelasjon(verdier):
+        """
+        Pearson-korrelasjon for alle kolonnepar i én omgang med matriseprodukter (BLAS).
+        Manglende verdier håndteres parvis: hvert par bruker radene der begge har verdi,
+        som i pandas sin DataFrame.corr.
+        """
+        gyldig = (~np.isnan(verdier)).astype(np.float64)
+        x = np.where(gyldig > 0, verdier, 0.0)
+        # sentrer rundt kolonnegjennomsnittet for å unngå kansellering i summene under
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = (x - np.nansum(x, axis=0) / gyldig.sum(axis=0)) * gyldig
+        antall = gyldig.T @ gyldig
+        summer = x.T @ gyldig
+        kvadrater = (x * x).T @ gyldig
+        produkter = x.T @ x
+        with np.errstate(invalid="ignore", divide="ignore"):
+            kovarians = produkter - summer * summer.T / antall
+            varians = kvadrater - summer ** 2 / antall
+            korr = kovarians / np.sqrt(varians * varians.T)
+        korr[antall < 2] = np.nan
+        return np.clip(korr, -1.0, 1.0)
+
+    def korrelasjonsmatrise(self, metode="pearson"):
+        """
+        Returnerer korrelasjonsmatrisen for alle numeriske kolonner. Den beregnes én 
+        gang per metode og caches til dataene endres.
+
+        Args:
+            metode: "pearson" eller "spearman". Spearman er Pearson på rangeringer, der
+                hver kolonne rangeres for seg (med manglende verdier kan det avvike litt fra pandas)
+
+        Returns:
+            pd.DataFrame: kvadratisk korrelasjonsmatrise
+
+        Raises:
+            ValueError: dersom metoden er ukjent
         """
-        Beregner korrelasjonskoeffisient mellom to valgte kolonner
+        if metode not in ("pearson", "spearman"):
+            raise ValueError(f"Ukjent korrelasjonsmetode {metode}")
+        if metode not in self._korr:
+            df = self.df if metode == "pearson" else self.df.rank()
+            verdier = df.to_numpy(dtype=np.float64, na_value=np.nan)
+            korr = self._parvis_korrelasjon(verdier)
+            self._korr[metode] = pd.DataFrame(korr, index=self.df.columns, columns=self.df.columns)
+        return self._korr[metode]
+
+    def korrelasjon(self, kol1, kol2, metode="pearson"):
+        """
+        Beregner korrelasjonskoeffisient mellom to valgte kolonner. Slås opp i den cachede
+        korrelasjonsmatrisen, så mange par koster bare én beregning.
 
         Args:
             kol1: navn på første kolonne
             kol2: navn på andre kolonne
+            metode: "pearson" eller "spearman"
 
         Returns:
             float. korrelasjonskoeffiseient
@@ -66,38 +338,318 @@ class DataAnalyse:
             ValueError: dersom en eller begge kolonner ikke finnes i dataframe
         """
         if kol1 in self.df.columns and kol2 in self.df.columns:
-            return self.df[[kol1,kol2]].corr().iloc[0,1]
+            return float(self.korrelasjonsmatrise(metode).at[kol1, kol2])
         else:
             raise ValueError("En eller begge kolonnenavnene finnes ikke i df")
 
-    def identifiser_outliers(self, threshold=3.0):
+    def _fft_kolonne(self, kol, lengde):
+        # kolonnen, kvadratene og masken for gyldige verdier i frekvensdomenet, caches per kolonne
+        nøkkel = (kol, lengde)
+        if nøkkel not in self._fft:
+            verdier = self.df[kol].to_numpy(dtype=np.float64, na_value=np.nan)
+            gyldig = ~np.isnan(verdier)
+            # sentrering gjør summene under numerisk stabile, og endrer ikke korrelasjonen
+            x = np.where(gyldig, verdier - np.nanmean(verdier) if gyldig.any() else 0.0, 0.0)
+            self._fft[nøkkel] = (np.fft.rfft(x, lengde), np.fft.rfft(x * x, lengde),
+                                 np.fft.rfft(gyldig.astype(np.float64), lengde))
+        return self._fft[nøkkel]
+
+    def krysskorrelasjon(self, kol1, kol2, maks_lag=24):
+        """
+        Korrelasjon mellom kol1 og kol2 forskjøvet med lag rader, corr(kol1[t], kol2[t + lag]),
+        for alle lag i [-maks_lag, maks_lag]. En topp ved positivt lag betyr at kol1 ligger 
+        foran kol2 (f.eks. at trykket endrer seg før temperaturen). Alle lag beregnes 
+        samtidig med FFT, og transformasjonene av hver kolonne caches. Resultatet er det 
+        samme som kol1.corr(kol2.shift(-lag)) for hvert lag.
+
+        Args:
+            kol1: ledende kolonne
+            kol2: kolonne som sammenlignes
+            maks_lag: største forskyvning i antall rader
+
+        Returns:
+            pd.Series: korrelasjon per lag, med lag som indeks
+
+        Raises:
+            ValueError: dersom en eller begge kolonner ikke finnes i dataframe
+        """
+        if kol1 not in self.df.columns or kol2 not in self.df.columns:
+            raise ValueError("En eller begge kolonnenavnene finnes ikke i df")
+        n = len(self.df)
+        maks_lag = min(maks_lag, n - 1)
+        # nullutfylling til minst 2n hindrer at den sirkulære korrelasjonen bretter seg rundt
+        lengde = 1 << int(np.ceil(np.log2(max(2 * n, 2))))
+        x, xx, mx = self._fft_kolonne(kol1, lengde)
+        y, yy, my = self._fft_kolonne(kol2, lengde)
+        lag = np.arange(-maks_lag, maks_lag + 1) % lengde
+
+        def krysssum(a, b):
+            # sum over t av a[t] * b[t + lag] for de aktuelle lagene
+            return np.fft.irfft(np.conj(a) * b, lengde)[lag]
+
+        antall = np.rint(krysssum(mx, my))
+        sum_x, sum_y = krysssum(x, my), krysssum(mx, y)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            kovarians = krysssum(x, y) - sum_x * sum_y / antall
+            varians_x = krysssum(xx, my) - sum_x ** 2 / antall
+            varians_y = krysssum(mx, yy) - sum_y ** 2 / antall
+            korr = np.clip(kovarians / np.sqrt(varians_x * varians_y), -1.0, 1.0)
+        korr[antall < 2] = np.nan
+        return pd.Series(korr, index=pd.Index(np.arange(-maks_lag, maks_lag + 1), name="lag"),
+                         name=f"{kol1}->{kol2}")
+
+    def identifiser_outliers(self, threshold=3.0, by=None, tidsbøtte=None):
         """
         Identifiserer de radene med verdier "score" over terskelverdiern "threshold"
 
         Args:
             threshold: terskel for score. default er på 3.0
+            by: grupperingskolonne(r). Score regnes da mot gruppens gjennomsnitt og standardavvik
+            tidsbøtte: pandas-frekvens for tidsbøtter, f.eks. "D"
 
         Returns:
-            pd.DataFrame: Rader hvor minst en verdi overstiger score terskel.
+            pd.DataFrame: Rader fra hele DataFramen (kilde, inkludert f.eks. Lokasjon og Tid)
+                hvor minst en verdi overstiger score terskel
         """
+        grupper = None
+        if by is not None or tidsbøtte is not None:
+            nøkler = list(self._gruppenøkler(by, tidsbøtte).values())
+            gruppert = self.df.groupby(nøkler, observed=True, sort=False)
+            # rader uten gruppenøkkel får en ekstra gruppe med NaN-statistikk og blir aldri outliers
+            koder = gruppert.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+            nan_rad = np.full((1, self.df.shape[1]), np.nan)
+            grupper = (koder, np.vstack([gruppert.mean().to_numpy(dtype=np.float64), nan_rad]),
+                       np.vstack([gruppert.std().to_numpy(dtype=np.float64), nan_rad]))
         try:
-            scores = np.abs((self.df-self.df.mean()) / self.df.std())
-            return self.df[(scores > threshold).any(axis=1)]
+            posisjoner, _, _, _ = self._finn_outliers(self.df, "z", threshold, grupper=grupper)
+            return self.kilde.iloc[np.unique(posisjoner)]
         except Exception as e:
             raise RuntimeError(f"Feil under utregning av outliers: {e}")
 
-    def kolonne_trend(self, kol, vindu = 7):
+    METODER_OUTLIERS = ("z", "mad", "rullende")
+
+    def finn_outliers(self, metode="z", terskel=3.0, data=None, vindu=24, chunk_størrelse=100_000):
+        """
+        Finner enkeltverdier som avviker, bit for bit, uten å bygge en full scorematrise.
+        Bare én bit på chunk_størrelse rader holdes som float64 om gangen.
+
+        Args:
+            metode: "z" (avvik fra gjennomsnitt i standardavvik), "mad" (robust z fra median 
+                og median absolutt avvik, påvirkes lite av outlierne selv) eller "rullende"
+                (z mot gjennomsnitt og standardavvik for de vindu foregående radene)
+            terskel: absolutt score som regnes som outlier
+            data: nye rader som skal vurderes mot statistikken for df, f.eks. fra en strøm.
+                None vurderer df selv. Ignoreres for "rullende"
+            vindu: antall foregående rader for "rullende"
+            chunk_størrelse: antall rader per bit
+
+        Returns:
+            pd.DataFrame: én rad per outlier med kolonnene indeks, kolonne, verdi og score
+
+        Raises:
+            ValueError: dersom metoden er ukjent
+        """
+        if metode not in self.METODER_OUTLIERS:
+            raise ValueError(f"Ukjent metode {metode}, støttet: {self.METODER_OUTLIERS}")
+        df = self.df if data is None or metode == "rullende" else data.reindex(columns=self.df.columns)
+        posisjoner, kolonner, verdier, scores = self._finn_outliers(df, metode, terskel, vindu, chunk_størrelse)
+        return pd.DataFrame({
+            "indeks": df.index[posisjoner],
+            "kolonne": df.columns[kolonner],
+            "verdi": verdier,
+            "score": scores,
+        })
+
+    def _median_absolutt_avvik(self):
+        # caches sammen med statistikken, og nullstilles når dataene endres
+        if self._mad is None:
+            median = self.beregn_median().to_numpy()
+            self._mad = np.array([
+                np.nanmedian(np.abs(self.df[kol].to_numpy(dtype=np.float64, na_value=np.nan) - median[i]))
+                if self.df[kol].notna().any() else np.nan
+                for i, kol in enumerate(self.df.columns)])
+        return self._mad
+
+    def _finn_outliers(self, df, metode, terskel, vindu=24, chunk_størrelse=100_000, grupper=None):
+        """
+        Returnerer (radposisjoner, kolonneposisjoner, verdi, score) for alle verdier med |score| > terskel.
+        grupper er (gruppekode per rad, senter per gruppe, skala per gruppe) når hver rad skal
+        måles mot sin egen gruppe. Kode -1 peker på siste rad i senter og skala.
+        """
+        if grupper is not None:
+            koder, senter_gruppe, skala_gruppe = grupper
+        elif metode == "z":
+            senter = self.beregn_gjennomsnitt().to_numpy()
+            skala = self.beregn_standardavvik().to_numpy()
+        elif metode == "mad":
+            # 0.6745 gjør MAD sammenlignbar med standardavviket for normalfordelte data
+            senter = self.beregn_median().to_numpy()
+            skala = self._median_absolutt_avvik() / 0.6745
+
+        posisjoner, kolonner, utvalgte, scores = [], [], [], []
+        for start in range(0, len(df), chunk_størrelse):
+            slutt = min(start + chunk_størrelse, len(df))
+            if metode == "rullende":
+                # ta med de vindu foregående radene slik at vinduet går over bitgrensen
+                fra = max(start - vindu, 0)
+                bit = df.iloc[fra:slutt].astype(np.float64)
+                forrige = bit.rolling(window=vindu, min_periods=max(2, vindu // 2))
+                senter_bit = forrige.mean().shift(1).to_numpy()[start - fra:]
+                skala_bit = forrige.std().shift(1).to_numpy()[start - fra:]
+                verdier = bit.to_numpy(na_value=np.nan)[start - fra:]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    score = (verdier - senter_bit) / skala_bit
+            else:
+                verdier = df.iloc[start:slutt].to_numpy(dtype=np.float64, na_value=np.nan)
+                if grupper is not None:
+                    senter, skala = senter_gruppe[koder[start:slutt]], skala_gruppe[koder[start:slutt]]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    score = (verdier - senter) / skala
+            rader, kol = np.nonzero(np.abs(score) > terskel)
+            posisjoner.append(rader + start)
+            kolonner.append(kol)
+            utvalgte.append(verdier[rader, kol])
+            scores.append(score[rader, kol])
+
+        if not posisjoner:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        return (np.concatenate(posisjoner), np.concatenate(kolonner), np.concatenate(utvalgte),
+                np.concatenate(scores))
+
+    def _kumulative_summer(self, kol):
+        """
+        Kumulativ sum og antall gyldige verdier for en kolonne, med 0 foran. Beregnes én 
+        gang per kolonne, deretter er summen over et hvilket som helst vindu to oppslag.
+        """
+        if kol not in self._kumulativ:
+            verdier = self.df[kol].to_numpy(dtype=np.float64, na_value=np.nan)
+            gyldig = ~np.isnan(verdier)
+            # trekk fra gjennomsnittet så summene holder seg små og presise
+            senter = float(np.nanmean(verdier)) if gyldig.any() else 0.0
+            summer = np.concatenate([[0.0], np.cumsum(np.where(gyldig, verdier - senter, 0.0))])
+            antall = np.concatenate([[0], np.cumsum(gyldig)])
+            self._kumulativ[kol] = (summer, antall, senter)
+        return self._kumulativ[kol]
+
+    def _vindusstart(self, vindu, posisjoner=None):
+        """
+        Første rad i vinduet for hver rad, eller bare for radene i posisjoner. Heltall gir
+        de vindu siste radene, tekst som "7D" gir radene med tid i (t - vindu, t], som
+        pandas sin rolling("7D").
+        """
+        slutt = np.arange(1, len(self.df) + 1) if posisjoner is None else np.asarray(posisjoner) + 1
+        if isinstance(vindu, (int, np.integer)):
+            if vindu < 1:
+                raise ValueError("vindu må være minst 1")
+            return np.maximum(slutt - vindu, 0)
+        tid = self._tid()
+        tid = (tid.dt.tz_convert(None) if tid.dt.tz is not None else tid).to_numpy()
+        if not (tid[1:] >= tid[:-1]).all():
+            raise ValueError("tidsbaserte vinduer krever at Tid er sortert")
+        mål = tid if posisjoner is None else tid[slutt - 1]
+        return np.searchsorted(tid, mål - pd.Timedelta(vindu).to_timedelta64(), side="right")
+
+    def _glidende(self, kol, vindu, posisjoner=None):
+        # glidende gjennomsnitt fra de kumulative summene, for alle rader eller bare posisjoner
+        summer, antall, senter = self._kumulative_summer(kol)
+        start = self._vindusstart(vindu, posisjoner)
+        slutt = np.arange(1, len(summer)) if posisjoner is None else np.asarray(posisjoner) + 1
+        n = antall[slutt] - antall[start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, (summer[slutt] - summer[start]) / n + senter, np.nan)
+
+    def kolonne_trend(self, kol, vindu = 7, by=None):
         """
-        Returnerer en rullende gjennomsnitt for en spesifisert kolonne.
+        Returnerer en rullende gjennomsnitt for en spesifisert kolonne. Beregnes fra en
+        cachet kumulativ sum, så nye vindusstørrelser koster bare et vektorisert oppslag.
 
         Args:
             kol: navn på kolonnen som skal analyseres
-            vindu: størelse på glidende vindu
+            vindu: størelse på glidende vindu, antall rader eller en tidsperiode som "7D" eller "12h"
+            by: grupperingskolonne(r). Vinduet går da bare over rader i samme gruppe
         
         Returns:
             union: glidende gjennomsnitt som Series
         """
-        if kol in self.df.columns:
-            return self.df[kol].rolling(window=vindu, min_periods=1).mean()
-        else:
+        if kol not in self.df.columns:
+            raise ValueError(f"kolonnen {kol} finnes ikke i df")
+        if by is not None:
+            nøkler = list(self._gruppenøkler(by).values())
+            serie = self.df[kol].reset_index(drop=True)
+            if not isinstance(vindu, (int, np.integer)):
+                # tidsvinduer går over Tid innenfor hver gruppe
+                tid = pd.Index(self._tid().array)
+                verdier = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+                trend = np.full(len(serie), np.nan)
+                for rader in serie.groupby(nøkler, observed=True).indices.values():
+                    gruppe = pd.Series(verdier[rader], index=tid[rader])
+                    trend[rader] = gruppe.rolling(vindu, min_periods=1).mean().to_numpy()
+                return pd.Series(trend, index=self.df.index, name=kol)
+            trend = serie.groupby(nøkler, observed=True).rolling(window=vindu, min_periods=1).mean()
+            trend = trend.droplevel(list(range(len(nøkler)))).sort_index()
+            trend.index = self.df.index
+            return trend
+
+        return pd.Series(self._glidende(kol, vindu), index=self.df.index, name=kol)
+
+    def trender(self, kol, vinduer):
+        """
+        Rullende gjennomsnitt for flere vindusstørrelser på én gang.
+
+        Args:
+            kol: navn på kolonnen
+            vinduer: liste med vinduer, heltall eller tidsperioder som "7D"
+
+        Returns:
+            pd.DataFrame: én kolonne per vindu
+        """
+        return pd.DataFrame({vindu: self.kolonne_trend(kol, vindu) for vindu in vinduer}, index=self.df.index)
+
+    def trender_ved(self, kol, vinduer, posisjoner):
+        """
+        Rullende gjennomsnitt for flere vinduer, men bare i de gitte radposisjonene. Koster
+        O(len(vinduer) * len(posisjoner)) etter at den kumulative summen er bygget, uansett
+        hvor lang serien er.
+
+        Args:
+            kol: navn på kolonnen
+            vinduer: liste med vinduer, heltall eller tidsperioder som "7D"
+            posisjoner: radposisjoner (0-basert) som trenden skal beregnes for
+
+        Returns:
+            np.ndarray: form (len(vinduer), len(posisjoner))
+        """
+        if kol not in self.df.columns:
+            raise ValueError(f"kolonnen {kol} finnes ikke i df")
+        posisjoner = np.asarray(posisjoner, dtype=np.int64)
+        ut = np.empty((len(vinduer), len(posisjoner)))
+        for i, vindu in enumerate(vinduer):
+            ut[i] = self._glidende(kol, vindu, posisjoner)
+        return ut
+
+    def kolonne_ewm(self, kol, span=None, halveringstid=None):
+        """
+        Eksponentielt vektet glidende gjennomsnitt.
+
+        Args:
+            kol: navn på kolonnen
+            span: vekting i antall rader, som pandas sin ewm(span=...)
+            halveringstid: tidsperiode som "6h". Vektene avtar da etter faktisk tid i Tid,
+                slik at hull i serien håndteres riktig
+
+        Returns:
+            pd.Series: vektet gjennomsnitt
+
+        Raises:
+            ValueError: dersom kolonnen ikke finnes eller verken span eller halveringstid er gitt
+        """
+        if kol not in self.df.columns:
             raise ValueError(f"kolonnen {kol} finnes ikke i df")
+        if halveringstid is not None:
+            tid = self._tid()
+            if tid.dt.tz is not None:
+                tid = tid.dt.tz_convert(None)
+            return self.df[kol].ewm(halflife=halveringstid, times=tid.to_numpy()).mean()
+        if span is None:
+            raise ValueError("oppgi span eller halveringstid")
+        return self.df[kol].ewm(span=span).mean()
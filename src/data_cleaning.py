@@ -1,5 +1,310 @@
 import pandas as pd 
+import numpy as np
 import os
+import json
+import uuid
+from urllib.parse import quote
+
+from data_storage import DataLagring
+
+class KvantilSkisse:
+    """
+    Approksimativ kvantilskisse for data som leses i biter. Holder et jevnt
+    tilfeldig utvalg (reservoarutvalg) på høyst kapasitet verdier, så minnebruken er
+    fast uansett hvor mange verdier som passerer. Er det færre verdier enn kapasiteten
+    er kvantilene eksakte.
+    """
+    def __init__(self, kapasitet: int = 10_000, frø: int = 0):
+        """
+        Args:
+            kapasitet: maks antall verdier som holdes i utvalget
+            frø: frø for tilfeldig utvalg, slik at resultatet er reproduserbart
+        """
+        if kapasitet < 1:
+            raise ValueError("kapasitet må være minst 1")
+        self.kapasitet = kapasitet
+        self.antall = 0
+        self._utvalg = np.empty(kapasitet, dtype=np.float64)
+        self._rng = np.random.default_rng(frø)
+
+    def oppdater(self, verdier):
+        """
+        Legger til verdier. NaN ignoreres.
+        """
+        v = np.asarray(verdier, dtype=np.float64).ravel()
+        v = v[~np.isnan(v)]
+        ledig = max(self.kapasitet - self.antall, 0)
+        if ledig:
+            fyll = v[:ledig]
+            self._utvalg[self.antall:self.antall + len(fyll)] = fyll
+            self.antall += len(fyll)
+            v = v[ledig:]
+        if len(v):
+            # verdi nummer n (0-basert) erstatter en tilfeldig plass j < n+1 dersom j < kapasitet.
+            # Ved like j vinner den siste, som ved sekvensiell reservoarutvelgelse
+            posisjon = self.antall + np.arange(len(v))
+            j = (self._rng.random(len(v)) * (posisjon + 1)).astype(np.int64)
+            treff = j < self.kapasitet
+            self._utvalg[j[treff]] = v[treff]
+            self.antall += len(v)
+        return self
+
+    def kvantil(self, q):
+        """
+        Returnerer estimert kvantil q (0-1), NaN dersom ingen verdier er sett.
+        """
+        n = min(self.antall, self.kapasitet)
+        if n == 0:
+            return np.nan
+        return float(np.quantile(self._utvalg[:n], q))
+
+    def median(self):
+        return self.kvantil(0.5)
+
+
+class StrømImputerer:
+    """
+    Imputasjon av manglende verdier i to pass over data som leses i biter.
+    Første pass (oppdater) samler statistikk, andre pass (bruk) fyller inn.
+
+    Metoder:
+        "median": approksimativ median fra KvantilSkisse
+        "mean": eksakt gjennomsnitt fra sum og antall
+        "ffill": siste gyldige verdi per gruppe, også på tvers av biter
+        "interpoler": tidsinterpolasjon per gruppe. Rader etter siste gyldige verdi
+            i en bit holdes tilbake til neste bit (eller avslutt) slik at resultatet
+            blir det samme som i minnet. Trenger ikke første pass. Høyst maks_tilbake
+            rader holdes tilbake, de eldste slippes ut med siste kjente verdi.
+    """
+    METODER = ("median", "mean", "ffill", "interpoler")
+
+    def __init__(self, metode: str = "median", kolonner=None, gruppe: str = "Lokasjon",
+                 tidskolonne: str = "Tid", kapasitet: int = 10_000, maks_tilbake: int = 100_000):
+        """
+        Args:
+            metode: en av METODER
+            kolonner: kolonner som skal imputeres. None gir alle numeriske kolonner i første bit
+            gruppe: kolonne som deler data i uavhengige serier (brukes dersom den finnes)
+            tidskolonne: tidskolonne for "interpoler"
+            kapasitet: kapasitet for kvantilskissene
+            maks_tilbake: største antall rader "interpoler" holder tilbake, f.eks. når en
+                kolonne slutter å rapportere. None gir ingen grense
+
+        Raises:
+            ValueError: dersom metoden er ukjent
+        """
+        metode = metode.lower()
+        if metode not in self.METODER:
+            raise ValueError(f"Ukjent metode {metode} for manglende verdier")
+        self.metode = metode
+        self.kolonner = list(kolonner) if kolonner is not None else None
+        self.gruppe = gruppe
+        self.tidskolonne = tidskolonne
+        self.kapasitet = kapasitet
+        self.maks_tilbake = maks_tilbake
+        self._skisser = {}
+        self._sum = {}
+        self._antall = {}
+        self._siste = None
+        self._tilbake = None
+
+    def _finn_kolonner(self, chunk):
+        if self.kolonner is None:
+            self.kolonner = chunk.select_dtypes(include=["float", "int"]).columns.tolist()
+        return self.kolonner
+
+    def _nøkler(self, df):
+        if self.gruppe in df.columns:
+            return df[self.gruppe]
+        return pd.Series(0, index=df.index)
+
+    def oppdater(self, chunk: pd.DataFrame):
+        """
+        Første pass: oppdaterer median- og gjennomsnittsstatistikk med en bit.
+        """
+        for kol in self._finn_kolonner(chunk):
+            verdier = chunk[kol].to_numpy(dtype=np.float64, na_value=np.nan)
+            if self.metode == "median":
+                self._skisser.setdefault(kol, KvantilSkisse(self.kapasitet)).oppdater(verdier)
+            gyldig = verdier[~np.isnan(verdier)]
+            self._sum[kol] = self._sum.get(kol, 0.0) + gyldig.sum()
+            self._antall[kol] = self._antall.get(kol, 0) + len(gyldig)
+        return self
+
+    def fyllverdier(self):
+        """
+        Returnerer dict med kolonne -> fyllverdi for "median" og "mean".
+        """
+        if self.metode == "median":
+            return {kol: skisse.median() for kol, skisse in self._skisser.items()}
+        if self.metode == "mean":
+            return {kol: self._sum[kol] / self._antall[kol] if self._antall[kol] else np.nan for kol in self._sum}
+        raise ValueError(f"Metoden {self.metode} har ingen faste fyllverdier")
+
+    def bruk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Andre pass: imputerer en bit. For "interpoler" kan rader holdes tilbake
+        og komme ut i en senere bit eller fra avslutt().
+        """
+        kolonner = self._finn_kolonner(chunk)
+        if self.metode in ("median", "mean"):
+            return chunk.fillna(self.fyllverdier())
+        if self.metode == "ffill":
+            return self._ffill(chunk, kolonner)
+        return self._interpoler(chunk, kolonner, siste=False)
+
+    def avslutt(self) -> pd.DataFrame:
+        """
+        Returnerer rader som er holdt tilbake ved "interpoler". Tom DataFrame ellers.
+        """
+        if self.metode != "interpoler" or self._tilbake is None:
+            return pd.DataFrame()
+        return self._interpoler(self._tilbake.iloc[:0], self.kolonner, siste=True)
+
+    def _ffill(self, chunk, kolonner):
+        ut = chunk.copy()
+        nøkler = self._nøkler(ut).to_numpy()
+        fylt = ut[kolonner].groupby(nøkler).ffill()
+        if self._siste is not None:
+            # det som fortsatt mangler i starten av en gruppe hentes fra forrige bit
+            forrige = self._siste.reindex(nøkler)
+            forrige.index = fylt.index
+            fylt = fylt.fillna(forrige)
+        ut[kolonner] = fylt
+        siste = fylt.groupby(nøkler).last()
+        self._siste = siste if self._siste is None else siste.combine_first(self._siste)
+        return ut
+
+    def _interpoler(self, chunk, kolonner, siste):
+        samlet = pd.concat([self._tilbake, chunk]) if self._tilbake is not None else chunk.copy()
+        tid = pd.to_datetime(samlet[self.tidskolonne], utc=True).dt.tz_localize(None).to_numpy()
+        nøkler = self._nøkler(samlet).to_numpy()
+        verdier = samlet[kolonner].to_numpy(dtype=np.float64, na_value=np.nan)
+        ankre = self._siste if self._siste is not None else {}
+        ferdig = np.ones(len(samlet), dtype=bool)
+
+        # radposisjonene per gruppe finnes i én gjennomgang
+        for nøkkel, rader in pd.Series(np.arange(len(samlet))).groupby(nøkler, sort=False).indices.items():
+            g_tid, g_verdier = tid[rader], verdier[rader]
+            # siste ferdige rad fra forrige bit brukes som startpunkt for interpolasjonen
+            anker = ankre.get(nøkkel)
+            if anker is not None:
+                g_tid = np.concatenate([[anker[0]], g_tid])
+                g_verdier = np.vstack([anker[1], g_verdier])
+            serie = pd.DataFrame(g_verdier, index=pd.DatetimeIndex(g_tid), columns=kolonner)
+            verdier[rader] = serie.interpolate(method="time").to_numpy()[len(g_tid) - len(rader):]
+            if not siste:
+                # rader etter siste gyldige verdi i en kolonne venter på neste bit
+                gyldig = ~np.isnan(g_verdier)
+                grenser = [g_tid[gyldig[:, i]].max() for i in range(len(kolonner)) if gyldig[:, i].any()]
+                if grenser:
+                    ferdig[rader] = tid[rader] <= min(grenser)
+
+        venter = np.flatnonzero(~ferdig)
+        if self.maks_tilbake is not None and len(venter) > self.maks_tilbake:
+            # de eldste ventende radene slippes ut med siste kjente verdi, som i avslutt
+            eldste = venter[np.argsort(tid[venter], kind="stable")[:len(venter) - self.maks_tilbake]]
+            ferdig[eldste] = True
+
+        ut = samlet.copy()
+        ut[kolonner] = verdier
+        self._tilbake = samlet[~ferdig]
+        siste_rad = pd.Series(np.flatnonzero(ferdig)).groupby(nøkler[ferdig]).last()
+        for nøkkel, rad in siste_rad.items():
+            ankre[nøkkel] = (tid[rad], verdier[rad])
+        self._siste = ankre
+        return ut[ferdig]
+
+
+class NøkkelIndeks:
+    """
+    Kompakt indeks over nøkler som er sett i tidligere batcher. Hver nøkkel lagres
+    som en 64-bits hash (uint64) sammen med utstedelsestid i nanosekunder, sortert
+    slik at oppslag er et binærsøk. Historikken trenger derfor ikke leses inn igjen
+    for å finne duplikater. Kollisjoner er mulige i teorien, men svært usannsynlige
+    (omtrent n²/2⁶⁵ for n nøkler).
+    """
+    INGEN = np.iinfo(np.int64).min
+
+    def __init__(self):
+        self._hasher = np.empty(0, dtype=np.uint64)
+        self._utstedt = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._hasher)
+
+    @staticmethod
+    def hash_nøkler(df, nøkkel):
+        """
+        Returnerer uint64-hash per rad av nøkkelkolonnene. Tidskolonner gjøres om til
+        datetime64[ns, UTC] først, så samme tidspunkt gir samme hash uansett enhet og tidssone.
+        """
+        nøkler = df[list(nøkkel)]
+        tider = {kol: pd.to_datetime(nøkler[kol], utc=True).astype("datetime64[ns, UTC]")
+                 for kol in nøkler.columns if pd.api.types.is_datetime64_any_dtype(nøkler[kol])}
+        if tider:
+            nøkler = nøkler.assign(**tider)
+        return pd.util.hash_pandas_object(nøkler, index=False).to_numpy()
+
+    @staticmethod
+    def som_ns(tid):
+        """
+        Gjør tidsstempler om til int64 nanosekunder (UTC). NaT blir INGEN.
+        """
+        tid = pd.to_datetime(tid, utc=True)
+        ns = tid.dt.tz_localize(None).to_numpy().view(np.int64).copy()
+        ns[tid.isna().to_numpy()] = NøkkelIndeks.INGEN
+        return ns
+
+    def er_ny(self, hasher, utstedt=None):
+        """
+        Returnerer en maske for nøkler som ikke er sett, eller som er sett med eldre utstedelsestid.
+        """
+        if not len(self._hasher):
+            return np.ones(len(hasher), dtype=bool)
+        posisjon = np.minimum(np.searchsorted(self._hasher, hasher), len(self._hasher) - 1)
+        funnet = self._hasher[posisjon] == hasher
+        if utstedt is None:
+            return ~funnet
+        return ~funnet | (utstedt > self._utstedt[posisjon])
+
+    def legg_til(self, hasher, utstedt=None):
+        """
+        Legger nøkler til i indeksen. Er en nøkkel sett før beholdes nyeste utstedelsestid.
+        """
+        if utstedt is None:
+            utstedt = np.full(len(hasher), self.INGEN, dtype=np.int64)
+        alle_hasher = np.concatenate([self._hasher, hasher])
+        alle_utstedt = np.concatenate([self._utstedt, utstedt])
+        rekkefølge = np.lexsort((alle_utstedt, alle_hasher))
+        alle_hasher, alle_utstedt = alle_hasher[rekkefølge], alle_utstedt[rekkefølge]
+        siste = np.ones(len(alle_hasher), dtype=bool)
+        siste[:-1] = alle_hasher[1:] != alle_hasher[:-1]
+        self._hasher, self._utstedt = alle_hasher[siste], alle_utstedt[siste]
+        return self
+
+    def lagre(self, sti):
+        """
+        Lagrer indeksen som .npz. Returnerer stien.
+        """
+        if not sti.endswith(".npz"):
+            sti += ".npz"
+        np.savez(sti, hasher=self._hasher, utstedt=self._utstedt)
+        return sti
+
+    @classmethod
+    def last(cls, sti):
+        """
+        Leser en indeks lagret med lagre(). Finnes ikke filen returneres en tom indeks.
+        """
+        indeks = cls()
+        if not sti.endswith(".npz"):
+            sti += ".npz"
+        if os.path.isfile(sti):
+            with np.load(sti) as data:
+                indeks._hasher, indeks._utstedt = data["hasher"], data["utstedt"]
+        return indeks
+
 
 class DataRensing:
     """
@@ -34,10 +339,22 @@ class DataRensing:
         """
         if "time" not in self._df.columns:
             raise KeyError("Kolonne 'time' mangler i DataFrame")
-        # antar ISO-format med Z-sone
-        tid = pd.to_datetime(self._df["time"], utc=True)
+        # antar ISO-format med Z-sone, kolonnen kan også allerede være datetime fra FetchData
+        if pd.api.types.is_datetime64_any_dtype(self._df["time"]):
+            return pd.to_datetime(self._df["time"], utc=True)
+        tid = pd.to_datetime(self._df["time"], utc=True, format="ISO8601")
         return tid
 
+    @staticmethod
+    def _som_float(serie):
+        """
+        Gjør en målekolonne om til float64. float32 (FetchData med kompakt=True) går via
+        desimalteksten, så 5.3 blir 5.3 og ikke 5.300000190734863.
+        """
+        if serie.dtype == np.float32:
+            return serie.astype(str).astype(float)
+        return serie.astype(float)
+
 
 
     def hent_temperatur(self):
@@ -53,7 +370,7 @@ class DataRensing:
         kol = "data_instant_details_air_temperature"
         if kol not in self._df.columns:
             raise KeyError(f"Kolonne {kol} mangler")
-        return self._df[kol].astype(float)
+        return self._som_float(self._df[kol])
 
 
 
@@ -67,7 +384,7 @@ class DataRensing:
         kol = "data_instant_details_relative_humidity"
         if kol not in self._df.columns:
             raise KeyError(f"Kolonne {kol} mangler")
-        return self._df[kol].astype(float)
+        return self._som_float(self._df[kol])
 
 
 
@@ -81,7 +398,7 @@ class DataRensing:
         kol = "data_instant_details_air_pressure_at_sea_level"
         if kol not in self._df.columns:
             raise KeyError(f"Kolonne {kol} mangler")
-        return self._df[kol].astype(float)
+        return self._som_float(self._df[kol])
 
 
 
@@ -95,14 +412,20 @@ class DataRensing:
         kol = "data_instant_details_wind_speed"
         if kol not in self._df.columns:
             raise KeyError(f"Kolonne {kol} mangler")
-        return self._df[kol].astype(float)
+        return self._som_float(self._df[kol])
 
 
 
-    def bygg_renset_dataframe(self):
+    def bygg_renset_dataframe(self, kompakt: bool = False):
         """
         Bygger en ny DataFrame med utvalgte kolonner for videre analyse:
-        Tid, Temperatur, Fuktighet, trykk, Vindhastighet.
+        Tid, Temperatur, Fuktighet, trykk, Vindhastighet. Har rådataene kolonnen
+        "lokasjon" (fra FetchData.hent_forecasts) tas den med først som "Lokasjon",
+        og kolonnen "utstedt" tas med sist som "Utstedt".
+
+        Args:
+            kompakt: gjør målingene om til float32 og Lokasjon til category (se optimaliser_dtyper).
+                Standard er False, så målingene beholdes som float64
 
         Return:
             pd.DataFrame: Renset DataFrame med faste kolonner.
@@ -110,13 +433,76 @@ class DataRensing:
         Raises:
             KeyError: hvis nødvendige underliggende metoder kaster feil.
         """
-        df_res = pd.DataFrame()
-        df_res["Tid"] = self.hent_tid()
-        df_res["Temperatur"] = self.hent_temperatur()
-        df_res["Fuktighet"] = self.hent_fuktighet()
-        df_res["Trykk"] = self.hent_trykk()
-        df_res["Vindhastighet"] = self.hent_vind()
-        return df_res
+        # bygges i ett steg fra en dict i stedet for kolonne for kolonne
+        kolonner = {}
+        if "lokasjon" in self._df.columns:
+            kolonner["Lokasjon"] = self._df["lokasjon"]
+        utstedt = {}
+        if "utstedt" in self._df.columns:
+            utstedt["Utstedt"] = pd.to_datetime(self._df["utstedt"], utc=True, format="ISO8601")
+        df = pd.DataFrame({
+            **kolonner,
+            "Tid": self.hent_tid(),
+            "Temperatur": self.hent_temperatur(),
+            "Fuktighet": self.hent_fuktighet(),
+            "Trykk": self.hent_trykk(),
+            "Vindhastighet": self.hent_vind(),
+            **utstedt,
+        })
+        if kompakt:
+            df, _ = self.optimaliser_dtyper(df, vis_rapport=False)
+        return df
+
+    @staticmethod
+    def optimaliser_dtyper(df: pd.DataFrame, float32: bool = True, kategori_grense: float = 0.5, 
+                           vis_rapport: bool = True):
+        """
+        Gjør dtypene så kompakte som mulig:
+        float64 -> float32 (målingene har langt færre gjeldende sifre enn float32 gir),
+        heltall -> minste heltallstype som rommer verdiene (f.eks. int16 eller uint8), og
+        tekstkolonner med få unike verdier (lokasjon, symbolkoder) -> category.
+        Parquet og Feather i DataLagring lagrer disse dtypene som de er.
+
+        Args:
+            df: DataFrame som skal optimaliseres. Endres ikke
+            float32: om float64 skal gjøres om til float32
+            kategori_grense: største andel unike verdier for at en tekstkolonne blir category
+            vis_rapport: skriver ut hvor mange bytes som er spart
+
+        Returns:
+            tuple: (ny DataFrame, rapport som DataFrame med dtype og bytes før og etter per kolonne)
+        """
+        før = df.memory_usage(deep=True, index=False)
+        nye = {}
+        for kol in df.columns:
+            serie = df[kol]
+            if pd.api.types.is_bool_dtype(serie):
+                continue
+            if pd.api.types.is_integer_dtype(serie):
+                nedtype = "unsigned" if len(serie) and serie.min() >= 0 else "integer"
+                nye[kol] = pd.to_numeric(serie, downcast=nedtype)
+            elif pd.api.types.is_float_dtype(serie) and float32 and serie.dtype != np.float32:
+                nye[kol] = serie.astype(np.float32)
+            elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+                if len(serie) and serie.nunique(dropna=True) <= kategori_grense * len(serie):
+                    kategori = serie.astype("category")
+                    # for svært korte kolonner kan kategoritabellen koste mer enn den sparer
+                    if kategori.memory_usage(deep=True, index=False) < før[kol]:
+                        nye[kol] = kategori
+        ut = df.assign(**nye) if nye else df.copy()
+
+        etter = ut.memory_usage(deep=True, index=False)
+        rapport = pd.DataFrame({
+            "dtype_før": df.dtypes.astype(str),
+            "dtype_etter": ut.dtypes.astype(str),
+            "bytes_før": før,
+            "bytes_etter": etter,
+        })
+        if vis_rapport:
+            spart = int(før.sum() - etter.sum())
+            print(f"Minnebruk {før.sum():,} -> {etter.sum():,} bytes, spart {spart:,} bytes "
+                  f"({spart / max(før.sum(), 1):.0%})")
+        return ut, rapport
 
 
 
@@ -125,7 +511,9 @@ class DataRensing:
         Håndterer manglende verdier etter valgt metode.
 
         Args:
-            metode(str): "drop" for å fjerne rader, "median" for imputasjoner, eller behold
+            metode(str): "drop" for å fjerne rader, "median" eller "mean" for imputasjon,
+                "ffill" for siste gyldige verdi og "interpoler" for tidsinterpolasjon per 
+                lokasjon, eller behold
         
         Returns: 
             pd.Dataframe: DataFrame med utførte operasjoner
@@ -137,6 +525,17 @@ class DataRensing:
         elif met == "median":
             for kol in df_tmp.select_dtypes(include=["float","int"]):
                 df_tmp[kol] = df_tmp[kol].fillna(df_tmp[kol].median())
+        elif met in ("mean", "ffill", "interpoler"):
+            tidskolonne = "Tid" if "Tid" in df_tmp.columns else "time"
+            gruppe = "Lokasjon" if "Lokasjon" in df_tmp.columns else "lokasjon"
+            # hele DataFramen er én bit, så kapasiteten trenger ikke begrense noe
+            imputerer = StrømImputerer(met, gruppe=gruppe, tidskolonne=tidskolonne).oppdater(df_tmp)
+            indeks = df_tmp.index
+            df_tmp = imputerer.bruk(df_tmp.reset_index(drop=True))
+            rest = imputerer.avslutt()
+            if len(rest):
+                df_tmp = pd.concat([df_tmp, rest]).sort_index()
+            df_tmp.index = indeks
         elif met == "behold":
             pass
         else:
@@ -145,19 +544,95 @@ class DataRensing:
 
 
 
-    def håndter_duplikater(self, behold: bool = True):
+    @staticmethod
+    def imputer_strøm(chunk_fabrikk, metode: str = "median", kolonner=None, **kwargs):
         """
-        Fjerner duplikater om behold = False
+        Imputerer manglende verdier i data som er for store for minnet. Første pass
+        samler statistikk (kvantilskisse for median, sum og antall for mean), andre
+        pass fyller inn og gir tilbake bit for bit. "ffill" og "interpoler" trenger
+        bare ett pass og bærer tilstand per lokasjon mellom bitene.
+
+        Args:
+            chunk_fabrikk: funksjon uten argumenter som gir en ny iterator av DataFrames,
+                f.eks. lambda: leser.les_filtrert("arkiv.parquet", chunk_størrelse=100_000)
+            metode: "median", "mean", "ffill" eller "interpoler"
+            kolonner: kolonner som skal imputeres. None gir alle numeriske
+            **kwargs: sendes videre til StrømImputerer (gruppe, tidskolonne, kapasitet, maks_tilbake)
+
+        Yields:
+            pd.DataFrame: imputerte biter. Ved "interpoler" kan rader komme i en senere bit
+
+        Raises:
+            ValueError: dersom metoden er ukjent
+        """
+        imputerer = StrømImputerer(metode, kolonner=kolonner, **kwargs)
+        if imputerer.metode in ("median", "mean"):
+            for chunk in chunk_fabrikk():
+                imputerer.oppdater(chunk)
+        for chunk in chunk_fabrikk():
+            ut = imputerer.bruk(chunk)
+            if len(ut):
+                yield ut
+        rest = imputerer.avslutt()
+        if len(rest):
+            yield rest
+
+    def håndter_duplikater(self, behold: bool = True, nøkkel=None, sist_etter=None, indeks=None):
+        """
+        Fjerner duplikater om behold = False. Med nøkkel regnes rader som duplikater
+        når nøkkelkolonnene er like, selv om målingene er forskjellige (f.eks. samme
+        lokasjon og tid fra to utstedelser). Nøklene sammenlignes som 64-bits hash.
 
         Args:
             behold: True for å beholde alle, false for å droppe duplikater
+            nøkkel: liste med nøkkelkolonner, f.eks. ["Lokasjon", "Tid"]. None bruker alle kolonner
+            sist_etter: kolonne som avgjør hvilken rad som beholdes per nøkkel, den med høyest 
+                verdi (f.eks. "Utstedt"). None beholder første forekomst
+            indeks: NøkkelIndeks med nøkler fra tidligere batcher. Rader som allerede er sett
+                (og ikke er nyere etter sist_etter) fjernes, og indeksen oppdateres
         Returns:
             pd.Dataframe: Dataframe uten duplikater om ønsket
         """
         df_tmp = self._df.copy()
-        if not behold:
+        if behold:
+            return df_tmp
+        if nøkkel is None and indeks is None:
             df_tmp.drop_duplicates(inplace = True)
-        return df_tmp
+            return df_tmp
+        maske = self._duplikatmaske(df_tmp, nøkkel or df_tmp.columns.tolist(), sist_etter, indeks)
+        return df_tmp[maske]
+
+    @staticmethod
+    def _duplikatmaske(df, nøkkel, sist_etter=None, indeks=None):
+        """
+        Returnerer en boolsk maske over radene som skal beholdes etter nøkkelbasert dedup.
+        """
+        hasher = NøkkelIndeks.hash_nøkler(df, nøkkel)
+        utstedt = NøkkelIndeks.som_ns(df[sist_etter]) if sist_etter is not None else None
+        if utstedt is None:
+            behold = ~pd.Series(hasher).duplicated().to_numpy()
+        else:
+            # sorter stabilt på sist_etter og behold siste forekomst, dvs. nyeste utstedelse
+            rekkefølge = np.argsort(utstedt, kind="stable")
+            behold = np.zeros(len(df), dtype=bool)
+            behold[rekkefølge] = ~pd.Series(hasher[rekkefølge]).duplicated(keep="last").to_numpy()
+        if indeks is not None:
+            behold &= indeks.er_ny(hasher, utstedt)
+            indeks.legg_til(hasher[behold], utstedt[behold] if utstedt is not None else None)
+        return behold
+
+    @staticmethod
+    def standard_nøkkel(df):
+        """
+        Nøkkel for renset data med utstedelsestid: (Lokasjon, Tid) med nyeste Utstedt.
+        Uten Utstedt brukes alle kolonner som før.
+
+        Returns:
+            tuple: (nøkkel, sist_etter), begge None uten Utstedt
+        """
+        if "Utstedt" not in df.columns:
+            return None, None
+        return [kol for kol in ("Lokasjon", "Tid") if kol in df.columns], "Utstedt"
 
 
 
@@ -188,10 +663,10 @@ class DataRensing:
 
     def bearbeid_tid(self, fmt: str = "%d.%m.%y - %H:%M"):
         """
-        Formaterer tidskolonnen til '%d.%m.%y - %H:%M'
+        Sorterer på tid og formaterer tidskolonnen til '%d.%m.%y - %H:%M'
 
         Args:
-            fmt(str): datetime-strftime format.
+            fmt(str): datetime-strftime format. None beholder "Tid" som datetime64[ns, UTC]
         Returns:
             pd.Dataframe: DataFrame med formatert "Tid"
         Raise:
@@ -204,10 +679,33 @@ class DataRensing:
         df_tmp["Tid"] = pd.to_datetime(df_tmp["Tid"], errors="coerce")
         df_tmp = df_tmp.sort_values("Tid")
 
-        df_tmp["Tid"] = df_tmp["Tid"].dt.strftime(fmt)
+        if fmt is not None:
+            df_tmp["Tid"] = df_tmp["Tid"].dt.strftime(fmt)
         return df_tmp
 
+    @staticmethod
+    def formater_tid(df, fmt: str = "%d.%m.%y - %H:%M"):
+        """
+        Formaterer "Tid" som tekst for visning. Brukes når dataene er renset med 
+        tidsformat=None, slik at tid bare gjøres om til tekst når den skal vises.
 
+        Args:
+            df: DataFrame med "Tid" som kolonne eller indeks
+            fmt(str): datetime-strftime format
+        Returns:
+            pd.DataFrame: kopi med "Tid" som tekst
+        Raise:
+            KeyError: hvis "Tid" verken er kolonne eller indeks
+        """
+        if "Tid" in df.columns:
+            df = df.copy()
+            df["Tid"] = df["Tid"].dt.strftime(fmt)
+            return df
+        if df.index.name == "Tid":
+            df = df.copy()
+            df.index = df.index.strftime(fmt).rename("Tid")
+            return df
+        raise KeyError("Kolonnen 'Tid' mangler for tidsformatering")
 
     def rense_stats(self):
         """
@@ -237,7 +735,8 @@ class DataRensing:
 
     def lagre_renset_data(self, filnavn="trondheim_forecast_cleaned.csv"):
         """
-        Lagrer den rensede dataen til data mappen.
+        Lagrer den rensede dataen til data mappen. Formatet velges ut fra filendelsen,
+        .parquet og .feather bevarer dtypene (f.eks. Tid som datetime).
 
         Args:
             filnavn: hva den ferdigrensede filen skal hete
@@ -252,11 +751,10 @@ class DataRensing:
         if not os.path.isdir(data_dir):
             raise FileNotFoundError(f"Mappe 'data/' ble ikke funnet i prosjektroten: {data_dir}")
 
-        full_sti = os.path.join(data_dir, filnavn)
-        self._df.to_csv(full_sti, index=False)
-        return full_sti
+        return DataLagring(data_dir).lagre(self._df, filnavn)
 
-    def data_rens(self, desimaler=1, temp_grense=None, filnavn="trondheim_forecast_cleaned.csv", avrund_kol=None):
+    def data_rens(self, desimaler=1, temp_grense=None, filnavn="trondheim_forecast_cleaned.csv", avrund_kol=None,
+                  samlet=True, tidsformat="%d.%m.%y - %H:%M", tid_som_indeks=False, kompakt=False):
         """
         Utfører alle metodene for rensing.
 
@@ -265,8 +763,37 @@ class DataRensing:
             temp_grense: dersom satt, filtrerer over denne
             filnavn: navn på outputfil
             undermappe: mappen som filen skal lagres til
+            samlet: True kjører alle stegene i én samlet gjennomgang (se _rens_samlet), 
+                False kjører metodene hver for seg med en kopi per steg
+            tidsformat: strftime-format for "Tid". None beholder datetime64[ns, UTC] slik at
+                senere moduler slipper å parse tid på nytt, se formater_tid for visning
+            tid_som_indeks: True gjør "Tid" til en sortert DatetimeIndex (krever tidsformat=None)
+            kompakt: float32- og category-kolonner i stedet for float64 og tekst (se optimaliser_dtyper).
+                Av som standard, siden float32 endrer tallene videre analyse og prediksjon får
+        """
+        if tid_som_indeks and tidsformat is not None:
+            raise ValueError("tid_som_indeks krever tidsformat=None")
+        if samlet:
+            self._df = self._rens_samlet(desimaler, temp_grense, avrund_kol, fmt=tidsformat, kompakt=kompakt)
+        else:
+            self._rens_stegvis(desimaler, temp_grense, avrund_kol, fmt=tidsformat, kompakt=kompakt)
+        if tid_som_indeks:
+            self._df = self._df.set_index("Tid")
+
+        try:
+            sti = self.lagre_renset_data(filnavn=filnavn)
+            print(f"Data lagret til {sti}")
+        except Exception as e:
+            print(f"Feil ved lagring: {e}")
+
+        print("Data er ferdigrenset")
+        return self._df
+
+    def _rens_stegvis(self, desimaler, temp_grense, avrund_kol, fmt="%d.%m.%y - %H:%M", kompakt=False):
         """
-        self._df = self.bygg_renset_dataframe()
+        Kjører hvert rensesteg for seg. Hvert steg lager en ny kopi av hele DataFramen.
+        """
+        self._df = self.bygg_renset_dataframe(kompakt=kompakt)
         print("Ny dataframe bygget")
         print("Kolonner:", self._df.columns.tolist())
 
@@ -274,10 +801,11 @@ class DataRensing:
         print(f"Antall duplikater: {dups}, Antall manglende verdier: {nans}")
 
         self._df = self.håndter_manglende_verdier(metode="median")
-        self._df = self.håndter_duplikater(behold=False)
+        nøkkel, sist_etter = self.standard_nøkkel(self._df)
+        self._df = self.håndter_duplikater(behold=False, nøkkel=nøkkel, sist_etter=sist_etter)
         print("Manglende verdier og fuplikater håndtert")
 
-        self._df=self.bearbeid_tid()
+        self._df=self.bearbeid_tid(fmt)
         print("Tid formatert")
 
         if avrund_kol:
@@ -297,12 +825,257 @@ class DataRensing:
                 print(f"Feil i filtrering: {e}")
         else:
             pass
-        
-        try:
-            sti = self.lagre_renset_data(filnavn=filnavn)
-            print(f"Data lagret til {sti}")
-        except Exception as e:
-            print(f"Feil ved lagring: {e}")
 
-        print("Data er ferdigrenset")
-        return self._df
\ No newline at end of file
+    def _rens_samlet(self, desimaler, temp_grense, avrund_kol, fmt="%d.%m.%y - %H:%M", kompakt=False):
+        """
+        Samme resultat som _rens_stegvis, men uten en kopi per steg. Den rensede 
+        DataFramen bygges én gang og eies av denne metoden, så imputasjon og avrunding
+        gjøres på plass. Duplikat- og temperaturfilteret samles til én radmaske, og 
+        sortering og filtrering utføres som ett enkelt uttak (take) til slutt. 
+        Tid formateres bare for radene som blir igjen.
+
+        Returns:
+            pd.DataFrame: renset DataFrame
+        """
+        df = self.bygg_renset_dataframe(kompakt=kompakt)
+        print("Ny dataframe bygget")
+        print("Kolonner:", df.columns.tolist())
+
+        nan_maske = df.isna()
+        print(f"Antall duplikater: {df.duplicated().sum()}, Antall manglende verdier: {nan_maske.values.sum()}")
+
+        numeriske = df.select_dtypes(include=["float", "int"]).columns
+        manglende = [kol for kol in numeriske if nan_maske[kol].any()]
+        if manglende:
+            df.fillna(df[manglende].median(), inplace=True)
+        nøkkel, sist_etter = self.standard_nøkkel(df)
+        if nøkkel is None:
+            behold = ~df.duplicated().to_numpy()
+        else:
+            behold = self._duplikatmaske(df, nøkkel, sist_etter)
+        print("Manglende verdier og fuplikater håndtert")
+
+        if avrund_kol:
+            try:
+                if avrund_kol not in df.columns:
+                    raise KeyError(f"Kolonnen {avrund_kol} ikke funnet")
+                if desimaler < 0:
+                    raise ValueError(f"Antall desimaler må være >= 0")
+                df[avrund_kol] = df[avrund_kol].round(desimaler)
+                print(f"Kolonne {avrund_kol} avrundet til {desimaler} desimaler")
+            except Exception as e:
+                print(f"Feil i avrunding: {e}")
+
+        if temp_grense is not None:
+            behold &= (df["Temperatur"] > temp_grense).to_numpy()
+            print(f"Filtrert alle rader med Temperatur > {temp_grense}")
+
+        rader = np.flatnonzero(behold)
+        rekkefølge = np.argsort(df["Tid"].values[rader], kind="stable")
+        df = df.take(rader[rekkefølge])
+        if fmt is not None:
+            df["Tid"] = df["Tid"].dt.strftime(fmt)
+        print("Tid formatert")
+        return df
+
+    def data_rens_inkrementell(self, filnavn="trondheim_forecast_cleaned", desimaler=1, avrund_kol=None,
+                               lagring=None):
+        """
+        Renser bare rader som er nye eller endret siden forrige kjøring. self._df er den
+        nye råbatchen. Det rensede datasettet er en mappe med Parquet-filer partisjonert på
+        lokasjon og dato for Tid:
+
+            <filnavn>/lokasjon=<navn>/dato=<YYYY-MM-DD>/del-<skrevet>-<id>.parquet
+
+        Rader med nøkkel (Lokasjon, Tid) som allerede finnes med like verdier hoppes over,
+        og bare partisjonene batchen berører leses. Nye og endrede rader skrives som nye
+        filer, eksisterende filer endres aldri, så en kjøring koster O(batch) og ikke
+        O(historikk). Ved lesing (les_renset) vinner siste skrevne rad per nøkkel.
+        Har råbatchen kolonnen "utstedt" hoppes rader som ikke er nyere enn vannmerket for
+        sin lokasjon over før rensing. Median-imputasjon bruker medianen i den nye batchen.
+
+        Args:
+            filnavn: mappe for det rensede datasettet i data_dir. En filendelse ignoreres
+            desimaler: antall desimaler for avrunding
+            avrund_kol: kolonne som skal avrundes
+            lagring: DataLagring som bestemmer mappen. Standard er data/ i prosjektroten
+
+        Returns:
+            pd.DataFrame: de nye eller endrede rensede radene med Tid som datetime64[ns, UTC]
+        """
+        lagring = lagring or DataLagring()
+        mappe = self._renset_mappe(filnavn, lagring)
+        vannmerke = self.les_vannmerke(filnavn, lagring)
+        utstedt_per_lokasjon = vannmerke.get("utstedt")
+        # eldre vannmerker har én felles utstedelsestid og brukes ikke til filtrering
+        if not isinstance(utstedt_per_lokasjon, dict):
+            utstedt_per_lokasjon = {}
+
+        if utstedt_per_lokasjon and "utstedt" in self._df.columns:
+            utstedt = pd.to_datetime(self._df["utstedt"], utc=True, format="ISO8601")
+            lokasjon = self._df["lokasjon"].astype(str) if "lokasjon" in self._df.columns else "ukjent"
+            terskel = pd.to_datetime(pd.Series(lokasjon, index=self._df.index).map(utstedt_per_lokasjon),
+                                     utc=True, format="ISO8601")
+            self._df = self._df[(terskel.isna() | (utstedt > terskel)).to_numpy()]
+            print(f"{len(self._df)} rader er nyere enn vannmerket for sin lokasjon")
+
+        if self._df.empty:
+            print("Ingen nye rader å rense")
+            self._df = pd.DataFrame()
+            return self._df
+
+        ny = self._rens_samlet(desimaler, None, avrund_kol, fmt=None, kompakt=True)
+        nøkkel = [kol for kol in ("Lokasjon", "Tid") if kol in ny.columns]
+        ny = ny.drop_duplicates(subset=nøkkel, keep="last")
+        renset = self._les_partisjoner(mappe, self._partisjoner(mappe, ny))
+        delta = self._nye_eller_endrede(ny, renset, nøkkel)
+        print(f"Nye eller endrede rader: {len(delta)} av {len(ny)}")
+        skrevet = self._skriv_partisjoner(delta, mappe, lagring.komprimering)
+
+        if "Utstedt" in ny.columns:
+            lokasjon = ny["Lokasjon"].astype(str) if "Lokasjon" in ny.columns else pd.Series("ukjent", index=ny.index)
+            for lok, maks in ny["Utstedt"].groupby(lokasjon.to_numpy()).max().items():
+                forrige = utstedt_per_lokasjon.get(lok)
+                if forrige is None or maks > pd.Timestamp(forrige):
+                    utstedt_per_lokasjon[lok] = maks.isoformat()
+        tid = ny["Tid"].max()
+        if vannmerke.get("tid") and pd.Timestamp(vannmerke["tid"]) > tid:
+            tid = pd.Timestamp(vannmerke["tid"])
+        self.lagre_vannmerke(filnavn, {"tid": tid.isoformat(), "utstedt": utstedt_per_lokasjon}, lagring)
+        print(f"{len(skrevet)} nye filer skrevet til {mappe}")
+
+        self._df = delta.sort_values(nøkkel, kind="stable", ignore_index=True)
+        return self._df
+
+    @staticmethod
+    def _renset_mappe(filnavn, lagring):
+        return os.path.splitext(lagring.sti(filnavn))[0]
+
+    @staticmethod
+    def _partisjon_nøkler(df):
+        # (lokasjon eller None, dato) for hver rad, samme inndeling ved skriving og lesing
+        dato = df["Tid"].dt.strftime("%Y-%m-%d")
+        if "Lokasjon" in df.columns:
+            return [df["Lokasjon"].astype(str), dato]
+        return [dato]
+
+    @staticmethod
+    def _partisjon_sti(mappe, deler):
+        if len(deler) == 2:
+            return os.path.join(mappe, f"lokasjon={quote(deler[0], safe='')}", f"dato={deler[1]}")
+        return os.path.join(mappe, f"dato={deler[0]}")
+
+    @staticmethod
+    def _partisjoner(mappe, df):
+        """
+        Partisjonsmappene radene i df hører til.
+        """
+        nøkler = pd.concat(DataRensing._partisjon_nøkler(df), axis=1).drop_duplicates()
+        return [DataRensing._partisjon_sti(mappe, list(rad)) for rad in nøkler.itertuples(index=False)]
+
+    @staticmethod
+    def _skriv_partisjoner(df, mappe, komprimering="zstd"):
+        """
+        Skriver df som én ny fil per partisjon. Filnavnet starter med skrivetidspunktet,
+        slik at sortering på filnavn gir skriverekkefølgen.
+        """
+        if df.empty:
+            return []
+        stempel = pd.Timestamp.now(tz="UTC").strftime("%Y%m%dT%H%M%S%f")
+        skrevet = []
+        for deler, del_df in df.groupby(DataRensing._partisjon_nøkler(df), sort=False):
+            deler = [deler] if not isinstance(deler, tuple) else list(deler)
+            partisjon = DataRensing._partisjon_sti(mappe, deler)
+            os.makedirs(partisjon, exist_ok=True)
+            sti = os.path.join(partisjon, f"del-{stempel}-{uuid.uuid4().hex[:8]}.parquet")
+            del_df.to_parquet(sti, index=False, compression=komprimering)
+            skrevet.append(sti)
+        return skrevet
+
+    @staticmethod
+    def _les_partisjoner(mappe, partisjoner=None):
+        """
+        Leser filene i partisjonene (alle dersom None) og beholder siste skrevne rad per
+        (Lokasjon, Tid).
+        """
+        if partisjoner is None:
+            partisjoner = [rot for rot, _, _ in os.walk(mappe)]
+        filer = [os.path.join(p, f) for p in partisjoner if os.path.isdir(p)
+                 for f in os.listdir(p) if f.endswith(".parquet")]
+        if not filer:
+            return None
+        filer.sort(key=os.path.basename)
+        df = pd.concat([pd.read_parquet(f) for f in filer], ignore_index=True)
+        nøkkel = [kol for kol in ("Lokasjon", "Tid") if kol in df.columns]
+        return df.drop_duplicates(subset=nøkkel, keep="last")
+
+    @staticmethod
+    def les_renset(filnavn="trondheim_forecast_cleaned", lagring=None):
+        """
+        Leser hele det rensede datasettet fra data_rens_inkrementell.
+
+        Args:
+            filnavn: mappe for det rensede datasettet i data_dir
+            lagring: DataLagring som bestemmer mappen
+
+        Returns:
+            pd.DataFrame: én rad per (Lokasjon, Tid), sortert. Tom DataFrame dersom ingenting er lagret
+        """
+        df = DataRensing._les_partisjoner(DataRensing._renset_mappe(filnavn, lagring or DataLagring()))
+        if df is None:
+            return pd.DataFrame()
+        nøkkel = [kol for kol in ("Lokasjon", "Tid") if kol in df.columns]
+        # category-kolonner med ulike kategorier i ulike filer blir object ved concat
+        df, _ = DataRensing.optimaliser_dtyper(df, vis_rapport=False)
+        return df.sort_values(nøkkel, kind="stable", ignore_index=True)
+
+    @staticmethod
+    def _nye_eller_endrede(ny, renset, nøkkel):
+        """
+        Finner radene i ny som mangler i renset eller har minst én annen verdi.
+        """
+        if renset is None or renset.empty:
+            return ny
+        renset = renset.copy()
+        if not pd.api.types.is_datetime64_any_dtype(renset["Tid"]):
+            renset["Tid"] = pd.to_datetime(renset["Tid"], utc=True, format="%d.%m.%y - %H:%M")
+        felles = [kol for kol in ny.columns if kol in renset.columns and kol not in nøkkel]
+        gammel = renset[nøkkel + felles].drop_duplicates(subset=nøkkel, keep="last")
+        sammen = ny[nøkkel + felles].merge(gammel, on=nøkkel, how="left", suffixes=("", "_gammel"), indicator=True)
+        endret = (sammen["_merge"] == "left_only").to_numpy()
+        for kol in felles:
+            a, b = sammen[kol], sammen[f"{kol}_gammel"]
+            endret |= ~((a == b) | (a.isna() & b.isna())).to_numpy()
+        return ny[endret]
+
+    @staticmethod
+    def _vannmerke_sti(filnavn, lagring):
+        return os.path.splitext(lagring.sti(filnavn))[0] + ".vannmerke.json"
+
+    @staticmethod
+    def les_vannmerke(filnavn, lagring=None):
+        """
+        Leser vannmerket fra forrige inkrementelle rensing.
+
+        Args:
+            filnavn: navnet på det rensede datasettet
+            lagring: DataLagring som bestemmer mappen
+
+        Returns:
+            dict: {"tid": ..., "utstedt": {lokasjon: ...}} som ISO-tekst, tom dict dersom det ikke finnes
+        """
+        sti = DataRensing._vannmerke_sti(filnavn, lagring or DataLagring())
+        if not os.path.isfile(sti):
+            return {}
+        with open(sti, encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def lagre_vannmerke(filnavn, vannmerke, lagring=None):
+        """
+        Lagrer vannmerket ved siden av det rensede datasettet.
+        """
+        sti = DataRensing._vannmerke_sti(filnavn, lagring or DataLagring())
+        with open(sti, "w", encoding="utf-8") as f:
+            json.dump(vannmerke, f)
+        return sti
@@ -98,9 +98,19 @@ class DataPrediksjon:
         df_vis = self.X_test.copy()
         df_vis["Faktisk"] = self.y_test.values
         df_vis["Predikert"] = y_pred
-        df_vis["Tid"] = self.df.loc[self.y_test.index, "Tid"].values if "Tid" in self.df.columns else pd.NaT 
+        if "Tid" in self.df.columns:
+            df_vis["Tid"] = self.df.loc[self.y_test.index, "Tid"].values
+        elif self.df.index.name == "Tid":
+            df_vis = df_vis.rename_axis(None)
+            df_vis["Tid"] = self.y_test.index
+        else:
+            df_vis["Tid"] = pd.NaT
         df_vis["Feil"] = abs(df_vis["Faktisk"] - df_vis["Predikert"])
-        df_vis["Dag"] = pd.to_datetime(df_vis["Tid"], errors="coerce").dt.date
+        # Tid fra typet rensing er allerede datetime og trenger ikke parses på nytt
+        tid = df_vis["Tid"]
+        if not pd.api.types.is_datetime64_any_dtype(tid):
+            tid = pd.to_datetime(tid, errors="coerce")
+        df_vis["Dag"] = tid.dt.date
         df_vis = df_vis.sort_values(by="Tid")
         return df_vis
 
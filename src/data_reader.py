@@ -1,18 +1,23 @@
 import os
+import re
+import glob
 import pandas as pd
 from pandasql import sqldf
 
+from data_storage import DataLagring
+
 class DataLeser:
     """
     Klasse for å lese inn og utforske lokale datafiler (CSV, JSON) for miljødata.
     """
 
-    def __init__(self,data_dir):
+    def __init__(self,data_dir, sql_motor="duckdb"):
         """
         Initiliserer DataLeser med katalogen der data ligger.
         
         Args:
             data_dir: Sti til mappen som inneholder datafiler
+            sql_motor: "duckdb" (standard) eller "pandasql" for sql_utforsk
 
         Raises:
             ValueError: Dersom data:dir ikke finnes eller ikke er en katalog
@@ -20,6 +25,9 @@ class DataLeser:
         if not os.path.isdir(data_dir):
             raise ValueError(f"Data-katalogen '{data_dir}' finnes ikke eller er ikke en katalog")
         self.data_dir = data_dir
+        self.lagring = DataLagring(data_dir)
+        self.sql_motor = sql_motor
+        self._duckdb = None
 
     def list_filer(self, ext):
         """
@@ -56,6 +64,223 @@ class DataLeser:
             raise FileNotFoundError(f"Finner ikke CSV-filen {filnavn} i {self.data_dir}")
         return pd.read_csv(path, **kwargs)
 
+    def les_parquet(self, filnavn, kolonner=None, **kwargs):
+        """
+        Leser en Parquet-fil fra data_dir. Bare kolonnene i kolonner leses fra disk.
+
+        Args:
+            filnavn: navnet på parquet-filen
+            kolonner: liste med kolonner som skal leses, None leser alle
+            **kwargs: parametre til pd.read_parquet
+
+        Returns:
+            pd.DataFrame: innholdet i filen med lagrede dtyper
+
+        Raises:
+            FileNotFoundError: filen ikke finnes
+        """
+        return self.lagring.les(filnavn, kolonner=kolonner, format="parquet", **kwargs)
+
+    def les_feather(self, filnavn, kolonner=None, **kwargs):
+        """
+        Leser en Feather-fil fra data_dir.
+
+        Args:
+            filnavn: navnet på feather-filen
+            kolonner: liste med kolonner som skal leses, None leser alle
+            **kwargs: parametre til pd.read_feather
+
+        Returns:
+            pd.DataFrame: innholdet i filen med lagrede dtyper
+
+        Raises:
+            FileNotFoundError: filen ikke finnes
+        """
+        return self.lagring.les(filnavn, kolonner=kolonner, format="feather", **kwargs)
+
+    def les_fil(self, filnavn, kolonner=None, **kwargs):
+        """
+        Leser en CSV-, Parquet- eller Feather-fil ut fra filendelsen.
+
+        Args:
+            filnavn: navnet på filen
+            kolonner: liste med kolonner som skal leses, None leser alle
+            **kwargs: parametre til lesefunksjonen i pandas
+
+        Returns:
+            pd.DataFrame: innholdet i filen
+        """
+        return self.lagring.les(filnavn, kolonner=kolonner, **kwargs)
+
+    def les_filtrert(self, filnavn, kolonner=None, fra=None, til=None, lokasjoner=None, chunk_størrelse=None,
+                     tidskolonne=None, lokasjonskolonne=None, tidsformat=None):
+        """
+        Leser bare det som trengs fra en CSV-, Parquet- eller Feather-fil: utvalgte kolonner
+        og rader innenfor et tidsrom og/eller et sett lokasjoner. For Parquet sendes filtrene
+        ned til leseren slik at radgrupper utenfor filteret ikke leses. CSV leses bit for bit 
+        og filtreres underveis.
+
+        Args:
+            filnavn: navnet på filen i data_dir
+            kolonner: kolonner som skal returneres, None gir alle
+            fra: tidligste tidspunkt som tas med
+            til: seneste tidspunkt som tas med
+            lokasjoner: liste med lokasjoner som tas med
+            chunk_størrelse: antall rader per bit. Dersom satt returneres en iterator av DataFrames
+            tidskolonne: navn på tidskolonnen. Standard er "Tid" eller "time", det som finnes
+            lokasjonskolonne: navn på lokasjonskolonnen. Standard er "Lokasjon" eller "lokasjon"
+            tidsformat: strftime-format for tidskolonnen når den er lagret som tekst,
+                f.eks. "%d.%m.%y - %H:%M" for renset CSV
+
+        Returns:
+            pd.DataFrame eller iterator av pd.DataFrame dersom chunk_størrelse er satt
+
+        Raises:
+            FileNotFoundError: dersom filen ikke finnes
+            KeyError: dersom det filtreres på en kolonne som ikke finnes
+        """
+        format = self.lagring.finn_format(filnavn)
+        sti = self.lagring.sti(filnavn)
+        if not os.path.isfile(sti):
+            raise FileNotFoundError(f"Finner ikke filen {filnavn} i {self.data_dir}")
+
+        alle = self._kolonnenavn(sti, format)
+        utvalg = {"fra": fra, "til": til, "lokasjoner": lokasjoner, "tidsformat": tidsformat}
+        if fra is not None or til is not None:
+            utvalg["tidskolonne"] = self._finn_kolonne(alle, tidskolonne, ("Tid", "time"))
+        if lokasjoner is not None:
+            utvalg["lokasjonskolonne"] = self._finn_kolonne(alle, lokasjonskolonne, ("Lokasjon", "lokasjon"))
+
+        trengs = None
+        if kolonner is not None:
+            ekstra = [utvalg.get("tidskolonne"), utvalg.get("lokasjonskolonne")]
+            trengs = list(dict.fromkeys(list(kolonner) + [k for k in ekstra if k]))
+
+        if format == "parquet":
+            biter = self._parquet_biter(sti, trengs, utvalg, chunk_størrelse)
+        elif format == "csv":
+            biter = pd.read_csv(sti, usecols=trengs, chunksize=chunk_størrelse or 100_000)
+        else:
+            biter = iter([pd.read_feather(sti, columns=trengs)])
+
+        biter = (self._filtrer(bit, utvalg, kolonner) for bit in biter)
+        if chunk_størrelse:
+            return biter
+        deler = list(biter)
+        return pd.concat(deler, ignore_index=True) if deler else pd.DataFrame(columns=kolonner or alle)
+
+    def les_mange(self, mønster, samle=False, **filtre):
+        """
+        Leser mange filer som passer et glob-mønster i data_dir, én og én. Filene åpnes
+        først når iteratoren kommer til dem, så minnebruken avhenger av én fil (eller én
+        bit dersom chunk_størrelse er satt) om gangen.
+
+        Args:
+            mønster: glob-mønster, f.eks. "arkiv_*.parquet"
+            samle: True slår sammen alt til én DataFrame
+            **filtre: sendes videre til les_filtrert (kolonner, fra, til, lokasjoner, chunk_størrelse, ...)
+
+        Returns:
+            iterator av pd.DataFrame, eller pd.DataFrame dersom samle=True
+        """
+        filer = sorted(glob.glob(os.path.join(self.data_dir, mønster)))
+
+        def generer():
+            for sti in filer:
+                resultat = self.les_filtrert(os.path.relpath(sti, self.data_dir), **filtre)
+                if isinstance(resultat, pd.DataFrame):
+                    yield resultat
+                else:
+                    yield from resultat
+
+        if samle:
+            deler = list(generer())
+            return pd.concat(deler, ignore_index=True) if deler else pd.DataFrame()
+        return generer()
+
+    @staticmethod
+    def _kolonnenavn(sti, format):
+        """
+        Leser bare kolonnenavnene i en fil.
+        """
+        if format == "csv":
+            return pd.read_csv(sti, nrows=0).columns.tolist()
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+        if format == "parquet":
+            return pq.read_schema(sti).names
+        return ipc.open_file(sti).schema.names
+
+    @staticmethod
+    def _finn_kolonne(alle, valgt, kandidater):
+        if valgt is not None:
+            if valgt not in alle:
+                raise KeyError(f"Kolonnen {valgt} finnes ikke i filen")
+            return valgt
+        for kol in kandidater:
+            if kol in alle:
+                return kol
+        raise KeyError(f"Fant ingen av kolonnene {kandidater} å filtrere på")
+
+    def _parquet_biter(self, sti, trengs, utvalg, chunk_størrelse):
+        """
+        Leser Parquet med pyarrow.dataset slik at kolonneutvalg og filtre brukes
+        allerede ved lesing. Tekstlagret tid filtreres i pandas etterpå.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        datasett = ds.dataset(sti, format="parquet")
+        uttrykk = None
+        tidskol = utvalg.get("tidskolonne")
+        if tidskol and pa.types.is_timestamp(datasett.schema.field(tidskol).type):
+            tz = datasett.schema.field(tidskol).type.tz
+            for op, verdi in ((">=", utvalg["fra"]), ("<=", utvalg["til"])):
+                if verdi is None:
+                    continue
+                verdi = self._som_tid(verdi, tz)
+                del_uttrykk = ds.field(tidskol) >= verdi if op == ">=" else ds.field(tidskol) <= verdi
+                uttrykk = del_uttrykk if uttrykk is None else uttrykk & del_uttrykk
+        if utvalg.get("lokasjonskolonne"):
+            del_uttrykk = ds.field(utvalg["lokasjonskolonne"]).isin(list(utvalg["lokasjoner"]))
+            uttrykk = del_uttrykk if uttrykk is None else uttrykk & del_uttrykk
+
+        if chunk_størrelse:
+            for batch in datasett.to_batches(columns=trengs, filter=uttrykk, batch_size=chunk_størrelse):
+                yield batch.to_pandas()
+        else:
+            yield datasett.to_table(columns=trengs, filter=uttrykk).to_pandas()
+
+    @staticmethod
+    def _som_tid(verdi, tz):
+        verdi = pd.Timestamp(verdi)
+        if tz is None:
+            return verdi.tz_convert(None) if verdi.tzinfo is not None else verdi
+        return verdi.tz_localize(tz) if verdi.tzinfo is None else verdi.tz_convert(tz)
+
+    def _filtrer(self, df, utvalg, kolonner):
+        """
+        Bruker tids- og lokasjonsfilteret på en bit og fjerner kolonner som bare trengtes til filtrering.
+        """
+        tidskol = utvalg.get("tidskolonne")
+        if tidskol:
+            tid = df[tidskol]
+            if not pd.api.types.is_datetime64_any_dtype(tid):
+                tid = pd.to_datetime(tid, utc=True, format=utvalg["tidsformat"])
+            tz = getattr(tid.dt, "tz", None)
+            maske = pd.Series(True, index=df.index)
+            if utvalg["fra"] is not None:
+                maske &= tid >= self._som_tid(utvalg["fra"], tz)
+            if utvalg["til"] is not None:
+                maske &= tid <= self._som_tid(utvalg["til"], tz)
+            df = df[maske]
+        lokkol = utvalg.get("lokasjonskolonne")
+        if lokkol:
+            df = df[df[lokkol].isin(list(utvalg["lokasjoner"]))]
+        if kolonner is not None:
+            df = df[list(kolonner)]
+        return df.reset_index(drop=True)
+
     def les_json(self, filnavn, **kwargs):
         """
         Leser en JSON fil fra datadir til en Dataframe
@@ -73,29 +298,112 @@ class DataLeser:
         """
         path = os.path.join(self.data_dir,filnavn)
         if not os.path.isfile(path):
-            raise FileNotFoundError(f"finner ikke JSON-filen {filnavn} i {self,data_dir}")
+            raise FileNotFoundError(f"finner ikke JSON-filen {filnavn} i {self.data_dir}")
         return pd.read_json(path, **kwargs)
 
     
-    def sql_utforsk(self, df, query):
+    def sql_utforsk(self, df, query, motor=None):
         """
-        Utfører en SQL-spørring mot DataFrame ved hjelp av pandasql.
+        Utfører en SQL-spørring mot DataFrame. Standard er DuckDB, som leser DataFramen
+        direkte uten å kopiere den og gjenbruker samme tilkobling mellom spørringer. 
+        Filene i data_dir er tilgjengelige som views, se registrer_filer. Dersom duckdb 
+        ikke er installert brukes pandasql.
 
         Args:
-            df: dataframen som vi kjører sql spørringen mot
+            df: dataframen som vi kjører sql spørringen mot, tilgjengelig som "df". Kan være None
             query: sql-spørring som skal kjøres, eksempler: "SELECT * FROM df WHERE ...".
+            motor: "duckdb" eller "pandasql", overstyrer sql_motor
         
         Returns:
             pd.DataFrame: Resultatet av SQL-Spørring
         
         Reises:
-            ValueError: dersom query er tom
+            ValueError: dersom query er tom eller motoren er ukjent
         """
         if not query or not isinstance(query, str):
             raise ValueError("Ugyldig SQL-spørring.")
+        motor = motor or self.sql_motor
+        if motor not in ("duckdb", "pandasql"):
+            raise ValueError(f"Ukjent SQL-motor {motor}")
+
+        if motor == "duckdb":
+            try:
+                con = self.sql_tilkobling()
+            except ImportError:
+                motor = "pandasql"
+
+        if motor == "duckdb":
+            if df is None:
+                return con.execute(query).df()
+            con.register("df", df)
+            try:
+                return con.execute(query).df()
+            finally:
+                con.unregister("df")
+
         pysqldf = lambda q: sqldf(q, {"df": df}) #bygg in-memory env for sqldf!
         return pysqldf(query)
 
+    def sql_tilkobling(self):
+        """
+        Returnerer DuckDB-tilkoblingen til denne DataLeseren. Den opprettes ved første
+        kall, og views for filene i data_dir registreres da.
+
+        Returns:
+            duckdb.DuckDBPyConnection: vedvarende tilkobling
+
+        Raises:
+            ImportError: dersom duckdb ikke er installert
+        """
+        if self._duckdb is None:
+            import duckdb
+            self._duckdb = duckdb.connect()
+            self.registrer_filer()
+        return self._duckdb
+
+    def registrer_filer(self):
+        """
+        Lager et view per CSV- og Parquet-fil i data_dir, med filnavnet uten endelse
+        som navn (f.eks. "trondheim_forecast_cleaned"). Viewene leser filen ved spørring,
+        så ingenting lastes inn på forhånd. Kan kalles på nytt når nye filer er lagt til.
+        Filer uten navn eller som DuckDB ikke kan lese hoppes over med en advarsel, slik at
+        én ødelagt fil ikke stopper spørringer mot de andre.
+
+        Returns:
+            list[str]: navn på registrerte views
+        """
+        import duckdb
+        con = self.sql_tilkobling()
+        lesere = {".csv": "read_csv_auto", ".parquet": "read_parquet"}
+        views = []
+        for filnavn in sorted(os.listdir(self.data_dir)):
+            stamme, endelse = os.path.splitext(filnavn)
+            leser = lesere.get(endelse.lower())
+            if leser is None or stamme == "df":
+                continue
+            navn = re.sub(r"\W", "_", stamme)
+            if not navn:
+                print(f"Advarsel: hopper over {filnavn}, filnavnet gir ikke et gyldig view-navn")
+                continue
+            if navn[0].isdigit():
+                navn = f"f_{navn}"
+            sti = os.path.abspath(os.path.join(self.data_dir, filnavn)).replace("'", "''")
+            try:
+                con.execute(f'CREATE OR REPLACE VIEW "{navn}" AS SELECT * FROM {leser}(\'{sti}\')')
+            except duckdb.Error as e:
+                print(f"Advarsel: kunne ikke registrere {filnavn}: {e}")
+                continue
+            views.append(navn)
+        return views
+
+    def lukk(self):
+        """
+        Lukker DuckDB-tilkoblingen dersom den er åpnet.
+        """
+        if self._duckdb is not None:
+            self._duckdb.close()
+            self._duckdb = None
+
     def beskriv_dataframe(self, df, navn):
         """
         Lager en kort beskrivelse av et datasett
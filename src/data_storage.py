@@ -0,0 +1,271 @@
+import os
+import uuid
+from urllib.parse import quote, unquote
+import pandas as pd
+
+class DataLagring:
+    """
+    Klasse for å lagre og lese DataFrames i data-mappen. Parquet og Feather er
+    kolonnebaserte og typede formater (dtyper som datetime og category bevares),
+    mens CSV beholdes som eksportformat.
+    """
+    FORMATER = {".csv": "csv", ".parquet": "parquet", ".feather": "feather"}
+
+    def __init__(self, data_dir=None, komprimering="zstd"):
+        """
+        Initialiserer lagringen med mappen filene skal ligge i.
+
+        Args:
+            data_dir: mappe for datafiler. Standard er "data/" i prosjektroten
+            komprimering: komprimering for Parquet og Feather ("zstd", "lz4", "snappy" eller None)
+        """
+        if data_dir is None:
+            rotmappe = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+            data_dir = os.path.join(rotmappe, "data")
+        self.data_dir = data_dir
+        self.komprimering = komprimering
+
+    def finn_format(self, filnavn, format=None):
+        """
+        Finner lagringsformat ut fra filendelsen dersom format ikke er gitt.
+
+        Args:
+            filnavn: navn eller sti til filen
+            format: "csv", "parquet" eller "feather". None betyr at filendelsen avgjør
+
+        Returns:
+            str: formatnavnet
+
+        Raises:
+            ValueError: dersom formatet ikke støttes
+        """
+        if format is None:
+            format = self.FORMATER.get(os.path.splitext(filnavn)[1].lower())
+        if format not in self.FORMATER.values():
+            raise ValueError(f"Ukjent lagringsformat for {filnavn}, støttet: {sorted(self.FORMATER.values())}")
+        return format
+
+    def sti(self, filnavn):
+        """
+        Returnerer full sti til en fil i data_dir. Absolutte stier returneres uendret.
+        """
+        return os.path.join(self.data_dir, filnavn)
+
+    def lagre(self, df, filnavn, format=None, **kwargs):
+        """
+        Lagrer en DataFrame i valgt format.
+
+        Args:
+            df: DataFrame som skal lagres
+            filnavn: navn på filen i data_dir
+            format: overstyrer formatet fra filendelsen
+            **kwargs: sendes videre til to_csv, to_parquet eller to_feather
+
+        Returns:
+            str: full sti til den lagrede filen
+        """
+        format = self.finn_format(filnavn, format)
+        full_sti = self.sti(filnavn)
+        os.makedirs(os.path.dirname(full_sti) or ".", exist_ok=True)
+
+        # en navngitt indeks (f.eks. Tid som DatetimeIndex) lagres, en vanlig radindeks ikke
+        if format == "csv":
+            kwargs.setdefault("index", df.index.name is not None)
+            df.to_csv(full_sti, **kwargs)
+        elif format == "parquet":
+            kwargs.setdefault("index", df.index.name is not None)
+            kwargs.setdefault("compression", self.komprimering)
+            df.to_parquet(full_sti, **kwargs)
+        else:
+            # feather krever standard RangeIndex, en navngitt indeks lagres som kolonne
+            if not df.index.equals(pd.RangeIndex(len(df))):
+                df = df.reset_index(drop=df.index.name is None)
+            kwargs.setdefault("compression", self.komprimering)
+            df.to_feather(full_sti, **kwargs)
+        return full_sti
+
+    def les(self, filnavn, kolonner=None, format=None, **kwargs):
+        """
+        Leser en fil fra data_dir. For Parquet og Feather leses bare kolonnene som
+        trengs fra disk.
+
+        Args:
+            filnavn: navn på filen i data_dir
+            kolonner: liste med kolonner som skal leses. None leser alle
+            format: overstyrer formatet fra filendelsen
+            **kwargs: sendes videre til read_csv, read_parquet eller read_feather
+
+        Returns:
+            pd.DataFrame: innholdet i filen
+
+        Raises:
+            FileNotFoundError: dersom filen ikke finnes
+        """
+        format = self.finn_format(filnavn, format)
+        full_sti = self.sti(filnavn)
+        if not os.path.isfile(full_sti):
+            raise FileNotFoundError(f"Finner ikke filen {filnavn} i {self.data_dir}")
+
+        if format == "csv":
+            if kolonner is not None:
+                kwargs["usecols"] = kolonner
+            return pd.read_csv(full_sti, **kwargs)
+        if format == "parquet":
+            return pd.read_parquet(full_sti, columns=kolonner, **kwargs)
+        return pd.read_feather(full_sti, columns=kolonner, **kwargs)
+
+
+class ForecastArkiv:
+    """
+    Klasse for et append-only arkiv av prognoser. Hver henting skrives som en ny
+    Parquet-fil i en partisjon per lokasjon og utstedelsesdato:
+
+        arkiv_dir/lokasjon=<navn>/utstedt_dato=<YYYY-MM-DD>/del-<utstedt>-<id>.parquet
+
+    Eksisterende filer endres aldri. Rader som allerede finnes (samme lokasjon, 
+    gyldig tid og utstedelsestid) skrives ikke på nytt.
+    """
+
+    def __init__(self, arkiv_dir=None, komprimering="zstd"):
+        """
+        Initialiserer arkivet.
+
+        Args:
+            arkiv_dir: rotmappe for arkivet. Standard er "data/arkiv" i prosjektroten
+            komprimering: Parquet-komprimering
+        """
+        if arkiv_dir is None:
+            arkiv_dir = os.path.join(DataLagring().data_dir, "arkiv")
+        self.arkiv_dir = arkiv_dir
+        self.komprimering = komprimering
+
+    @staticmethod
+    def _utc(tid):
+        tid = pd.Timestamp(tid)
+        return tid.tz_localize("UTC") if tid.tzinfo is None else tid.tz_convert("UTC")
+
+    def _partisjon_sti(self, lokasjon, dato):
+        return os.path.join(self.arkiv_dir, f"lokasjon={quote(str(lokasjon), safe='')}", f"utstedt_dato={dato}")
+
+    def partisjoner(self, lokasjoner=None, fra_dato=None, til_dato=None):
+        """
+        Lister partisjoner, filtrert på lokasjon og utstedelsesdato uten å åpne filer.
+
+        Args:
+            lokasjoner: liste med lokasjonsnavn, None gir alle
+            fra_dato: første utstedelsesdato som tas med ("YYYY-MM-DD" eller dato)
+            til_dato: siste utstedelsesdato som tas med
+
+        Returns:
+            list[tuple]: (lokasjon, dato, mappe) sortert på lokasjon og dato
+        """
+        if not os.path.isdir(self.arkiv_dir):
+            return []
+        fra_dato = str(self._utc(fra_dato).date()) if fra_dato is not None else None
+        til_dato = str(self._utc(til_dato).date()) if til_dato is not None else None
+        ønsket = {str(l) for l in lokasjoner} if lokasjoner is not None else None
+
+        resultat = []
+        for lok_mappe in sorted(os.listdir(self.arkiv_dir)):
+            if not lok_mappe.startswith("lokasjon="):
+                continue
+            lokasjon = unquote(lok_mappe.split("=", 1)[1])
+            if ønsket is not None and lokasjon not in ønsket:
+                continue
+            lok_sti = os.path.join(self.arkiv_dir, lok_mappe)
+            for dato_mappe in sorted(os.listdir(lok_sti)):
+                if not dato_mappe.startswith("utstedt_dato="):
+                    continue
+                dato = dato_mappe.split("=", 1)[1]
+                if (fra_dato and dato < fra_dato) or (til_dato and dato > til_dato):
+                    continue
+                resultat.append((lokasjon, dato, os.path.join(lok_sti, dato_mappe)))
+        return resultat
+
+    @staticmethod
+    def _filer(mappe):
+        return sorted(os.path.join(mappe, f) for f in os.listdir(mappe) if f.endswith(".parquet"))
+
+    def skriv(self, df, lokasjon=None, utstedt=None):
+        """
+        Legger en henting til i arkivet. Bare partisjonene som berøres leses, og bare
+        nøkkelkolonnene, for å finne rader som allerede er arkivert.
+
+        Args:
+            df: DataFrame fra FetchData med kolonnen "time"
+            lokasjon: lokasjonsnavn. Brukes når df mangler kolonnen "lokasjon"
+            utstedt: utstedelsestid. Brukes når df mangler kolonnen "utstedt", standard er nå (UTC)
+
+        Returns:
+            list[str]: stier til filene som ble skrevet
+
+        Raises:
+            KeyError: dersom kolonnen "time" mangler
+        """
+        if "time" not in df.columns:
+            raise KeyError("Kolonne 'time' mangler i DataFrame")
+        df = df.copy()
+        df["time"] = pd.to_datetime(df["time"], utc=True)
+        if "lokasjon" not in df.columns:
+            df.insert(0, "lokasjon", lokasjon if lokasjon is not None else "ukjent")
+        df["lokasjon"] = df["lokasjon"].astype(str)
+        if "utstedt" not in df.columns:
+            df["utstedt"] = pd.Timestamp.now(tz="UTC") if utstedt is None else utstedt
+        df["utstedt"] = pd.to_datetime(df["utstedt"], utc=True)
+        df = df.drop_duplicates(subset=["lokasjon", "time", "utstedt"], keep="last")
+
+        skrevet = []
+        for (lok, dato), del_df in df.groupby(["lokasjon", df["utstedt"].dt.strftime("%Y-%m-%d")], sort=False):
+            mappe = self._partisjon_sti(lok, dato)
+            if os.path.isdir(mappe):
+                kjente = [pd.read_parquet(f, columns=["time", "utstedt"]) for f in self._filer(mappe)]
+                if kjente:
+                    kjent = pd.MultiIndex.from_frame(pd.concat(kjente, ignore_index=True))
+                    ny = ~pd.MultiIndex.from_frame(del_df[["time", "utstedt"]]).isin(kjent)
+                    del_df = del_df[ny]
+            if del_df.empty:
+                continue
+            os.makedirs(mappe, exist_ok=True)
+            første = del_df["utstedt"].min().strftime("%Y%m%dT%H%M%S")
+            sti = os.path.join(mappe, f"del-{første}-{uuid.uuid4().hex[:8]}.parquet")
+            del_df.to_parquet(sti, index=False, compression=self.komprimering)
+            skrevet.append(sti)
+        return skrevet
+
+    def les(self, lokasjoner=None, fra=None, til=None, utstedt_fra=None, utstedt_til=None, kolonner=None):
+        """
+        Leser arkivet tilbake. Partisjoner utenfor lokasjoner og utstedelsesperioden 
+        hoppes over uten å åpnes, og tidsfilteret på gyldig tid sendes ned til Parquet-leseren.
+
+        Args:
+            lokasjoner: liste med lokasjonsnavn, None gir alle
+            fra: tidligste gyldige tid ("time")
+            til: seneste gyldige tid ("time")
+            utstedt_fra: tidligste utstedelsestid
+            utstedt_til: seneste utstedelsestid
+            kolonner: kolonner som skal leses, None gir alle
+
+        Returns:
+            pd.DataFrame: arkiverte rader sortert på lokasjon, utstedt og time
+        """
+        filtre = []
+        for kol, op, verdi in [("time", ">=", fra), ("time", "<=", til),
+                               ("utstedt", ">=", utstedt_fra), ("utstedt", "<=", utstedt_til)]:
+            if verdi is not None:
+                filtre.append((kol, op, self._utc(verdi)))
+
+        les_kolonner = None
+        if kolonner is not None:
+            les_kolonner = list(dict.fromkeys(["lokasjon", "time", "utstedt"] + list(kolonner)))
+
+        deler = []
+        for _, _, mappe in self.partisjoner(lokasjoner, utstedt_fra, utstedt_til):
+            for fil in self._filer(mappe):
+                deler.append(pd.read_parquet(fil, columns=les_kolonner, filters=filtre or None))
+        if not deler:
+            return pd.DataFrame(columns=list(kolonner) if kolonner is not None else ["lokasjon", "time", "utstedt"])
+        df = pd.concat(deler, ignore_index=True)
+        df = df.sort_values(["lokasjon", "utstedt", "time"], ignore_index=True)
+        if kolonner is not None:
+            df = df[list(kolonner)]
+        return df
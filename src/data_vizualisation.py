@@ -1,44 +1,586 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt 
 import matplotlib.image as mpimg
 import seaborn as sns 
 import os
+import json
+import time
+import hashlib
+import matplotlib
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
+
+BILDEMAPPE = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")), "bilder")
+
+FIGURSTØRRELSER = {
+    "tidsserie": (10, 5),
+    "histogram": (8, 5),
+    "boxplot": (10, 6),
+    "korrelasjonsmatrise": (10, 8),
+    "trend": (10, 5),
+    "scatter": (8, 6),
+}
+
+
+NEDSAMPLINGER = ("lttb", "minmaks")
+
+
+def _lttb_indekser(x, y, maks_punkter):
+    """
+    Largest-Triangle-Three-Buckets: velger punktet i hver bøtte som danner den største
+    trekanten med forrige valgte punkt og snittet av neste bøtte. Første og siste punkt
+    beholdes alltid.
+    """
+    n = len(y)
+    if maks_punkter >= n or maks_punkter < 3:
+        return np.arange(n)
+    kanter = np.linspace(1, n - 1, maks_punkter - 1).astype(np.int64)
+    valgt = np.empty(maks_punkter, dtype=np.int64)
+    valgt[0], valgt[-1] = 0, n - 1
+    a = 0
+    for i in range(maks_punkter - 2):
+        start, slutt = kanter[i], kanter[i + 1]
+        neste_slutt = kanter[i + 2] if i + 2 < len(kanter) else n
+        neste_x = x[slutt:neste_slutt].mean()
+        neste_y = y[slutt:neste_slutt].mean()
+        areal = np.abs((x[a] - neste_x) * (y[start:slutt] - y[a]) - (x[a] - x[start:slutt]) * (neste_y - y[a]))
+        a = start + int(np.argmax(areal))
+        valgt[i + 1] = a
+    return valgt
+
+
+def _minmaks_indekser(y, maks_punkter):
+    """
+    Deler serien i maks_punkter // 2 like store bøtter og beholder minste og største
+    punkt i hver, i opprinnelig rekkefølge.
+    """
+    n = len(y)
+    if maks_punkter >= n or maks_punkter < 2:
+        return np.arange(n)
+    bøtter = pd.Series(y).groupby(np.arange(n) * (maks_punkter // 2) // n)
+    return np.unique(np.concatenate([bøtter.idxmin().to_numpy(), bøtter.idxmax().to_numpy()]))
+
+
+def nedsample(serie, maks_punkter, metode="lttb"):
+    """
+    Reduserer en serie til høyst maks_punkter punkter før plotting, slik at tegnetiden
+    ikke vokser med lengden på serien. Manglende verdier fjernes.
+
+    Args:
+        serie (pd.Series): verdier med tid eller posisjon som indeks
+        maks_punkter (int): største antall punkter. None gir serien uendret
+        metode (str): "lttb" for Largest-Triangle-Three-Buckets eller "minmaks" for
+            minste og største verdi per bøtte
+
+    Returns:
+        pd.Series: utvalg av serien med opprinnelig indeks
+
+    Raises:
+        ValueError: ved ukjent metode
+    """
+    if metode not in NEDSAMPLINGER:
+        raise ValueError(f"Ukjent nedsampling {metode}, støttet: {NEDSAMPLINGER}")
+    if maks_punkter is None or len(serie) <= maks_punkter:
+        return serie
+    y = serie.to_numpy(dtype=float, na_value=np.nan)
+    return serie.iloc[_nedsample_posisjoner(_x_verdier(serie.index), y, maks_punkter, metode)]
+
+
+def _x_verdier(indeks):
+    # numerisk x-akse for LTTB: nanosekunder for tid, verdien for tall, ellers posisjon
+    if isinstance(indeks, pd.DatetimeIndex):
+        return indeks.asi8.astype(float)
+    if pd.api.types.is_numeric_dtype(indeks):
+        return indeks.to_numpy(dtype=float)
+    return np.arange(len(indeks), dtype=float)
+
+
+def _nedsample_posisjoner(x, y, maks_punkter, metode="lttb"):
+    # posisjonene som beholdes av nedsample, blant punktene med gyldig y
+    gyldig = np.flatnonzero(np.isfinite(y))
+    if maks_punkter is None or len(gyldig) <= maks_punkter:
+        return gyldig
+    if metode == "minmaks":
+        return gyldig[_minmaks_indekser(y[gyldig], maks_punkter)]
+    return gyldig[_lttb_indekser(x[gyldig], y[gyldig], maks_punkter)]
+
+
+TETTHETSMODUSER = ("auto", "full", "utvalg", "tetthet")
+
+
+def stratifisert_utvalg(df, n, lag=None, frø=0):
+    """
+    Trekker et tilfeldig utvalg på omtrent n rader. Med lag trekkes samme andel fra hver
+    gruppe, men minst én rad, slik at små grupper (f.eks. lokasjoner) ikke forsvinner.
+
+    Args:
+        df (pd.DataFrame): data det trekkes fra
+        n (int): ønsket antall rader
+        lag (str): kolonne det stratifiseres på. None gir vanlig tilfeldig utvalg
+        frø (int): frø for tilfeldighetsgeneratoren
+
+    Returns:
+        pd.DataFrame: utvalget i opprinnelig rekkefølge, eller df uendret hvis den er liten nok
+    """
+    if len(df) <= n:
+        return df
+    if lag is None:
+        return df.sample(n=n, random_state=frø).sort_index()
+    andel = n / len(df)
+    rng = np.random.default_rng(frø)
+    valgt = [rng.choice(rader, size=min(len(rader), max(1, round(andel * len(rader)))), replace=False)
+             for rader in df.groupby(lag, observed=True).indices.values()]
+    return df.iloc[np.sort(np.concatenate(valgt))]
+
+
+def _velg_modus(modus, antall_rader, maks_rader):
+    if modus not in TETTHETSMODUSER:
+        raise ValueError(f"Ukjent modus {modus}, støttet: {TETTHETSMODUSER}")
+    if modus == "auto":
+        return "full" if antall_rader <= maks_rader else "tetthet"
+    return modus
+
+
+def _kanter(serie, bins):
+    verdier = serie.to_numpy(dtype=float)
+    verdier = verdier[np.isfinite(verdier)]
+    if len(verdier) == 0:
+        return np.linspace(0.0, 1.0, bins + 1)
+    return np.histogram_bin_edges(verdier, bins=bins)
+
+
+def _tegn_tetthet_2d(ax, x, y, x_kanter, y_kanter):
+    # 2-D-histogram beregnet med numpy og tegnet som ett pcolormesh, uavhengig av antall rader
+    from matplotlib.colors import LogNorm
+    xv, yv = x.to_numpy(dtype=float), y.to_numpy(dtype=float)
+    gyldig = np.isfinite(xv) & np.isfinite(yv)
+    teller, _, _ = np.histogram2d(xv[gyldig], yv[gyldig], bins=[x_kanter, y_kanter])
+    teller = np.ma.masked_equal(teller, 0)
+    norm = LogNorm(vmin=1, vmax=max(float(teller.max()), 1.0)) if teller.count() else None
+    return ax.pcolormesh(x_kanter, y_kanter, teller.T, cmap="viridis", norm=norm)
+
+
+def _tegn_marginal(ax, df, kol, kanter, hue=None, orientation="vertical"):
+    # forhåndsberegnede marginalfordelinger tegnet som trappelinjer, én per hue-verdi
+    grupper = [(kol, df[kol])] if hue is None else [(navn, g[kol]) for navn, g in df.groupby(hue, observed=True)]
+    for navn, serie in grupper:
+        verdier = serie.to_numpy(dtype=float)
+        teller, _ = np.histogram(verdier[np.isfinite(verdier)], bins=kanter)
+        ax.stairs(teller, kanter, orientation=orientation, fill=hue is None, alpha=0.6, label=str(navn))
+
+
+# Tegnefunksjonene tegner på en gitt akse og bruker ikke global pyplot-tilstand,
+# slik at de kan brukes både fra plott_*-metodene og fra render_batch i en prosesspool.
+
+def _tegn_tidsserie(ax, df, kol, maks_punkter=None, nedsampling="lttb"):
+    ax.plot(nedsample(df[kol], maks_punkter, nedsampling), label=kol, linewidth=2)
+    ax.set_title(f"Tidsserie: {kol}")
+    ax.set_xlabel("Tid")
+    ax.set_ylabel(kol)
+    ax.grid(True)
+    ax.legend()
+
+def _tegn_histogram(ax, df, kol):
+    sns.histplot(data=df, x=kol, kde=True, bins=30, ax=ax)
+    ax.set_title(f"Histogram av {kol}")
+    ax.set_xlabel(kol)
+    ax.grid(True)
+
+def _tegn_boxplot(ax, df, gruppe, verdi):
+    sns.boxplot(data=df, x=gruppe, y=verdi, ax=ax)
+    ax.set_title(f"Fordeling av {verdi} per {gruppe}")
+    ax.grid(True, axis="y")
+
+def _tegn_korrelasjonsmatrise(ax, df, korr=None):
+    if korr is None:
+        from data_analysis import DataAnalyse
+        korr = DataAnalyse(df).korrelasjonsmatrise()
+    sns.heatmap(korr, annot=True, cmap="coolwarm", center=0, linewidths=0.5, ax=ax)
+    ax.set_title("Korrelasjonsmatrise for miljøvaraibler", fontsize=14)
+    ax.tick_params(axis="x", labelrotation=45)
+    for etikett in ax.get_xticklabels():
+        etikett.set_horizontalalignment("right")
+    ax.tick_params(axis="y", labelrotation=0)
+
+def _tegn_trend(ax, df, kol, vindu=7, trend=None, maks_punkter=None, nedsampling="lttb"):
+    if trend is None:
+        trend = df[kol].rolling(window=vindu, min_periods=1).mean()
+    ax.plot(nedsample(df[kol], maks_punkter, nedsampling), label="Rådata", alpha=0.5)
+    ax.plot(nedsample(trend, maks_punkter, nedsampling), label=f"{vindu}-dagers glidende gjennomsnitt", linewidth=2)
+    ax.set_title(f"Trendanalyse for {kol}")
+    ax.legend()
+    ax.grid(True)
+
+def _tegn_scatter(ax, df, x, y, tittel=None):
+    sns.scatterplot(data=df, x=x, y=y, alpha=0.7, ax=ax)
+    ax.set_title(tittel or f"Scatter: {x} vs {y}")
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.grid(True)
+
+TEGNERE = {
+    "tidsserie": _tegn_tidsserie,
+    "histogram": _tegn_histogram,
+    "boxplot": _tegn_boxplot,
+    "korrelasjonsmatrise": _tegn_korrelasjonsmatrise,
+    "trend": _tegn_trend,
+    "scatter": _tegn_scatter,
+}
+
+# DataFrame og mappe for hver arbeiderprosess, satt én gang av _start_arbeider
+_arbeider_data = {}
+
+def _start_arbeider(df, bildemappe):
+    import matplotlib
+    matplotlib.use("Agg")
+    _arbeider_data["df"] = df
+    _arbeider_data["bildemappe"] = bildemappe
+
+def _render_i_arbeider(spec):
+    return _render_spec(spec, _arbeider_data["df"], _arbeider_data["bildemappe"])
+
+def _normaliser_filnavn(filnavn):
+    # samme regel som lagre_plot: .png når filendelse mangler
+    return filnavn if os.path.splitext(filnavn)[1] else filnavn + ".png"
+
+def _spec_filnavn(spec):
+    # verdiene kvoteres som i ForecastArkiv, så "Oslo/Blindern" ikke blir en undermappe
+    navngitte = ("kol", "x", "y", "verdi", "gruppe")
+    deler = [spec["type"]] + [spec[k] for k in navngitte if k in spec]
+    deler += list(spec.get("filter", {}).values())
+    # øvrige argumenter (f.eks. vindu eller figsize) gir en kort hash, så specs som bare
+    # skiller seg der ikke skriver over hverandre
+    resten = {k: v for k, v in spec.items() if k not in ("type", "filnavn", "filter", *navngitte)}
+    if resten:
+        deler.append(hashlib.sha1(json.dumps(resten, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:8])
+    return "_".join(quote(str(del_), safe="") for del_ in deler) + ".png"
+
+def _render_spec(spec, df, bildemappe):
+    """
+    Tegner én figur fra en spec med objektorientert Figure og Agg-lerret (uten pyplot),
+    lagrer den og returnerer stien.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    spec = dict(spec)
+    type_ = spec.pop("type")
+    if type_ not in TEGNERE:
+        raise ValueError(f"Ukjent figurtype {type_}, støttet: {sorted(TEGNERE)}")
+    filnavn = spec.pop("filnavn", None) or _spec_filnavn({"type": type_, **spec})
+    filter_ = spec.pop("filter", {})
+    figsize = spec.pop("figsize", FIGURSTØRRELSER[type_])
+    for kol, verdi in filter_.items():
+        df = df[df[kol] == verdi]
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    TEGNERE[type_](fig.add_subplot(), df, **spec)
+    fig.tight_layout()
+    os.makedirs(bildemappe, exist_ok=True)
+    full_sti = os.path.join(bildemappe, filnavn)
+    fig.savefig(full_sti)
+    return full_sti
+
+
+class FigurCache:
+    """
+    Cache for lagrede figurer. Nøkkelen er en hash av innholdet i kolonnene figuren
+    bygger på (inkludert indeksen) og plottargumentene. Er bildet allerede lagret med
+    samme nøkkel hoppes tegningen over. Et manifest i bildemappen holder nøkkel,
+    størrelse og sist brukt per fil, og de minst nylig brukte bildene slettes når
+    grensene for antall filer eller bytes overskrides.
+    """
+    MANIFEST = ".figurcache.json"
+    VERSJON = 1
+
+    def __init__(self, bildemappe=None, maks_filer=None, maks_bytes=None):
+        """
+        Args:
+            bildemappe: mappe for bildene. Standard er "bilder/" i prosjektroten
+            maks_filer: største antall bilder i cachen, None for ingen grense
+            maks_bytes: største samlede størrelse i bytes, None for ingen grense
+        """
+        self.bildemappe = bildemappe or BILDEMAPPE
+        self.maks_filer = maks_filer
+        self.maks_bytes = maks_bytes
+        self._manifest_sti = os.path.join(self.bildemappe, self.MANIFEST)
+        self.manifest = self._les_manifest()
+        self._endret = False
+
+    def _les_manifest(self):
+        try:
+            with open(self._manifest_sti, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _skriv_manifest(self):
+        os.makedirs(self.bildemappe, exist_ok=True)
+        tmp = f"{self._manifest_sti}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._manifest_sti)
+
+    def nøkkel(self, df, kolonner, type, **args):
+        """
+        Lager cachenøkkel fra dataene og argumentene.
+
+        Args:
+            df: DataFrame figuren tegnes fra
+            kolonner: kolonnene figuren bruker. None betyr alle
+            type: figurtype
+            **args: plottargumenter
+
+        Returns:
+            str: sha256-heksadesimal
+        """
+        data = df if kolonner is None else df[list(dict.fromkeys(kolonner))]
+        h = hashlib.sha256()
+        h.update(json.dumps([self.VERSJON, matplotlib.__version__, sns.__version__, type, args, list(data.columns)],
+                            sort_keys=True, default=str).encode())
+        h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        return h.hexdigest()
+
+    def er_fersk(self, filnavn, nøkkel):
+        """
+        Sjekker om bildet finnes med samme nøkkel, og merker det i så fall som brukt.
+        Endringen skrives først til disk ved lagre().
+        """
+        filnavn = _normaliser_filnavn(filnavn)
+        oppføring = self.manifest.get(filnavn)
+        if oppføring is None or oppføring["nøkkel"] != nøkkel:
+            return False
+        self._endret = True
+        if not os.path.isfile(os.path.join(self.bildemappe, filnavn)):
+            del self.manifest[filnavn]
+            return False
+        oppføring["brukt"] = time.time()
+        return True
+
+    def registrer(self, filnavn, nøkkel):
+        """
+        Registrerer et nylig lagret bilde og sletter de minst nylig brukte ved behov.
+        Endringen skrives først til disk ved lagre().
+
+        Returns:
+            list[str]: filnavn som ble slettet
+        """
+        filnavn = _normaliser_filnavn(filnavn)
+        sti = os.path.join(self.bildemappe, filnavn)
+        self.manifest[filnavn] = {"nøkkel": nøkkel, "bytes": os.path.getsize(sti), "brukt": time.time()}
+        self._endret = True
+        return self._rydd(behold=filnavn)
+
+    def lagre(self):
+        """
+        Skriver manifestet til disk dersom det er endret siden sist.
+        """
+        if self._endret:
+            self._skriv_manifest()
+            self._endret = False
+
+    def _rydd(self, behold=None):
+        slettet = []
+        etter_bruk = sorted(self.manifest, key=lambda f: self.manifest[f]["brukt"])
+        totalt = sum(o["bytes"] for o in self.manifest.values())
+        for filnavn in etter_bruk:
+            for_mange = self.maks_filer is not None and len(self.manifest) > self.maks_filer
+            for_stor = self.maks_bytes is not None and totalt > self.maks_bytes
+            if not (for_mange or for_stor):
+                break
+            if filnavn == behold:
+                continue
+            totalt -= self.manifest.pop(filnavn)["bytes"]
+            try:
+                os.remove(os.path.join(self.bildemappe, filnavn))
+            except FileNotFoundError:
+                pass
+            slettet.append(filnavn)
+        return slettet
+
 
 class DataVisualisering:
     """
     Klasse for visualiswering av miljødata. inneholder metoder for å plotte trender,
     sammenhenger, fordelingen og korrelasjoner basert på analyse av en DataFrame
     """
-    def __init__(self, df,):
+    def __init__(self, df, analyse=None, cache=None):
+        """
+        Args:
+            df: DataFrame som skal visualiseres
+            analyse: DataAnalyse for samme df. Gis den, deles cachet statistikk og
+                korrelasjonsmatrise med resten av programmet
+            cache: FigurCache. Gis den, tegnes lagrede figurer bare på nytt når dataene
+                eller argumentene er endret
+        """
         self.df = df
+        self._analyse = analyse
+        self.cache = cache
+
+    def _cache_nøkkel(self, type, kolonner, df=None, **args):
+        # None når cache ikke er i bruk
+        if self.cache is None:
+            return None
+        return self.cache.nøkkel(self.df if df is None else df, kolonner, type, **args)
+
+    def _lagre(self, fig, filnavn, nøkkel=None):
+        sti = self.lagre_plot(fig, filnavn, self.cache.bildemappe if self.cache is not None else None)
+        if nøkkel is not None:
+            self.cache.registrer(os.path.basename(sti), nøkkel)
+            self.cache.lagre()
+        return sti
+
+    def _er_fersk(self, filnavn, nøkkel):
+        # cachetreff i plott_*-metodene: merk bildet som brukt og skriv manifestet én gang
+        if nøkkel is None or not self.cache.er_fersk(filnavn, nøkkel):
+            return False
+        self.cache.lagre()
+        return True
+
+    @property
+    def analyse(self):
+        # opprettes første gang den trengs, og gjenbrukes av alle plottene
+        if self._analyse is None:
+            from data_analysis import DataAnalyse
+            self._analyse = DataAnalyse(self.df)
+        return self._analyse
     
-    def plott_tidserie(self, kol, filnavn=None, save=True):
+    @staticmethod
+    def lagre_plot(fig, filnavn, bildemappe=None):
+        """
+        Lagrer en figur i bildemappen og lukker den.
+
+        Args:
+            fig: matplotlib-figur
+            filnavn: navn på filen. Får .png dersom filendelse mangler
+            bildemappe: mappe for bildene. Standard er "bilder/" i prosjektroten
+
+        Returns:
+            str: full sti til filen
+        """
+        lagringsmappe = bildemappe or BILDEMAPPE
+        os.makedirs(lagringsmappe, exist_ok=True)
+        full_sti = os.path.join(lagringsmappe, _normaliser_filnavn(filnavn))
+        fig.savefig(full_sti)
+        plt.close(fig)
+        return full_sti
+
+    def render_batch(self, specs, arbeidere=None, bildemappe=None):
+        """
+        Tegner og lagrer mange figurer, eventuelt fordelt på en prosesspool. Hver figur
+        lages med Figure-API-et og Agg-lerretet, uten global pyplot-tilstand, så
+        prosessene ikke påvirker hverandre. DataFramen sendes én gang til hver prosess.
+
+        Args:
+            specs: liste med dicts, f.eks. {"type": "tidsserie", "kol": "Temperatur",
+                "filter": {"Lokasjon": "Oslo"}}. "type" er en av TEGNERE, de andre nøklene
+                er argumentene til tegnefunksjonen, pluss valgfrie "filter", "filnavn" og "figsize"
+            arbeidere: antall prosesser. None eller 1 tegner i denne prosessen
+            bildemappe: mappe for bildene. Standard er cachens mappe eller "bilder/" i prosjektroten.
+                Med FigurCache hoppes figurer over som er lagret med samme data og argumenter,
+                og bildemappe må da være cachens mappe
+
+        Returns:
+            list[str]: stier til figurene, i samme rekkefølge som specs
+
+        Raises:
+            ValueError: dersom en spec har ukjent type, eller bildemappe er en annen enn cachens mappe
+        """
+        if self.cache is not None:
+            if bildemappe and os.path.abspath(bildemappe) != os.path.abspath(self.cache.bildemappe):
+                raise ValueError(f"bildemappe {bildemappe} må være cachens mappe {self.cache.bildemappe}")
+            bildemappe = self.cache.bildemappe
+        bildemappe = bildemappe or BILDEMAPPE
+        specs = [dict(spec) for spec in specs]
+        for spec in specs:
+            if spec.get("type") not in TEGNERE:
+                raise ValueError(f"Ukjent figurtype {spec.get('type')}, støttet: {sorted(TEGNERE)}")
+            spec["filnavn"] = _normaliser_filnavn(spec.get("filnavn") or _spec_filnavn(spec))
+
+        stier = [os.path.join(bildemappe, spec["filnavn"]) for spec in specs]
+        nøkler = [self._spec_nøkkel(spec) for spec in specs]
+        # bare figurer som mangler eller har endret data eller argumenter tegnes
+        gjenstår = [i for i, nøkkel in enumerate(nøkler)
+                    if nøkkel is None or not self.cache.er_fersk(specs[i]["filnavn"], nøkkel)]
+        ventende = [specs[i] for i in gjenstår]
+
+        if not arbeidere or arbeidere < 2 or len(ventende) < 2:
+            for spec in ventende:
+                _render_spec(spec, self.df, bildemappe)
+        else:
+            bit = max(1, len(ventende) // (arbeidere * 4))
+            with ProcessPoolExecutor(max_workers=arbeidere, initializer=_start_arbeider,
+                                     initargs=(self.df, bildemappe)) as pool:
+                list(pool.map(_render_i_arbeider, ventende, chunksize=bit))
+
+        for i in gjenstår:
+            if nøkler[i] is not None:
+                self.cache.registrer(specs[i]["filnavn"], nøkler[i])
+        if self.cache is not None:
+            self.cache.lagre()
+        return stier
+
+    def _spec_nøkkel(self, spec):
+        # cachenøkkel for en render_batch-spec: bare de filtrerte radene og kolonnene den bruker
+        if self.cache is None:
+            return None
+        df = self.df
+        for kol, verdi in spec.get("filter", {}).items():
+            df = df[df[kol] == verdi]
+        kolonner = [spec[k] for k in ("kol", "x", "y", "gruppe", "verdi") if k in spec] or None
+        args = {k: v for k, v in spec.items() if k not in ("type", "filnavn")}
+        return self.cache.nøkkel(df, kolonner, spec["type"], **args)
+
+    def specs_per_gruppe(self, type, kolonner, by="Lokasjon"):
+        """
+        Lager specs for render_batch for hver kombinasjon av gruppe og kolonne,
+        f.eks. én tidsserie per lokasjon og variabel.
+
+        Args:
+            type: figurtype, f.eks. "tidsserie", "histogram" eller "trend"
+            kolonner: kolonnene det skal lages figur for
+            by: grupperingskolonne. None gir én figur per kolonne for hele datasettet
+
+        Returns:
+            list[dict]: specs
+        """
+        grupper = [None] if by is None else self.df[by].dropna().unique().tolist()
+        specs = []
+        for gruppe in grupper:
+            for kol in kolonner:
+                spec = {"type": type, "kol": kol}
+                if gruppe is not None:
+                    spec["filter"] = {by: gruppe}
+                specs.append(spec)
+        return specs
+
+    def plott_tidserie(self, kol, filnavn=None, save=True, maks_punkter=None, nedsampling="lttb"):
         """
         Plotter en tidsserie for en gitt kolonne.
 
         Args: 
             kol: navn på kolonnen som skal plottes over tid
             filnavn: navn på filen
+            maks_punkter: største antall punkter som tegnes. Lengre serier nedsamples
+            nedsampling: "lttb" eller "minmaks", se nedsample
         """
         if kol not in self.df.columns:
             raise ValueError(f"kolonnen {kol} finnes ikke i datasettet")
         
-        fig = plt.figure(figsize=(10,5))
-        plt.plot(self.df[kol], label=kol, linewidth=2)
-        plt.title(f"Tidsserie: {kol}")
-        plt.xlabel("Tid")
-        plt.ylabel(kol)
-        plt.grid(True)
-        plt.legend()
-        plt.tight_layout()
+        filnavn = filnavn or f"tidsserie_{kol}.png"
+        nøkkel = self._cache_nøkkel("tidsserie", [kol], kol=kol, maks_punkter=maks_punkter,
+                                    nedsampling=nedsampling) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=FIGURSTØRRELSER["tidsserie"])
+        _tegn_tidsserie(fig.add_subplot(), self.df, kol, maks_punkter, nedsampling)
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"tidsserie_{kol}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
             return None
         else:
             return fig
@@ -58,12 +600,15 @@ class DataVisualisering:
         if x not in self.df.columns or y not in self.df.columns:
             raise ValueError(f"kolonne {x} eller {y} finnes ikke i datasettet")
 
-        plt.figure(figsize=(9,6))
+        filnavn = filnavn or f"sammenheng_{x}_{y}.png"
+        nøkkel = self._cache_nøkkel("sammenheng", None if vis_outliers else [x, y], x=x, y=y, vis_outliers=vis_outliers, thresh=thresh) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=(9,6))
 
         if vis_outliers:
-            from data_analysis import DataAnalyse
-            analyzer = DataAnalyse(self.df)
-            outliers = analyzer.identifiser_outliers(thresh)
+            outliers = self.analyse.identifiser_outliers(thresh)
             normal = self.df.drop(index=outliers.index)
 
             # Plot normale datapunkter først (blå)
@@ -83,12 +628,7 @@ class DataVisualisering:
         plt.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"sammenheng_{x}_{y}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
@@ -103,20 +643,17 @@ class DataVisualisering:
         if kol not in self.df.columns:
             raise ValueError(f"Kolonne {kol} er ikke i datasettet")
         
-        plt.figure(figsize=(8,5))
-        sns.histplot(data=self.df, x=kol, kde=True, bins=30)
-        plt.title(f"Histogram av {kol}")
-        plt.xlabel(kol)
-        plt.grid(True)
-        plt.tight_layout()
+        filnavn = filnavn or f"histogram_{kol}.png"
+        nøkkel = self._cache_nøkkel("histogram", [kol], kol=kol) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=FIGURSTØRRELSER["histogram"])
+        _tegn_histogram(fig.add_subplot(), self.df, kol)
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"histogram_{kol}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
@@ -132,19 +669,17 @@ class DataVisualisering:
         if gruppe not in self.df.columns or verdi not in self.df.columns:
             raise ValueError(f"Kolonne {gruppe} eller {verdi} finnes ikke i datasett")
         
-        fig = plt.figure(figsize=(10,6))
-        sns.boxplot(data=self.df, x=gruppe, y=verdi)
-        plt.title(f"Fordeling av {verdi} per {gruppe}")
-        plt.grid(True, axis="y")
-        plt.tight_layout()
+        filenavn = filenavn or f"boxplot_{verdi}_per_{gruppe}.png"
+        nøkkel = self._cache_nøkkel("boxplot", [gruppe, verdi], gruppe=gruppe, verdi=verdi) if save else None
+        if self._er_fersk(filenavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=FIGURSTØRRELSER["boxplot"])
+        _tegn_boxplot(fig.add_subplot(), self.df, gruppe, verdi)
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"boxplot_{verdi}_per_{gruppe}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filenavn, nøkkel)
         else:
             return fig
 
@@ -155,47 +690,72 @@ class DataVisualisering:
         Args:
             filnavn: navn på filen
         """
-        corr=self.df.corr(numeric_only=True)
-        plt.figure(figsize=(10,8))
-        sns.heatmap(corr,annot=True,cmap="coolwarm",center=0,linewidths=0.5)
-        plt.title("Korrelasjonsmatrise for miljøvaraibler", fontsize=14)
-        plt.xticks(rotation=45, ha="right")
-        plt.yticks(rotation=0)
-        plt.tight_layout()
+        filnavn = filnavn or "korrelasjonsmatrise.png"
+        nøkkel = self._cache_nøkkel("korrelasjonsmatrise", None) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=FIGURSTØRRELSER["korrelasjonsmatrise"])
+        _tegn_korrelasjonsmatrise(fig.add_subplot(), self.df, korr=self.analyse.korrelasjonsmatrise())
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"korrelasjonsmatrise.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
-    def plott_pairplot(self, hue=None, filnavn=None, save=True):
+    def plott_pairplot(self, hue=None, filnavn=None, save=True, modus="auto", maks_rader=10_000, bins=50):
         """
         Lager et pairplot for sammenhenger og fordelinger mellom numeriske verdier
 
         Args:
             hue: kategorisk variabel for fargekoding
             filnavn: navn på filen
+            modus: "full" tegner alle punkter med seaborn, "utvalg" tegner et stratifisert
+                utvalg på maks_rader rader, "tetthet" tegner 2-D-histogrammer og binnede
+                marginaler for alle rader. "auto" velger "tetthet" over maks_rader rader
+            maks_rader: radgrense for "auto" og størrelse på utvalget
+            bins: antall bins per akse i tetthetsmodus
+
+        Raises:
+            ValueError: ved ukjent modus
         """
-        sns.pairplot(self.df, hue=hue)
-        plt.suptitle("sammenhenger mellom numeriske variabler", y = 1.02)
-        plt.tight_layout()
+        modus = _velg_modus(modus, len(self.df), maks_rader)
+        filnavn = filnavn or "pairplot_numetriske_verdier.png"
+        nøkkel = self._cache_nøkkel("pairplot", None, hue=hue, modus=modus, maks_rader=maks_rader,
+                                    bins=bins) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        if modus == "tetthet":
+            kolonner = [k for k in self.df.select_dtypes("number").columns if k != hue]
+            k = len(kolonner)
+            kanter = {kol: _kanter(self.df[kol], bins) for kol in kolonner}
+            fig, akser = plt.subplots(k, k, figsize=(2.5 * k, 2.5 * k), squeeze=False)
+            for i, rad in enumerate(kolonner):
+                for j, kol in enumerate(kolonner):
+                    ax = akser[i, j]
+                    if i == j:
+                        _tegn_marginal(ax, self.df, kol, kanter[kol], hue)
+                    else:
+                        _tegn_tetthet_2d(ax, self.df[kol], self.df[rad], kanter[kol], kanter[rad])
+                    ax.set_xlabel(kol if i == k - 1 else "")
+                    ax.set_ylabel(rad if j == 0 else "")
+            if hue is not None and k:
+                akser[0, 0].legend(title=hue, fontsize="small")
+            fig.suptitle("sammenhenger mellom numeriske variabler")
+        else:
+            data = self.df if modus == "full" else stratifisert_utvalg(self.df, maks_rader, hue)
+            fig = sns.pairplot(data, hue=hue).figure
+            plt.suptitle("sammenhenger mellom numeriske variabler", y = 1.02)
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"pairplot_numetriske_verdier.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
-    def plott_jointplot(self, x, y, hue=None, filnavn=None, save=True):
+    def plott_jointplot(self, x, y, hue=None, filnavn=None, save=True, modus="auto", maks_rader=10_000, bins=50):
         """
         Plotter et jointplot som kombinerer scatterplot og fordelingsgrafer
 
@@ -204,21 +764,42 @@ class DataVisualisering:
             y: kolonne for y-akse
             hue: variabel for fargekoding
             filnavn: navn på filen
+            modus: "full", "utvalg", "tetthet" eller "auto", se plott_pairplot. I tetthetsmodus
+                er sammenhengen et hexbin-plot og marginalene er binnet per hue-verdi
+            maks_rader: radgrense for "auto" og størrelse på utvalget
+            bins: antall bins for marginalene og hexbin-rutenettet
+
+        Raises:
+            ValueError: ved ukjent modus
         """
-        sns.jointplot(data=self.df, x=x, y=y, hue=hue, kind="scatter")
+        modus = _velg_modus(modus, len(self.df), maks_rader)
+        filnavn = filnavn or f"scatter&fordeling_{x}_vs_{y}.png"
+        nøkkel = self._cache_nøkkel("jointplot", [x, y] + ([hue] if hue else []), x=x, y=y, hue=hue, modus=modus,
+                                    maks_rader=maks_rader, bins=bins) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        if modus == "tetthet":
+            rutenett = sns.JointGrid()
+            gyldig = self.df[[x, y]].notna().all(axis=1)
+            rutenett.ax_joint.hexbin(self.df.loc[gyldig, x], self.df.loc[gyldig, y], gridsize=bins,
+                                     mincnt=1, bins="log", cmap="viridis")
+            rutenett.set_axis_labels(x, y)
+            _tegn_marginal(rutenett.ax_marg_x, self.df, x, _kanter(self.df[x], bins), hue)
+            _tegn_marginal(rutenett.ax_marg_y, self.df, y, _kanter(self.df[y], bins), hue, orientation="horizontal")
+            fig = rutenett.figure
+            fig.tight_layout()
+        else:
+            data = self.df if modus == "full" else stratifisert_utvalg(self.df, maks_rader, hue)
+            fig = sns.jointplot(data=data, x=x, y=y, hue=hue, kind="scatter").figure
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"scatter&fordeling_{x}_vs_{y}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
 
-    def plott_trend_vs_rådata(self, kol, vindu=7, filnavn=None, save=True):
+    def plott_trend_vs_rådata(self, kol, vindu=7, filnavn=None, save=True, maks_punkter=None, nedsampling="lttb"):
         """
         Plotter rådata og glidende gjennomsnitt for en kolonne i samme figur
 
@@ -226,25 +807,23 @@ class DataVisualisering:
             kol: Navn på kolonne som ska analyseres
             vindu: størrelse på glidende vindu for tredberegning
             filnavn: navn på filen
+            maks_punkter: største antall punkter per linje. Trenden beregnes på alle
+                punktene før nedsampling
+            nedsampling: "lttb" eller "minmaks", se nedsample
         """
-        from data_analysis import DataAnalyse
-        analyzer = DataAnalyse(self.df)
-        trend = analyzer.kolonne_trend(kol, vindu)
-        plt.figure(figsize=(10,5))
-        plt.plot(self.df[kol], label="Rådata", alpha=0.5)
-        plt.plot(trend, label=f"{vindu}-dagers glidende gjennomsnitt", linewidth=2)
-        plt.title(f"Trendanalyse for {kol}")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
+        filnavn = filnavn or f"trend_vs_rådata_for_{kol}.png"
+        nøkkel = self._cache_nøkkel("trend", [kol], kol=kol, vindu=vindu, maks_punkter=maks_punkter,
+                                    nedsampling=nedsampling) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=FIGURSTØRRELSER["trend"])
+        _tegn_trend(fig.add_subplot(), self.df, kol, vindu, trend=self.analyse.kolonne_trend(kol, vindu),
+                    maks_punkter=maks_punkter, nedsampling=nedsampling)
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"trend_vs_rådata_for_{kol}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
@@ -256,74 +835,46 @@ class DataVisualisering:
         Args:
             filnavn: navn på filen
         """
+        filnavn = filnavn or "manglende_verdier.png"
+        nøkkel = self._cache_nøkkel("manglende_verdier", None) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
         import missingno as msno
-        msno.matrix(self.df)
+        fig = msno.matrix(self.df).figure
         plt.title("Visualiserer manglende verdier")
         plt.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"manglende_verdier.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             plt.show()
 
-    def interaktiv_plot_trend(self, kol):
+    def interaktiv_plot_trend(self, kol, vinduer=range(1, 31), start_vindu=7, maks_punkter=2000,
+                              forsinkelse=30, vis=True):
         """
         Lager en interaktiv trendanalyse av en gitt kolonne. brukeren skal kunne justere størrelsen
         på den glidende vinduet ved hjelp av en slider, og se hvordan
-        trendene endrer seg visuelt i sanntid.
+        trendene endrer seg visuelt i sanntid. Et tidsintervall kan velges med en
+        intervallslider under, se TrendVisning.
 
         Args:
             kol: kolonnen som sakl visualiseres.
+            vinduer: vindusstørrelsene slideren kan velge mellom
+            start_vindu: vindu som vises først
+            maks_punkter: største antall punkter som tegnes for det valgte intervallet
+            forsinkelse: millisekunder uten nye slider-hendelser før figuren oppdateres
+            vis: om plt.show() skal kalles
+
+        Returns:
+            TrendVisning: visningen. Referansen må beholdes så lenge figuren er åpen
         """
-        from matplotlib.widgets import Slider
-        import numpy as np
-
-        # initialiserer figur og akse for plottet
-        fig, ax = plt.subplots()
-        plt.subplots_adjust(bottom=0.25)
-
-        # plott rådata som dtandardlinje
-        y_raw = self.df[kol].values
-        x_vals= np.arange(len(y_raw))
-        line, = ax.plot(self.df[kol], label="Rådata", alpha=0.5)
-
-        # opprett en tom linje for trend som oppdateres dynamisk
-        trend_line, = ax.plot([], [], label="Trend", color="red")
-
-        # opprett slider-akse og konfigurasjon
-        ax_vindu=plt.axes([0.25, 0.1, 0.65, 0.03])
-        vindu_slider = Slider(
-            ax_vindu, 
-            label="Vindu", 
-            valmin=1, 
-            valmax=30, 
-            valinit=7, 
-            valstep=1
-        )
-
-        def update(val):
-            from data_analysis import DataAnalyse
-            # hver gang slideren flyttes, beregn ny trend og oppdater grafen
-            analyzer = DataAnalyse(self.df)
-            trend = analyzer.kolonne_trend(kol, vindu=int(val))
-            trend_line.set_data(x_vals, trend) # ny trendlinje med ny data
-            ax.relim() # tilpass aksene til ny data
-            ax.autoscale_view()
-            fig.canvas.draw_idle() # tegn plottet på nytt
-
-        # vanlig konfig av plottet
-        update(7)
-        vindu_slider.on_changed(update)
-
-        ax.legend()
-        plt.title(f"Interaktiv trendanalyse for {kol}")
-        plt.grid(True)
-        plt.show()
+        if kol not in self.df.columns:
+            raise ValueError(f"kolonnen {kol} finnes ikke i datasettet")
+        visning = TrendVisning(self.df, kol, self.analyse, vinduer, start_vindu, maks_punkter, forsinkelse)
+        if vis:
+            plt.show()
+        return visning
 
     def plott_scatter(self, x, y, tittel=None, filnavn=None, save=True):
         """
@@ -342,21 +893,17 @@ class DataVisualisering:
         if x not in self.df.columns or y not in self.df.columns:
             raise ValueError(f"Kolonne {x} eller {y} finnes ikke i datasettet")
         
-        fig = plt.figure(figsize=(8,6))
-        sns.scatterplot(data=self.df, x=x, y=y, alpha=0.7)
-        plt.title(tittle or f"Scatter: {x} vs {y}")
-        plt.xlabel(x)
-        plt.ylabel(y)
-        plt.grid(True)
-        plt.tight_layout()
+        filnavn = filnavn or f"scatter_{x}_vs_{y}.png"
+        nøkkel = self._cache_nøkkel("scatter", [x, y], x=x, y=y, tittel=tittel) if save else None
+        if self._er_fersk(filnavn, nøkkel):
+            return None
+
+        fig = plt.figure(figsize=FIGURSTØRRELSER["scatter"])
+        _tegn_scatter(fig.add_subplot(), self.df, x, y, tittel)
+        fig.tight_layout()
 
         if save:
-            prosjektrot = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-            lagringsmappe = os.path.join(prosjektrot, "bilder")
-            os.makedirs(lagringsmappe, exist_ok=True)
-            full_sti = os.path.join(lagringsmappe, f"scatter_{x}_vs_{y}.png")
-            plt.savefig(full_sti)
-            plt.close()
+            self._lagre(fig, filnavn, nøkkel)
         else:
             return fig
             
@@ -401,3 +948,128 @@ def vis_alle_figurer(bildemappe="bilder", kolonner=2, figur_bredde=6):
     plt.tight_layout()
     plt.show()
 
+
+class TrendVisning:
+    """
+    Interaktiv visning av rådata og glidende gjennomsnitt med slider for vindu og
+    intervallslider for tidsrom.
+
+    Trendene for alle vinduene regnes ut på forhånd, men bare for punktene som tegnes
+    i det valgte tidsrommet (høyst maks_punkter, valgt med LTTB). Flytting av
+    vindusslideren er da et oppslag i en ferdig tabell. Bare trendlinjen tegnes på nytt
+    med blitting, og aksene og rådata gjenbrukes fra en lagret bakgrunn. Hendelser fra
+    sliderne samles opp med en timer, slik at bare den siste verdien tegnes når brukeren
+    drar raskt.
+    """
+
+    def __init__(self, df, kol, analyse, vinduer=range(1, 31), start_vindu=7, maks_punkter=2000, forsinkelse=30):
+        """
+        Args:
+            df: DataFrame med kolonnen
+            kol: kolonnen som vises
+            analyse: DataAnalyse for df, brukes til trendene
+            vinduer: vindusstørrelser i antall rader, i stigende rekkefølge
+            start_vindu: vindu som vises først
+            maks_punkter: største antall punkter per linje
+            forsinkelse: millisekunder før en slider-hendelse tegnes
+        """
+        from matplotlib.widgets import Slider, RangeSlider
+
+        self.kol = kol
+        self.analyse = analyse
+        self.vinduer = list(vinduer)
+        self.maks_punkter = maks_punkter
+        self._y = df[kol].to_numpy(dtype=float, na_value=np.nan)
+        self._x = _x_verdier(df.index) if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df), dtype=float)
+        self._tidsakse = isinstance(df.index, pd.DatetimeIndex)
+        self._vindu = start_vindu if start_vindu in self.vinduer else self.vinduer[0]
+        self._bakgrunn = None
+        self._ventende = {}
+
+        self.fig, self.ax = plt.subplots(figsize=FIGURSTØRRELSER["trend"])
+        self.fig.subplots_adjust(bottom=0.28)
+        self.rå_linje, = self.ax.plot([], [], label="Rådata", alpha=0.5)
+        # animated=True holder trendlinjen utenfor vanlig tegning, den tegnes bare ved blitting
+        self.trend_linje, = self.ax.plot([], [], label="Trend", color="red", animated=True)
+        self.ax.set_title(f"Interaktiv trendanalyse for {kol}")
+        self.ax.grid(True)
+        self.ax.legend()
+
+        n = len(self._y)
+        self.vindu_slider = Slider(self.fig.add_axes([0.25, 0.12, 0.65, 0.03]), label="Vindu",
+                                   valmin=self.vinduer[0], valmax=self.vinduer[-1], valinit=self._vindu,
+                                   valstep=self.vinduer)
+        self.område_slider = RangeSlider(self.fig.add_axes([0.25, 0.05, 0.65, 0.03]), label="Tidsrom",
+                                         valmin=0, valmax=max(n - 1, 1), valinit=(0, max(n - 1, 1)), valstep=1)
+        self.område_slider.valtext.set_visible(False)
+
+        self._timer = self.fig.canvas.new_timer(interval=forsinkelse)
+        self._timer.single_shot = True
+        self._timer.add_callback(self._utfør_ventende)
+        self.vindu_slider.on_changed(lambda verdi: self._planlegg("vindu", int(verdi)))
+        self.område_slider.on_changed(lambda verdi: self._planlegg("område", verdi))
+        self.fig.canvas.mpl_connect("draw_event", self._ved_tegning)
+
+        self.vis_område(0, n - 1)
+
+    def _planlegg(self, hva, verdi):
+        # nye hendelser overskriver ventende verdier og starter timeren på nytt
+        self._ventende[hva] = verdi
+        self._timer.stop()
+        self._timer.start()
+
+    def _utfør_ventende(self):
+        ventende, self._ventende = self._ventende, {}
+        if "område" in ventende:
+            self.vis_område(*ventende["område"])
+        if "vindu" in ventende:
+            self.vis_vindu(ventende["vindu"])
+
+    def _ved_tegning(self, event):
+        # etter hver full tegning: lagre bakgrunnen uten trendlinjen og tegn den oppå
+        canvas = self.fig.canvas
+        if canvas.supports_blit:
+            self._bakgrunn = canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.trend_linje)
+
+    def vis_område(self, fra, til):
+        """
+        Velger tidsrommet som vises (radposisjoner, inkludert til). Velger punktene som
+        tegnes, regner ut trendene for alle vinduer i de punktene og tegner figuren på nytt.
+        """
+        fra, til = int(max(fra, 0)), int(min(til, len(self._y) - 1))
+        utsnitt = slice(fra, til + 1)
+        self.posisjoner = fra + _nedsample_posisjoner(self._x[utsnitt], self._y[utsnitt], self.maks_punkter)
+        self.trender = self.analyse.trender_ved(self.kol, self.vinduer, self.posisjoner)
+        x = self._x_til_akse(self._x[self.posisjoner])
+        self.rå_linje.set_data(x, self._y[self.posisjoner])
+        self.trend_linje.set_xdata(x)
+        self.trend_linje.set_ydata(self.trender[self.vinduer.index(self._vindu)])
+        if len(x):
+            # trenden er et gjennomsnitt av rådata og holder seg innenfor samme y-område
+            gyldige = self._y[self.posisjoner]
+            margin = 0.05 * (gyldige.max() - gyldige.min()) or 0.5
+            if x[0] != x[-1]:
+                self.ax.set_xlim(x[0], x[-1])
+            self.ax.set_ylim(gyldige.min() - margin, gyldige.max() + margin)
+        self._bakgrunn = None
+        self.fig.canvas.draw_idle()
+
+    def vis_vindu(self, vindu):
+        """
+        Viser trenden for et nytt vindu. Med blitting tegnes bare trendlinjen på nytt.
+        """
+        self._vindu = vindu
+        self.trend_linje.set_ydata(self.trender[self.vinduer.index(vindu)])
+        canvas = self.fig.canvas
+        if self._bakgrunn is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._bakgrunn)
+        self.ax.draw_artist(self.trend_linje)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def _x_til_akse(self, x):
+        # tilbake til datetime64 for tidsakser, så matplotlib viser datoer
+        return x.astype("datetime64[ns]") if self._tidsakse else x
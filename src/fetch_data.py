@@ -1,20 +1,161 @@
 import requests
 import pandas as pd
 import os 
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pandas.api.types import union_categoricals
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 
+from data_storage import DataLagring
+
+class _RateBegrenser:
+    """
+    Trådsikker begrensning av antall forespørsler per sekund, delt mellom alle arbeidere.
+    """
+
+    def __init__(self, maks_per_sekund):
+        self.intervall = 1.0 / maks_per_sekund if maks_per_sekund else 0.0
+        self._neste = time.monotonic()
+        self._lås = threading.Lock()
+
+    def vent(self):
+        if not self.intervall:
+            return
+        with self._lås:
+            nå = time.monotonic()
+            start = max(nå, self._neste)
+            self._neste = start + self.intervall
+        if start > nå:
+            time.sleep(start - nå)
+
+
+class _TeeLeser:
+    """
+    Fil-lignende innpakning som kopierer alt som leses fra kilden til en annen fil.
+    """
+
+    def __init__(self, kilde, kopi):
+        self.kilde = kilde
+        self.kopi = kopi
+
+    def read(self, n=-1):
+        data = self.kilde.read(n)
+        self.kopi.write(data)
+        return data
+
+
+class _TimeseriesBuffer:
+    """
+    Kolonnebuffere for Locationforecast-tidssteg. Hvert tidssteg skrives rett inn i
+    forhåndsallokerte NumPy-arrayer; kolonner opprettes første gang en sti dukker opp.
+    """
+
+    def __init__(self, kapasitet, dtype=np.float64):
+        self.kapasitet = kapasitet
+        self.dtype = dtype
+        self.antall = 0
+        self.tider = np.empty(kapasitet, dtype=object)
+        self.tall = {}
+        self.koder = {}
+        self.rekkefølge = []
+        self.mål = {}
+
+    def _finn_mål(self, sti, verdi):
+        # slår opp (eller oppretter) arrayen for en sti første gang den dukker opp
+        kol = "_".join(("data",) + sti)
+        if isinstance(verdi, str):
+            if kol not in self.koder:
+                self.koder[kol] = (np.full(self.kapasitet, -1, dtype=np.int16), {})
+                self.rekkefølge.append(kol)
+            self.mål[sti] = self.koder[kol]
+        else:
+            if kol not in self.tall:
+                self.tall[kol] = np.full(self.kapasitet, np.nan, dtype=self.dtype)
+                self.rekkefølge.append(kol)
+            self.mål[sti] = self.tall[kol]
+        return self.mål[sti]
+
+    def _sett(self, sti, i, verdi):
+        if isinstance(verdi, dict):
+            for nøkkel, under in verdi.items():
+                self._sett(sti + (nøkkel,), i, under)
+            return
+        if verdi is None:
+            return
+        kolonne = self.mål.get(sti)
+        if kolonne is None:
+            kolonne = self._finn_mål(sti, verdi)
+        if isinstance(kolonne, tuple):
+            kodearray, kategorier = kolonne
+            kodearray[i] = kategorier.setdefault(verdi, len(kategorier))
+        else:
+            kolonne[i] = verdi
+
+    def legg_til(self, steg):
+        i = self.antall
+        self.tider[i] = steg.get("time")
+        mål = self.mål
+        # Locationforecast har fast form data -> blokk -> gruppe -> verdier,
+        # så de tre nivåene løkkes eksplisitt og _sett() brukes bare ved avvik
+        for blokk, innhold in steg.get("data", {}).items():
+            if not isinstance(innhold, dict):
+                self._sett((blokk,), i, innhold)
+                continue
+            for gruppe, verdier in innhold.items():
+                if not isinstance(verdier, dict):
+                    self._sett((blokk, gruppe), i, verdier)
+                    continue
+                for nøkkel, verdi in verdier.items():
+                    kolonne = mål.get((blokk, gruppe, nøkkel))
+                    if kolonne is None or isinstance(kolonne, tuple) or verdi is None:
+                        self._sett((blokk, gruppe, nøkkel), i, verdi)
+                    else:
+                        kolonne[i] = verdi
+        self.antall += 1
+
+    def til_dataframe(self):
+        n = self.antall
+        kolonner = {"time": pd.to_datetime(self.tider[:n], utc=True, format="ISO8601")}
+        for kol in self.rekkefølge:
+            if kol in self.tall:
+                kolonner[kol] = self.tall[kol][:n]
+            else:
+                kodearray, kategorier = self.koder[kol]
+                kolonner[kol] = pd.Categorical.from_codes(kodearray[:n], categories=list(kategorier))
+        return pd.DataFrame(kolonner)
+
+
 class FetchData:
     """
     Klasse for å hente og flate ut JSON-data fra MET.no Locationforcast2.0 API
     """
 
-    def __init__(self, base_url=None, user_agent=None):
+    # antall svartider som tas vare på, så minnebruken ikke vokser med antall kall
+    MAKS_LATENSER = 10_000
+
+    def __init__(self, base_url=None, user_agent=None, cache_dir=None, pool_størrelse=10,
+                 timeout=(3.05, 10), maks_forsøk=3, backoff=0.5, kompakt=False):
         """
         initialiserer FetchData med base-URL og User-Agent
 
         Args:
             base_url(str): grunn_URL til MET.no API
             user_agent(str): påkrevd HTTP-header for legitim forespørsel.
+            cache_dir(str): mappe for lokal svar-cache. None slår av cachen.
+            pool_størrelse(int): antall gjenbrukbare keep-alive tilkoblinger per vert
+            timeout(tuple): (connect, read) timeout i sekunder
+            maks_forsøk(int): maks antall nye forsøk ved 429/5xx og tilkoblingsfeil
+            backoff(float): faktor for eksponentiell ventetid mellom forsøk
+            kompakt(bool): lagre måleverdier som float32 i stedet for float64
         Raise:
             ValueError: dersom base url eller user agent er tomme
         """
@@ -30,10 +171,83 @@ class FetchData:
         self.headers = {
             "User-Agent": self.user_agent
         }
+
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.timeout = timeout
+        self.flyttall = np.float32 if kompakt else np.float64
+        self.session = self._lag_session(pool_størrelse, maks_forsøk, backoff)
+        self._latenser = deque(maxlen=self.MAKS_LATENSER)
+        self._latens_lås = threading.Lock()
+        self.siste_feil = {}
+
+    def _lag_session(self, pool_størrelse, maks_forsøk, backoff):
+        """
+        Lager en requests.Session med tilkoblingspool og automatiske nye forsøk.
+        Retry-After fra API-et respekteres ved 429 og 503.
+
+        Returns:
+            requests.Session: session med headers og adapter montert
+        """
+        retry = Retry(
+            total=maks_forsøk,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_størrelse, pool_maxsize=pool_størrelse, max_retries=retry)
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def lukk(self):
+        """
+        Lukker tilkoblingene i sessionen.
+        """
+        self.session.close()
+
+    def latens_statistikk(self):
+        """
+        Oppsummerer svartid for de siste MAKS_LATENSER nettverkskallene gjort av denne
+        instansen. Cache-treff som ikke går mot nettverket telles ikke.
+
+        Returns:
+            dict: antall, snitt_ms, median_ms, p95_ms og maks_ms
+        """
+        with self._latens_lås:
+            latenser = np.array(self._latenser, dtype=float) * 1000
+        if latenser.size == 0:
+            return {"antall": 0, "snitt_ms": None, "median_ms": None, "p95_ms": None, "maks_ms": None}
+        return {
+            "antall": int(latenser.size),
+            "snitt_ms": float(latenser.mean()),
+            "median_ms": float(np.median(latenser)),
+            "p95_ms": float(np.percentile(latenser, 95)),
+            "maks_ms": float(latenser.max()),
+        }
+
+    def _get(self, url, params, headers=None, **kwargs):
+        """
+        Sender GET gjennom sessionen med timeout og registrerer svartiden.
+        """
+        start = time.perf_counter()
+        try:
+            return self.session.get(url, params=params, headers=headers, timeout=self.timeout, **kwargs)
+        finally:
+            with self._latens_lås:
+                self._latenser.append(time.perf_counter() - start)
     
     def hent_data(self, endpoint, params):
         """
-        Henter JSON-data fra MET.no API
+        Henter JSON-data fra MET.no API. Dersom cache_dir er satt brukes en lokal
+        cache: ferske svar (før Expires) returneres uten nettverkskall, og utgåtte
+        svar revalideres med If-Modified-Since slik at API-et kan svare 304.
 
         Args: 
             endpoint(str): Sti eller base_url
@@ -43,22 +257,137 @@ class FetchData:
             dict: Deserialisert JSON-respons
         
         Raise:
-            requets.HTTPError: Ved HTTP-feil.
+            requets.HTTPError: Ved HTTP-feil etter at nye forsøk er brukt opp.
+            requests.Timeout: dersom tilkobling eller lesing overskrider timeout
             ValueError: Ved feil under JSON-parsing
         """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        cache = self._les_cache(url, params) if self.cache_dir else None
+        if cache is not None and self._er_fersk(cache["meta"]):
+            return cache["data"]
+
+        headers = {}
+        if cache is not None and cache["meta"].get("last_modified"):
+            headers["If-Modified-Since"] = cache["meta"]["last_modified"]
         try:
-            resp = requests.get(url, params = params, headers = self.headers)
+            resp = self._get(url, params, headers=headers)
+            if resp.status_code == 304 and cache is not None:
+                self._oppdater_cache_meta(url, params, cache["meta"], resp.headers)
+                return cache["data"]
             resp.raise_for_status()
-            return resp.json()
+            data = resp.json()
         except requests.HTTPError as e:
             raise requests.HTTPError(f"HTTP-feil {e}")
         except ValueError as e:
             raise ValueError(f"Kunne ikke parse JSON: {e}")
 
+        if self.cache_dir:
+            self._skriv_cache(url, params, resp.content, resp.headers)
+        return data
+
+    def _cache_nøkkel(self, url, params):
+        """
+        Lager en stabil filnøkkel for (url, params).
+        """
+        nøkkel = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(nøkkel.encode("utf-8")).hexdigest()
+
+    def _cache_stier(self, url, params):
+        """
+        Returnerer stiene til body- og metadatafilen for en cache-oppføring.
+        """
+        nøkkel = self._cache_nøkkel(url, params)
+        body_sti = os.path.join(self.cache_dir, f"{nøkkel}.json")
+        meta_sti = os.path.join(self.cache_dir, f"{nøkkel}.meta.json")
+        return body_sti, meta_sti
+
+    def _les_cache(self, url, params):
+        """
+        Leser en cache-oppføring fra disk.
+
+        Returns:
+            dict | None: {"data": ..., "meta": ...} eller None dersom oppføringen mangler eller er ødelagt
+        """
+        body_sti, meta_sti = self._cache_stier(url, params)
+        if not os.path.isfile(body_sti):
+            return None
+        meta = self._les_cache_meta(meta_sti)
+        if meta is None:
+            return None
+        try:
+            with open(body_sti, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return {"data": data, "meta": meta}
+
+    @staticmethod
+    def _les_cache_meta(meta_sti):
+        try:
+            with open(meta_sti, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _skriv_cache(self, url, params, innhold, headers):
+        """
+        Lagrer rå respons og Expires/Last-Modified på disk. Skriver til en 
+        midlertidig fil først slik at en avbrutt skriving ikke etterlater en halv oppføring.
+        innhold=None oppdaterer bare metadata, for når body allerede er skrevet.
+        """
+        body_sti, meta_sti = self._cache_stier(url, params)
+        meta = {
+            "url": url,
+            "params": params,
+            "expires": headers.get("Expires"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        if innhold is not None:
+            self._skriv_atomisk(body_sti, innhold)
+        self._skriv_atomisk(meta_sti, json.dumps(meta, default=str).encode("utf-8"))
+
+    def _oppdater_cache_meta(self, url, params, meta, headers):
+        """
+        Oppdaterer utløpstid etter et 304-svar. Innholdet på disk er uendret.
+        """
+        meta = dict(meta)
+        if headers.get("Expires"):
+            meta["expires"] = headers["Expires"]
+        if headers.get("Last-Modified"):
+            meta["last_modified"] = headers["Last-Modified"]
+        _, meta_sti = self._cache_stier(url, params)
+        self._skriv_atomisk(meta_sti, json.dumps(meta, default=str).encode("utf-8"))
+
+    @staticmethod
+    def _skriv_atomisk(sti, innhold):
+        tmp = f"{sti}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(innhold)
+        os.replace(tmp, sti)
+
+    @staticmethod
+    def _er_fersk(meta):
+        """
+        Sjekker om en cache-oppføring fortsatt er gyldig etter Expires-headeren.
+
+        Returns:
+            bool: True dersom Expires ligger frem i tid
+        """
+        expires = meta.get("expires")
+        if not expires:
+            return False
+        try:
+            utløper = parsedate_to_datetime(expires)
+        except (TypeError, ValueError):
+            return False
+        if utløper.tzinfo is None:
+            utløper = utløper.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) < utløper
+
     def flat_ut(self, data, path):
         """
-        Flater ut en nested liste i JSON til flat DataFrame
+        Flater ut en nested liste i JSON til flat DataFrame. Locationforecast sin
+        "timeseries"-liste flates ut med flat_ut_timeseries, andre stier med pd.json_normalize.
 
         Args:
             data (dict): JSON-data fra hent_data()
@@ -75,30 +404,272 @@ class FetchData:
             if nøkkel not in node:
                 raise KeyError(f"Nøkkel {nøkkel} mangler i API-data")
             node = node[nøkkel]
+        if path.split(".")[-1] == "timeseries" and isinstance(node, list):
+            return self.flat_ut_timeseries(node)
         return pd.json_normalize(node, sep="_")
 
+    def flat_ut_timeseries(self, timeseries):
+        """
+        Flater ut Locationforecast sin timeseries-liste i én gjennomgang. Verdiene skrives
+        rett inn i forhåndsallokerte NumPy-arrayer i stedet for å bygge mellomliggende dicts.
+        Kolonnenavnene er de samme som pd.json_normalize(sep="_") gir.
+
+        Args:
+            timeseries (list): listen properties.timeseries fra API-et
+
+        Returns:
+            pd.DataFrame: "time" som datetime64[ns, UTC], måleverdier som float64 (float32
+                med kompakt=True) og symbolkoder som category
+        """
+        buffer = _TimeseriesBuffer(len(timeseries), self.flyttall)
+        for steg in timeseries:
+            buffer.legg_til(steg)
+        return buffer.til_dataframe()
+
+    def strøm_timeseries(self, endpoint, params, chunk_størrelse=1000):
+        """
+        Henter Locationforecast som strøm og parser properties.timeseries inkrementelt
+        med ijson. Hele JSON-treet bygges aldri i minnet; hvert tidssteg skrives direkte
+        inn i kolonnebuffere som gis ut som DataFrames på chunk_størrelse rader.
+        Med cache_dir satt leses ferske svar fra disk, og nye svar skrives til cachen
+        mens de parses.
+
+        Args:
+            endpoint (str): sti eller base_url
+            params (dict): URL-parametre som dictionary
+            chunk_størrelse (int): antall tidssteg per DataFrame
+
+        Yields:
+            pd.DataFrame: samme kolonner og dtyper som flat_ut_timeseries
+
+        Raises:
+            requests.HTTPError: ved HTTP-feil
+            ValueError: ved feil under JSON-parsing eller chunk_størrelse < 1
+        """
+        import ijson
+
+        if chunk_størrelse < 1:
+            raise ValueError("chunk_størrelse må være >= 1")
+
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        body_sti = meta = None
+        if self.cache_dir:
+            body_sti, meta_sti = self._cache_stier(url, params)
+            meta = self._les_cache_meta(meta_sti) if os.path.isfile(body_sti) else None
+
+        if meta is not None and self._er_fersk(meta):
+            with open(body_sti, "rb") as kilde:
+                yield from self._parse_strøm(ijson, kilde, chunk_størrelse, self.flyttall)
+            return
+
+        headers = {}
+        if meta is not None and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        resp = self._get(url, params, headers=headers, stream=True)
+        try:
+            if resp.status_code == 304 and meta is not None:
+                self._oppdater_cache_meta(url, params, meta, resp.headers)
+                with open(body_sti, "rb") as kilde:
+                    yield from self._parse_strøm(ijson, kilde, chunk_størrelse, self.flyttall)
+                return
+            try:
+                resp.raise_for_status()
+            except requests.HTTPError as e:
+                raise requests.HTTPError(f"HTTP-feil {e}")
+
+            resp.raw.decode_content = True
+            if not self.cache_dir:
+                yield from self._parse_strøm(ijson, resp.raw, chunk_størrelse, self.flyttall)
+                return
+
+            tmp = f"{body_sti}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as kopi:
+                    yield from self._parse_strøm(ijson, _TeeLeser(resp.raw, kopi), chunk_størrelse, self.flyttall)
+                os.replace(tmp, body_sti)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            self._skriv_cache(url, params, None, resp.headers)
+        finally:
+            resp.close()
+
+    @staticmethod
+    def _parse_strøm(ijson, kilde, chunk_størrelse, dtype=np.float64):
+        """
+        Parser tidssteg fra en fil-lignende kilde og gir ut fulle buffere som DataFrames.
+        Utstedelsestiden tas fra properties.meta.updated_at, som i hent_forecast, og plukkes
+        ut av den samme hendelsesstrømmen. meta kommer før timeseries i svaret fra MET.no.
+        """
+        meta = {}
+
+        def hendelser():
+            for prefiks, hendelse, verdi in ijson.parse(kilde, use_float=True):
+                if prefiks == "properties.meta.updated_at":
+                    meta["utstedt"] = pd.to_datetime(verdi, utc=True)
+                yield prefiks, hendelse, verdi
+
+        buffer = _TimeseriesBuffer(chunk_størrelse, dtype)
+        try:
+            for steg in ijson.items(hendelser(), "properties.timeseries.item"):
+                buffer.legg_til(steg)
+                if buffer.antall == chunk_størrelse:
+                    yield FetchData._med_utstedt(buffer.til_dataframe(), meta.get("utstedt"))
+                    buffer = _TimeseriesBuffer(chunk_størrelse, dtype)
+        except ijson.JSONError as e:
+            raise ValueError(f"Kunne ikke parse JSON: {e}")
+        if buffer.antall:
+            yield FetchData._med_utstedt(buffer.til_dataframe(), meta.get("utstedt"))
+
+    @staticmethod
+    def _med_utstedt(df, utstedt):
+        """
+        Legger til kolonnen "utstedt" (når prognosen ble laget) rett etter "time".
+        """
+        if utstedt is not None:
+            df.insert(1, "utstedt", utstedt)
+        return df
+
+    @staticmethod
+    def slå_sammen_chunks(chunks):
+        """
+        Slår sammen DataFrames fra strøm_timeseries eller flere lokasjoner. Symbolkode-kolonner
+        forblir category selv om delene har ulike kategorier eller mangler kolonnen.
+
+        Args:
+            chunks: iterable med DataFrames
+
+        Returns:
+            pd.DataFrame: samlet DataFrame
+        """
+        chunks = list(chunks)
+        if not chunks:
+            return pd.DataFrame()
+        kategoriske = dict.fromkeys(kol for c in chunks for kol in c.columns
+                                    if isinstance(c[kol].dtype, pd.CategoricalDtype))
+        df = pd.concat(chunks, ignore_index=True)
+        for kol in kategoriske:
+            deler = [c[kol] for c in chunks if kol in c.columns and isinstance(c[kol].dtype, pd.CategoricalDtype)]
+            samlet = union_categoricals(deler, ignore_order=True)
+            if len(deler) == len(chunks):
+                df[kol] = samlet
+            else:
+                df[kol] = pd.Categorical(df[kol], categories=samlet.categories)
+        return df
+
+    def hent_forecast(self, lat, lon, endpoint="compact", stream=False):
+        """
+        Henter værdata for en koordinat fra Locationforecast
+
+        Args:
+            lat (float): breddegrad, avrundes til 4 desimaler slik MET.no ber om
+            lon (float): lengdegrad, avrundes til 4 desimaler
+            endpoint (str): "compact" eller "complete"
+            stream (bool): True parser svaret inkrementelt med strøm_timeseries
+
+        Returns:
+            pd.DataFrame: flat DataFrame med en rad per tidssteg. Når utstedelsestiden er kjent
+                (meta.updated_at) ligger den i kolonnen "utstedt"
+        """
+        params = {"lat": round(float(lat), 4), "lon": round(float(lon), 4)}
+        if stream:
+            return self.slå_sammen_chunks(self.strøm_timeseries(endpoint, params))
+        data = self.hent_data(endpoint=endpoint, params=params)
+        df = self.flat_ut(data, path="properties.timeseries")
+        utstedt = data.get("properties", {}).get("meta", {}).get("updated_at")
+        return self._med_utstedt(df, pd.to_datetime(utstedt, utc=True) if utstedt else None)
 
     def hent_trondheim_forecast(self):
         """
         Henter kompakt værdata for Trondheim fra Locationforecast
         """
-        params = {"lat": 63.4295, "lon": 10.3951}
-        data = self.hent_data(endpoint="compact",params=params)
-        return self.flat_ut(data, path="properties.timeseries")
+        return self.hent_forecast(63.4295, 10.3951)
 
-    def lagre_trondheim_forecast(self):
+    def hent_forecasts(self, locations, max_concurrency=8, maks_per_sekund=20, endpoint="compact", ignorer_feil=False,
+                       stream=False):
         """
-        Henter værdata for Trondheim og lagrer som ukorrigert CSV-fil.
+        Henter værdata for mange koordinater parallelt og samler dem i en lang DataFrame.
+        Antall samtidige kall begrenses av en trådpool, og en felles ratebegrensning
+        sørger for at alle trådene til sammen holder seg under maks_per_sekund.
+
+        Args:
+            locations: dict {navn: (lat, lon)} eller liste med (navn, lat, lon) eller (lat, lon)
+            max_concurrency (int): maks antall samtidige forespørsler. Bør ikke overstige pool_størrelse
+            maks_per_sekund (float): global grense for forespørsler per sekund. None slår av grensen
+            endpoint (str): "compact" eller "complete"
+            ignorer_feil (bool): True hopper over lokasjoner som feiler og lagrer feilen i self.siste_feil
+            stream (bool): True parser hvert svar inkrementelt, se strøm_timeseries
+
+        Returns:
+            pd.DataFrame: alle tidsserier med kolonnen "lokasjon" først, i samme rekkefølge som locations
+
+        Raises:
+            ValueError: dersom locations er tom eller max_concurrency < 1
+        """
+        lokasjoner = self._normaliser_lokasjoner(locations)
+        if not lokasjoner:
+            raise ValueError("locations kan ikke være tom")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency må være >= 1")
+
+        begrenser = _RateBegrenser(maks_per_sekund)
+        self.siste_feil = {}
+
+        def hent_en(navn, lat, lon):
+            begrenser.vent()
+            df = self.hent_forecast(lat, lon, endpoint=endpoint, stream=stream)
+            df.insert(0, "lokasjon", navn)
+            return df
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = [(navn, pool.submit(hent_en, navn, lat, lon)) for navn, lat, lon in lokasjoner]
+            deler = []
+            for navn, future in futures:
+                try:
+                    deler.append(future.result())
+                except Exception as e:
+                    if not ignorer_feil:
+                        raise
+                    self.siste_feil[navn] = e
+
+        if not deler:
+            return pd.DataFrame(columns=["lokasjon"])
+        return self.slå_sammen_chunks(deler)
+
+    @staticmethod
+    def _normaliser_lokasjoner(locations):
+        """
+        Gjør om ulike lokasjonsformater til en liste av (navn, lat, lon).
+        Lokasjoner uten navn får navnet "lat,lon".
+        """
+        if isinstance(locations, dict):
+            return [(navn, lat, lon) for navn, (lat, lon) in locations.items()]
+        lokasjoner = []
+        for lokasjon in locations:
+            if len(lokasjon) == 3:
+                lokasjoner.append(tuple(lokasjon))
+            elif len(lokasjon) == 2:
+                lat, lon = lokasjon
+                lokasjoner.append((f"{round(float(lat), 4)},{round(float(lon), 4)}", lat, lon))
+            else:
+                raise ValueError(f"Ugyldig lokasjon {lokasjon}, forventet (navn, lat, lon) eller (lat, lon)")
+        return lokasjoner
+
+    def lagre_trondheim_forecast(self, filnavn="trondheim_forecast_uncleaned.csv", arkiv=None):
+        """
+        Henter værdata for Trondheim og lagrer som ukorrigert fil i data-mappen.
+        Formatet velges ut fra filendelsen (.csv, .parquet eller .feather).
+
+        Args:
+            filnavn: navn på filen. Parquet og Feather bevarer dtypene fra flat_ut
+            arkiv: valgfritt ForecastArkiv. Hentingen legges da også til i arkivet
+                slik at tidligere kjøringer ikke går tapt
 
         Retruns:
             pd.DataFrame: DataFrame med hentede data under navnet "trondheim_forecast_uncleaned.csv"
         """
         df = self.hent_trondheim_forecast()
-
-        rotmappe = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        datamappe = os.path.join(rotmappe, "data")
-        os.makedirs(datamappe, exist_ok=True)
-
-        filsti = os.path.join(datamappe, "trondheim_forecast_uncleaned.csv")
-        df.to_csv(filsti, index=False)
+        DataLagring().lagre(df, filnavn)
+        if arkiv is not None:
+            arkiv.skriv(df, lokasjon="Trondheim")
         return df
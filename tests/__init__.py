@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modulene i src importerer hverandre direkte (som i notebookene), så src må ligge i søkestien
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
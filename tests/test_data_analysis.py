@@ -57,5 +57,140 @@ class TestDataAnalyse(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.analyse.kolonne_trend("FeilKolonne", vindu=3)
 
+    def test_statistikk_caches(self):
+        stats = self.analyse.statistikk()
+        self.assertIs(self.analyse.statistikk(), stats)
+        self.assertEqual(stats.loc["Temperatur", "Maks"], 99)
+        self.analyse.df = self.df.iloc[:2]
+        self.assertEqual(self.analyse.statistikk().loc["Temperatur", "Maks"], 12)
+
+    def test_oppdater_lik_full_beregning(self):
+        ny = pd.DataFrame({
+            "Temperatur": [11, numpy.nan, 14],
+            "Fuktighet": [69, 74, 70],
+            "Trykk": [1001, 1007, 1003],
+            "Lokasjon": ["A", "B", "C"],
+        })
+        self.analyse.beskriv_data()
+        self.analyse.oppdater(ny.iloc[:1]).oppdater(ny.iloc[1:])
+        alt = DataAnalyse(pd.concat([self.df, ny], ignore_index=True))
+        pd.testing.assert_frame_equal(self.analyse.beskriv_data(), alt.beskriv_data())
+        self.assertEqual(len(self.analyse.df), 8)
+
+    def test_beskriv_data_gruppert(self):
+        df = pd.DataFrame({
+            "Lokasjon": ["A", "B", "A", "B", "A", "B"],
+            "Tid": pd.to_datetime(["2024-01-01T00:00Z", "2024-01-01T00:00Z", "2024-01-01T12:00Z",
+                                   "2024-01-01T12:00Z", "2024-01-02T00:00Z", "2024-01-02T00:00Z"]),
+            "Temperatur": [1.0, 10.0, 3.0, 20.0, 5.0, 30.0],
+        })
+        analyse = DataAnalyse(df)
+        per_lokasjon = analyse.beskriv_data(by="Lokasjon")
+        self.assertEqual(per_lokasjon.loc[("A", "Temperatur"), "Gjennomsnitt"], 3.0)
+        self.assertEqual(per_lokasjon.loc[("B", "Temperatur"), "Median"], 20.0)
+
+        per_dag = analyse.beskriv_data(by=["Lokasjon"], tidsbøtte="D")
+        self.assertEqual(per_dag.index.names, ["Lokasjon", "Tidsbøtte", "Variabel"])
+        self.assertEqual(len(per_dag), 4)
+        pd.testing.assert_frame_equal(analyse.beskriv_data(by="Lokasjon", tidsbøtte="D", arbeidere=2), per_dag)
+
+    def test_outliers_og_trend_per_gruppe(self):
+        df = pd.DataFrame({
+            "Lokasjon": ["A", "B"] * 10,
+            "Temperatur": [1.0, 50.0, 1.0, 50.5] * 4 + [1.0, 50.0, 5.0, 50.5],
+        })
+        analyse = DataAnalyse(df)
+        self.assertEqual(len(analyse.identifiser_outliers(threshold=2.0)), 0)
+        outliers = analyse.identifiser_outliers(threshold=2.0, by="Lokasjon")
+        self.assertEqual(outliers["Lokasjon"].tolist(), ["A"])
+        self.assertEqual(outliers.index.tolist(), [18])
+        self.assertEqual(analyse.identifiser_outliers(threshold=0.5).columns.tolist(), df.columns.tolist())
+        trend = analyse.kolonne_trend("Temperatur", vindu=2, by="Lokasjon")
+        self.assertEqual(trend.iloc[1], 50.0)
+        self.assertEqual(trend.iloc[3], 50.25)
+        self.assertEqual(trend.iloc[18], 3.0)
+
+    def test_finn_outliers_metoder(self):
+        verdier = [1.0, 1.2, 0.8, 1.1, 0.9] * 8
+        verdier[30] = 25.0
+        analyse = DataAnalyse(pd.DataFrame({"Temperatur": verdier, "Trykk": [1000.0] * 40}))
+        for metode in ("z", "mad", "rullende"):
+            funnet = analyse.finn_outliers(metode=metode, terskel=4.0, vindu=10, chunk_størrelse=7)
+            self.assertEqual(funnet["indeks"].tolist(), [30], metode)
+            self.assertEqual(funnet["kolonne"].tolist(), ["Temperatur"])
+            self.assertEqual(funnet["verdi"].tolist(), [25.0])
+        ny = pd.DataFrame({"Temperatur": [1.0, 40.0], "Trykk": [1000.0, 1000.0]}, index=[100, 101])
+        self.assertEqual(analyse.finn_outliers("z", terskel=4.0, data=ny)["indeks"].tolist(), [101])
+        with self.assertRaises(ValueError):
+            analyse.finn_outliers(metode="ukjent")
+
+    def test_korrelasjonsmatrise_lik_pandas_og_cachet(self):
+        df = self.df.astype(float)
+        df.loc[1, "Fuktighet"] = numpy.nan
+        analyse = DataAnalyse(df)
+        matrise = analyse.korrelasjonsmatrise()
+        pd.testing.assert_frame_equal(matrise, df.corr(), atol=1e-12)
+        self.assertIs(analyse.korrelasjonsmatrise(), matrise)
+        self.assertAlmostEqual(analyse.korrelasjon("Trykk", "Fuktighet"), df["Trykk"].corr(df["Fuktighet"]))
+        pd.testing.assert_frame_equal(self.analyse.korrelasjonsmatrise("spearman"), self.df.corr("spearman"),
+                                      check_dtype=False, atol=1e-12)
+        with self.assertRaises(ValueError):
+            analyse.korrelasjonsmatrise("kendall")
+
+    def test_krysskorrelasjon_finner_forsinkelse(self):
+        rng = numpy.random.default_rng(0)
+        trykk = pd.Series(rng.normal(size=200))
+        df = pd.DataFrame({"Trykk": trykk, "Temperatur": trykk.shift(3)})
+        analyse = DataAnalyse(df)
+        kk = analyse.krysskorrelasjon("Trykk", "Temperatur", maks_lag=5)
+        self.assertEqual(kk.index.tolist(), list(range(-5, 6)))
+        self.assertEqual(kk.idxmax(), 3)
+        self.assertAlmostEqual(kk[3], 1.0)
+        self.assertAlmostEqual(kk[-2], df["Trykk"].corr(df["Temperatur"].shift(2)))
+
+    def test_kolonne_trend_lik_rolling(self):
+        df = pd.DataFrame({
+            "Tid": pd.date_range("2024-01-01", periods=10, freq="h", tz="UTC").delete([4, 5]),
+            "Temperatur": [1.0, 2.0, numpy.nan, 4.0, 8.0, 6.0, 7.0, 3.0],
+        })
+        analyse = DataAnalyse(df)
+        for vindu in (1, 3, 20):
+            pd.testing.assert_series_equal(analyse.kolonne_trend("Temperatur", vindu),
+                                           df["Temperatur"].rolling(vindu, min_periods=1).mean())
+        tidsvindu = df.set_index("Tid")["Temperatur"].rolling("3h").mean()
+        numpy.testing.assert_allclose(analyse.kolonne_trend("Temperatur", "3h").to_numpy(), tidsvindu.to_numpy())
+        self.assertEqual(analyse.trender("Temperatur", [2, "3h"]).columns.tolist(), [2, "3h"])
+
+    def test_kolonne_trend_tidsvindu_per_gruppe(self):
+        tid = pd.date_range("2024-01-01", periods=4, freq="h", tz="UTC")
+        df = pd.DataFrame({
+            "Tid": tid.repeat(2),
+            "Lokasjon": ["Oslo", "Bergen"] * 4,
+            "Temperatur": [1.0, 10.0, 2.0, 20.0, 4.0, numpy.nan, 8.0, 40.0],
+        })
+        trend = DataAnalyse(df).kolonne_trend("Temperatur", "2h", by="Lokasjon")
+        self.assertEqual(len(trend), len(df))
+        numpy.testing.assert_allclose(trend.to_numpy(), [1.0, 10.0, 1.5, 15.0, 3.0, 20.0, 6.0, 40.0])
+
+    def test_kolonne_ewm(self):
+        df = pd.DataFrame({"Tid": pd.date_range("2024-01-01", periods=4, freq="h"), "Trykk": [1.0, 2.0, 3.0, 4.0]})
+        analyse = DataAnalyse(df)
+        pd.testing.assert_series_equal(analyse.kolonne_ewm("Trykk", span=3), df["Trykk"].ewm(span=3).mean())
+        self.assertEqual(len(analyse.kolonne_ewm("Trykk", halveringstid="2h")), 4)
+        with self.assertRaises(ValueError):
+            analyse.kolonne_ewm("Trykk")
+
+    def test_trender_ved_posisjoner(self):
+        df = pd.DataFrame({
+            "Tid": pd.date_range("2024-01-01", periods=8, freq="h", tz="UTC"),
+            "Temperatur": [1.0, 2.0, numpy.nan, 4.0, 8.0, 6.0, 7.0, 3.0],
+        })
+        analyse = DataAnalyse(df)
+        posisjoner = [0, 3, 7]
+        tabell = analyse.trender_ved("Temperatur", [2, "3h"], posisjoner)
+        self.assertEqual(tabell.shape, (2, 3))
+        numpy.testing.assert_allclose(tabell[0], analyse.kolonne_trend("Temperatur", 2).to_numpy()[posisjoner])
+        numpy.testing.assert_allclose(tabell[1], analyse.kolonne_trend("Temperatur", "3h").to_numpy()[posisjoner])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,8 +1,9 @@
 import unittest
 import pandas as pd
+import numpy as np
 import tempfile
 import os
-from src.data_cleaning import DataRensing
+from src.data_cleaning import DataRensing, KvantilSkisse, NøkkelIndeks, StrømImputerer
 
 class TestDataRensing(unittest.TestCase):
     def setUp(self):
@@ -37,6 +38,29 @@ class TestDataRensing(unittest.TestCase):
         self.assertIn("Tid", df_renset.columns)
         self.assertIn("Temperatur", df_renset.columns)
 
+    def test_bygg_renset_dataframe_kompakt(self):
+        df = self.df.assign(lokasjon="Trondheim")
+        kompakt = DataRensing(df).bygg_renset_dataframe(kompakt=True)
+        self.assertEqual(kompakt["Temperatur"].dtype, np.float32)
+        self.assertEqual(kompakt["Lokasjon"].dtype, "category")
+        self.assertEqual(DataRensing(df).bygg_renset_dataframe()["Temperatur"].dtype, np.float64)
+
+    def test_optimaliser_dtyper(self):
+        df = pd.DataFrame({
+            "symbol": ["cloudy", "rain", "cloudy", "cloudy"] * 25,
+            "antall": pd.Series([1, 200, 3, 4] * 25, dtype="int64"),
+            "negativ": pd.Series([-5, 100, 0, 1] * 25, dtype="int64"),
+            "verdi": [1.5, 2.5, np.nan, 4.0] * 25,
+        })
+        ut, rapport = DataRensing.optimaliser_dtyper(df, vis_rapport=False)
+        self.assertEqual(str(ut["symbol"].dtype), "category")
+        self.assertEqual(ut["antall"].dtype, np.uint8)
+        self.assertEqual(ut["negativ"].dtype, np.int8)
+        self.assertEqual(ut["verdi"].dtype, np.float32)
+        self.assertEqual(df["antall"].dtype, np.int64)
+        self.assertTrue((rapport["bytes_etter"] <= rapport["bytes_før"]).all())
+        self.assertEqual(rapport.loc["antall", "dtype_etter"], "uint8")
+
     def test_håndter_manglende_verdier_median(self):
         df_med = self.renser.håndter_manglende_verdier("median")
         self.assertFalse(df_med.isnull().any().any())
@@ -114,5 +138,193 @@ class TestDataRensing(unittest.TestCase):
         df_resultat = self.renser.data_rens(desimaler=1, temp_grense=2, filnavn="dummy.csv")
         self.assertIsInstance(df_resultat, pd.DataFrame)
 
+    def test_data_rens_samlet_lik_stegvis(self):
+        resultater = []
+        for samlet in (False, True):
+            renser = DataRensing(self.df)
+            renser.lagre_renset_data = lambda filnavn: "/dev/null"
+            resultater.append(renser.data_rens(avrund_kol="Temperatur", temp_grense=5, samlet=samlet))
+        pd.testing.assert_frame_equal(resultater[0].reset_index(drop=True), resultater[1].reset_index(drop=True))
+
+    def test_data_rens_samlet_fjerner_nan_og_duplikater(self):
+        df = pd.concat([self.df, self.df.iloc[[0]]], ignore_index=True)
+        renser = DataRensing(df)
+        renser.lagre_renset_data = lambda filnavn: "/dev/null"
+        resultat = renser.data_rens()
+        self.assertFalse(resultat.isna().any().any())
+        self.assertEqual(resultat.duplicated().sum(), 0)
+        self.assertEqual(len(resultat), 3)
+
+    def test_data_rens_beholder_float64_som_standard(self):
+        for kompakt, dtype in ((False, np.float64), (True, np.float32)):
+            renser = DataRensing(self.df)
+            renser.lagre_renset_data = lambda filnavn: "/dev/null"
+            args = {"kompakt": True} if kompakt else {}
+            self.assertEqual(renser.data_rens(**args)["Temperatur"].dtype, dtype)
+
+    def test_bearbeid_tid_typet(self):
+        self.renser._df = self.renser.bygg_renset_dataframe()
+        df_tidy = self.renser.bearbeid_tid(fmt=None)
+        self.assertEqual(str(df_tidy["Tid"].dtype), "datetime64[ns, UTC]")
+        self.assertTrue(df_tidy["Tid"].is_monotonic_increasing)
+
+    def test_data_rens_typet_tid_som_indeks(self):
+        for samlet in (False, True):
+            renser = DataRensing(self.df.iloc[::-1])
+            renser.lagre_renset_data = lambda filnavn: "/dev/null"
+            resultat = renser.data_rens(tidsformat=None, tid_som_indeks=True, samlet=samlet)
+            self.assertIsInstance(resultat.index, pd.DatetimeIndex)
+            self.assertEqual(str(resultat.index.tz), "UTC")
+            self.assertTrue(resultat.index.is_monotonic_increasing)
+
+    def test_data_rens_tid_som_indeks_krever_typet(self):
+        with self.assertRaises(ValueError):
+            self.renser.data_rens(tid_som_indeks=True)
+
+    def test_formater_tid(self):
+        df = pd.DataFrame({"Tid": pd.to_datetime(["2025-05-27T02:00:00Z"]), "Temperatur": [5.6]})
+        self.assertEqual(DataRensing.formater_tid(df)["Tid"].iloc[0], "27.05.25 - 02:00")
+        self.assertEqual(DataRensing.formater_tid(df.set_index("Tid")).index[0], "27.05.25 - 02:00")
+        with self.assertRaises(KeyError):
+            DataRensing.formater_tid(df.drop(columns=["Tid"]))
+
+    def test_data_rens_inkrementell(self):
+        from src.data_storage import DataLagring
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lagring = DataLagring(tmpdir)
+            første = DataRensing(self.df).data_rens_inkrementell("renset", lagring=lagring)
+            self.assertEqual(len(første), 2)
+            self.assertEqual(DataRensing.les_vannmerke("renset", lagring)["tid"],
+                             "2023-01-01T01:00:00+00:00")
+
+            # én uendret, én endret og én ny rad
+            ny = pd.DataFrame({
+                "time": ["2023-01-01T00:00:00Z", "2023-01-01T01:00:00Z", "2023-01-01T02:00:00Z"],
+                "data_instant_details_air_temperature": [5.1, 9.9, 6.0],
+                "data_instant_details_relative_humidity": [80, 82, 81],
+                "data_instant_details_air_pressure_at_sea_level": [1013, 1012, 1011],
+                "data_instant_details_wind_speed": [4.5, 3.8, 4.0],
+            })
+            delta = DataRensing(ny).data_rens_inkrementell("renset", lagring=lagring)
+            self.assertEqual(len(delta), 2)
+            resultat = DataRensing.les_renset("renset", lagring)
+            self.assertEqual(len(resultat), 3)
+            np.testing.assert_array_equal(resultat["Temperatur"], np.float32([5.1, 9.9, 6.0]))
+            # eksisterende filer skrives ikke om, endringene legges til som nye filer
+            filer = [f for _, _, navn in os.walk(os.path.join(tmpdir, "renset")) for f in navn]
+            self.assertEqual(len(filer), 2)
+
+    def test_data_rens_inkrementell_hopper_over_gamle_utstedelser(self):
+        from src.data_storage import DataLagring
+        df = self.df.iloc[:2].assign(lokasjon="Trondheim", utstedt="2023-01-01T00:00:00Z")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lagring = DataLagring(tmpdir)
+            DataRensing(df).data_rens_inkrementell("renset", lagring=lagring)
+            self.assertTrue(DataRensing(df).data_rens_inkrementell("renset", lagring=lagring).empty)
+            resultat = DataRensing.les_renset("renset", lagring)
+            self.assertEqual(len(resultat), 2)
+            self.assertEqual(resultat.columns[0], "Lokasjon")
+
+    def test_data_rens_inkrementell_vannmerke_per_lokasjon(self):
+        from src.data_storage import DataLagring
+        rad = self.df.iloc[:1]
+        batch1 = pd.concat([rad.assign(lokasjon="A", utstedt="2023-01-01T10:05:00Z"),
+                            rad.assign(lokasjon="B", utstedt="2023-01-01T09:03:00Z")], ignore_index=True)
+        batch2 = rad.assign(lokasjon="B", utstedt="2023-01-01T10:03:00Z",
+                            data_instant_details_air_temperature=7.0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lagring = DataLagring(tmpdir)
+            DataRensing(batch1).data_rens_inkrementell("renset", lagring=lagring)
+            delta = DataRensing(batch2).data_rens_inkrementell("renset", lagring=lagring)
+            self.assertEqual(delta["Lokasjon"].tolist(), ["B"])
+            resultat = DataRensing.les_renset("renset", lagring).set_index("Lokasjon")
+            self.assertEqual(resultat.loc["B", "Temperatur"], np.float32(7.0))
+            self.assertEqual(resultat.loc["A", "Temperatur"], np.float32(5.1))
+            self.assertEqual(sorted(DataRensing.les_vannmerke("renset", lagring)["utstedt"]), ["A", "B"])
+
+    def test_kvantilskisse(self):
+        verdier = np.arange(1001, dtype=float)
+        self.assertEqual(KvantilSkisse(kapasitet=2000).oppdater(verdier).median(), 500.0)
+        skisse = KvantilSkisse(kapasitet=200)
+        for bit in np.array_split(verdier, 10):
+            skisse.oppdater(bit)
+        self.assertEqual(skisse.antall, 1001)
+        self.assertAlmostEqual(skisse.median(), 500.0, delta=100)
+
+    def test_imputer_strøm_lik_minnet(self):
+        df = pd.DataFrame({
+            "Lokasjon": ["A", "B"] * 6,
+            "Tid": pd.date_range("2024-01-01", periods=6, freq="h", tz="UTC").repeat(2),
+            "Temperatur": [1.0, np.nan, np.nan, 5.0, 3.0, np.nan, np.nan, 7.0, np.nan, np.nan, 6.0, 8.0],
+        })
+        biter = lambda: (df.iloc[i:i + 4] for i in range(0, len(df), 4))
+        for metode in ("median", "mean", "ffill", "interpoler"):
+            i_minnet = DataRensing(df).håndter_manglende_verdier(metode)
+            strømmet = pd.concat(DataRensing.imputer_strøm(biter, metode)).sort_index()
+            pd.testing.assert_frame_equal(strømmet, i_minnet)
+        interpolert = DataRensing(df).håndter_manglende_verdier("interpoler")
+        # ledende NaN for B beholdes, resten interpoleres i tid per lokasjon
+        self.assertTrue(np.isnan(interpolert["Temperatur"].iloc[1]))
+        self.assertEqual(interpolert["Temperatur"].iloc[2:].tolist(), [2, 5, 3, 6, 4, 7, 5, 7.5, 6, 8])
+
+        # Fuktighet slutter å rapportere, men høyst maks_tilbake rader holdes tilbake
+        stille = pd.DataFrame({
+            "Tid": pd.date_range("2024-01-01", periods=20, freq="h", tz="UTC"),
+            "Temperatur": np.arange(20.0),
+            "Fuktighet": [80.0, 81.0] + [np.nan] * 18,
+        })
+        imputerer = StrømImputerer("interpoler", maks_tilbake=3)
+        ut = [imputerer.bruk(stille.iloc[i:i + 5]) for i in range(0, 20, 5)]
+        self.assertEqual(len(imputerer._tilbake), 3)
+        alt = pd.concat(ut + [imputerer.avslutt()])
+        pd.testing.assert_frame_equal(alt, DataRensing(stille).håndter_manglende_verdier("interpoler"))
+
+    def test_håndter_duplikater_nøkkel_beholder_nyeste(self):
+        df = pd.DataFrame({
+            "Lokasjon": ["A", "A", "B", "A"],
+            "Tid": pd.to_datetime(["2024-01-01T00:00Z"] * 3 + ["2024-01-01T01:00Z"]),
+            "Temperatur": [1.0, 2.0, 3.0, 4.0],
+            "Utstedt": pd.to_datetime(["2024-01-01T00:00Z", "2024-01-01T06:00Z", "2024-01-01T00:00Z", "2024-01-01T00:00Z"]),
+        })
+        renser = DataRensing(df)
+        self.assertEqual(len(renser.håndter_duplikater(behold=False)), 4)
+        resultat = renser.håndter_duplikater(behold=False, nøkkel=["Lokasjon", "Tid"], sist_etter="Utstedt")
+        self.assertEqual(resultat["Temperatur"].tolist(), [2.0, 3.0, 4.0])
+
+    def test_nøkkelindeks_på_tvers_av_batcher(self):
+        nøkkel = ["Lokasjon", "Tid"]
+        første = pd.DataFrame({"Lokasjon": ["A", "B"], "Tid": pd.to_datetime(["2024-01-01T00:00Z"] * 2),
+                               "Utstedt": pd.to_datetime(["2024-01-01T00:00Z"] * 2)})
+        indeks = NøkkelIndeks()
+        self.assertEqual(len(DataRensing(første).håndter_duplikater(False, nøkkel, "Utstedt", indeks)), 2)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            indeks = NøkkelIndeks.last(indeks.lagre(os.path.join(tmpdir, "nøkler")))
+        self.assertEqual(len(indeks), 2)
+
+        # A er utstedt på nytt og beholdes, B er allerede sett, C er ny
+        andre = pd.DataFrame({"Lokasjon": ["A", "B", "C"], "Tid": pd.to_datetime(["2024-01-01T00:00Z"] * 3),
+                              "Utstedt": pd.to_datetime(["2024-01-01T06:00Z", "2024-01-01T00:00Z", "2024-01-01T00:00Z"])})
+        resultat = DataRensing(andre).håndter_duplikater(False, nøkkel, "Utstedt", indeks)
+        self.assertEqual(resultat["Lokasjon"].tolist(), ["A", "C"])
+        self.assertEqual(len(indeks), 3)
+
+        # samme tidspunkt i en annen enhet og tidssone gir samme nøkkel
+        tid = pd.to_datetime(["2024-01-01T00:00Z"])
+        varianter = [tid, tid.as_unit("us"), tid.tz_convert("Europe/Oslo"), tid.tz_localize(None)]
+        hasher = [NøkkelIndeks.hash_nøkler(pd.DataFrame({"Lokasjon": ["C"], "Tid": t}), nøkkel) for t in varianter]
+        for h in hasher[1:]:
+            np.testing.assert_array_equal(h, hasher[0])
+
+    def test_data_rens_dedup_på_utstedt(self):
+        df = pd.concat([self.df.assign(utstedt="2023-01-01T00:00:00Z"),
+                        self.df.assign(utstedt="2023-01-01T06:00:00Z", data_instant_details_air_temperature=9.0)])
+        for samlet in (False, True):
+            renser = DataRensing(df)
+            renser.lagre_renset_data = lambda filnavn: "/dev/null"
+            resultat = renser.data_rens(samlet=samlet, tidsformat=None)
+            self.assertEqual(len(resultat), 2)
+            self.assertTrue((resultat["Temperatur"] == 9.0).all())
+
 if __name__ == "__main__":
     unittest.main()
@@ -43,5 +43,12 @@ class TestDataPrediksjon(unittest.TestCase):
         self.assertIn("Feil", df_vis.columns)
         self.assertIn("Dag", df_vis.columns)
 
+    def test_visualiseringsgrunnlag_tid_som_indeks(self):
+        pred = DataPrediksjon(self.df.set_index("Tid"), målvariabel="Temperatur")
+        pred.tren_lineær_modell()
+        df_vis = pred.visualiseringsgrunnlag()
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df_vis["Tid"]))
+        self.assertTrue(df_vis["Dag"].notna().all())
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -19,6 +19,7 @@ class TestDataLeser(unittest.TestCase):
         self.leser= DataLeser(self.test_dir)
 
     def tearDown(self):
+        self.leser.lukk()
         shutil.rmtree(self.test_dir) # sletter mdilertidige mapper og filer
 
     def test_init_with_valid_directory(self):
@@ -41,6 +42,59 @@ class TestDataLeser(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             self.leser.les_csv("finnes_ikke.csv")
 
+    def test_les_parquet_kolonner(self):
+        pd.DataFrame({"a": [1, 2], "b": [3, 4]}).to_parquet(os.path.join(self.test_dir, "test.parquet"))
+        df = self.leser.les_parquet("test.parquet", kolonner=["b"])
+        self.assertEqual(df.columns.tolist(), ["b"])
+
+    def test_les_fil_velger_format(self):
+        df = self.leser.les_fil("test.csv")
+        self.assertEqual(df.shape, (2, 2))
+
+    def lag_arkivfil(self, filnavn):
+        df = pd.DataFrame({
+            "Tid": pd.date_range("2025-05-01", periods=48, freq="h", tz="UTC"),
+            "Lokasjon": ["Trondheim", "Oslo"] * 24,
+            "Temperatur": range(48),
+            "Fuktighet": range(48)
+        })
+        self.leser.lagring.lagre(df, filnavn)
+        return df
+
+    def test_les_filtrert_parquet(self):
+        self.lag_arkivfil("arkiv.parquet")
+        df = self.leser.les_filtrert("arkiv.parquet", kolonner=["Temperatur"], fra="2025-05-01 10:00",
+                                     til="2025-05-01 19:00", lokasjoner=["Oslo"])
+        self.assertEqual(df.columns.tolist(), ["Temperatur"])
+        self.assertEqual(df["Temperatur"].tolist(), [11, 13, 15, 17, 19])
+
+    def test_les_filtrert_csv_chunks(self):
+        self.lag_arkivfil("arkiv.csv")
+        biter = self.leser.les_filtrert("arkiv.csv", lokasjoner=["Trondheim"], chunk_størrelse=10)
+        biter = list(biter)
+        self.assertEqual(len(biter), 5)
+        self.assertEqual(sum(len(b) for b in biter), 24)
+
+    def test_les_filtrert_tekst_tid(self):
+        df = pd.DataFrame({"Tid": ["27.05.25 - 02:00", "27.05.25 - 03:00", "28.05.25 - 02:00"], "Temperatur": [1, 2, 3]})
+        df.to_csv(os.path.join(self.test_dir, "renset.csv"), index=False)
+        res = self.leser.les_filtrert("renset.csv", fra="2025-05-28", tidsformat="%d.%m.%y - %H:%M")
+        self.assertEqual(res["Temperatur"].tolist(), [3])
+
+    def test_les_filtrert_ukjent_kolonne(self):
+        with self.assertRaises(KeyError):
+            self.leser.les_filtrert("test.csv", fra="2025-01-01")
+
+    def test_les_mange(self):
+        self.lag_arkivfil("del_1.parquet")
+        self.lag_arkivfil("del_2.feather")
+        biter = self.leser.les_mange("del_*", kolonner=["Temperatur"], lokasjoner=["Oslo"])
+        self.assertNotIsInstance(biter, pd.DataFrame)
+        df = pd.concat(biter)
+        self.assertEqual(len(df), 48)
+        samlet = self.leser.les_mange("del_*", samle=True, chunk_størrelse=7)
+        self.assertEqual(len(samlet), 96)
+
     def test_les_json_success(self):
         df = self.leser.les_json("test.json")
         self.assertIn("x", df.columns)
@@ -56,6 +110,42 @@ class TestDataLeser(unittest.TestCase):
         self.assertEqual(result.shape[0], 1)
         self.assertIn("navn", result.columns)
 
+    def test_sql_utforsk_pandasql(self):
+        df = pd.DataFrame({"navn": ["a", "b"], "verdi": [1, 2]})
+        result = self.leser.sql_utforsk(df, "SELECT * FROM df WHERE verdi > 1", motor="pandasql")
+        self.assertEqual(result.shape[0], 1)
+
+    def test_sql_utforsk_ukjent_motor(self):
+        with self.assertRaises(ValueError):
+            self.leser.sql_utforsk(pd.DataFrame({"x": [1]}), "SELECT * FROM df", motor="oracle")
+
+    def test_sql_utforsk_views_for_filer(self):
+        result = self.leser.sql_utforsk(None, "SELECT SUM(a) AS s FROM test")
+        self.assertEqual(result["s"].iloc[0], 3)
+
+    def test_sql_tilkobling_gjenbrukes(self):
+        df = pd.DataFrame({"x": [1, 2]})
+        self.leser.sql_utforsk(df, "SELECT * FROM df")
+        con = self.leser._duckdb
+        self.leser.sql_utforsk(df, "SELECT * FROM df")
+        self.assertIs(self.leser._duckdb, con)
+
+    def test_registrer_filer_nye_filer(self):
+        self.leser.sql_tilkobling()
+        pd.DataFrame({"v": [1, 2, 3]}).to_parquet(os.path.join(self.test_dir, "2025-ny fil.parquet"))
+        views = self.leser.registrer_filer()
+        self.assertIn("f_2025_ny_fil", views)
+        result = self.leser.sql_utforsk(None, "SELECT COUNT(*) AS n FROM f_2025_ny_fil")
+        self.assertEqual(result["n"].iloc[0], 3)
+
+    def test_registrer_filer_hopper_over_ødelagte_filer(self):
+        with open(os.path.join(self.test_dir, "ødelagt.parquet"), "wb") as f:
+            f.write(b"ikke parquet")
+        views = self.leser.registrer_filer()
+        self.assertNotIn("ødelagt", views)
+        result = self.leser.sql_utforsk(None, "SELECT SUM(a) AS s FROM test")
+        self.assertEqual(result["s"].iloc[0], 3)
+
     def test_sql_utforsk_invalid_query(self):
         df = pd.DataFrame({"x": [1, 2]})
         with self.assertRaises(ValueError):
@@ -0,0 +1,130 @@
+import unittest
+import os
+import shutil
+import tempfile
+import pandas as pd
+from src.data_storage import DataLagring, ForecastArkiv
+
+class TestDataLagring(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.lagring = DataLagring(self.test_dir)
+        self.df = pd.DataFrame({
+            "Tid": pd.date_range("2025-05-27", periods=4, freq="h", tz="UTC"),
+            "Temperatur": [5.6, 5.7, 6.1, 6.4],
+            "Symbol": pd.Categorical(["cloudy", "rain", "cloudy", "fair_day"])
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_finn_format_fra_endelse(self):
+        self.assertEqual(self.lagring.finn_format("a.parquet"), "parquet")
+        self.assertEqual(self.lagring.finn_format("a.CSV"), "csv")
+        self.assertEqual(self.lagring.finn_format("a.dat", format="feather"), "feather")
+
+    def test_finn_format_ukjent(self):
+        with self.assertRaises(ValueError):
+            self.lagring.finn_format("a.txt")
+
+    def test_parquet_bevarer_dtyper(self):
+        self.lagring.lagre(self.df, "test.parquet")
+        df = self.lagring.les("test.parquet")
+        pd.testing.assert_frame_equal(df, self.df)
+
+    def test_feather_bevarer_dtyper(self):
+        self.lagring.lagre(self.df, "test.feather")
+        df = self.lagring.les("test.feather")
+        pd.testing.assert_frame_equal(df, self.df)
+
+    def test_feather_med_indeks(self):
+        self.lagring.lagre(self.df.set_index("Tid"), "indeks.feather")
+        df = self.lagring.les("indeks.feather")
+        self.assertIn("Tid", df.columns)
+
+    def test_navngitt_indeks_bevares(self):
+        self.lagring.lagre(self.df.set_index("Tid"), "indeks.parquet")
+        self.assertEqual(self.lagring.les("indeks.parquet").index.name, "Tid")
+        self.lagring.lagre(self.df.set_index("Tid"), "indeks.csv")
+        self.assertIn("Tid", self.lagring.les("indeks.csv").columns)
+
+    def test_kolonneprojeksjon(self):
+        for filnavn in ["test.parquet", "test.feather", "test.csv"]:
+            self.lagring.lagre(self.df, filnavn)
+            df = self.lagring.les(filnavn, kolonner=["Temperatur"])
+            self.assertEqual(df.columns.tolist(), ["Temperatur"])
+
+    def test_csv_eksport(self):
+        sti = self.lagring.lagre(self.df, "test.csv")
+        self.assertTrue(os.path.isfile(sti))
+        self.assertEqual(len(pd.read_csv(sti)), 4)
+
+    def test_les_mangler(self):
+        with self.assertRaises(FileNotFoundError):
+            self.lagring.les("finnes_ikke.parquet")
+
+class TestForecastArkiv(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.arkiv = ForecastArkiv(self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def lag_henting(self, utstedt, start="2025-05-27T00:00:00Z", perioder=3, lokasjon="Trondheim"):
+        return pd.DataFrame({
+            "lokasjon": lokasjon,
+            "time": pd.date_range(start, periods=perioder, freq="h"),
+            "utstedt": pd.Timestamp(utstedt),
+            "data_instant_details_air_temperature": [5.0 + i for i in range(perioder)]
+        })
+
+    def test_skriv_og_les(self):
+        self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z"))
+        df = self.arkiv.les()
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df["lokasjon"].unique().tolist(), ["Trondheim"])
+
+    def test_skriv_er_append_only(self):
+        self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z"))
+        self.arkiv.skriv(self.lag_henting("2025-05-27T06:00:00Z"))
+        self.assertEqual(len(self.arkiv.les()), 6)
+        self.assertEqual(len(self.arkiv.partisjoner()), 1)
+
+    def test_skriv_dedupliserer(self):
+        self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z"))
+        skrevet = self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z", perioder=4))
+        self.assertEqual(len(skrevet), 1)
+        self.assertEqual(len(pd.read_parquet(skrevet[0])), 1)
+        self.assertEqual(self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z")), [])
+        self.assertEqual(len(self.arkiv.les()), 4)
+
+    def test_partisjonsbeskjæring(self):
+        self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z"))
+        self.arkiv.skriv(self.lag_henting("2025-05-28T00:00:00Z", start="2025-05-28T00:00:00Z"))
+        self.arkiv.skriv(self.lag_henting("2025-05-28T00:00:00Z", lokasjon="Oslo/Blindern"))
+        self.assertEqual(len(self.arkiv.partisjoner(lokasjoner=["Trondheim"], fra_dato="2025-05-28")), 1)
+        df = self.arkiv.les(lokasjoner=["Oslo/Blindern"])
+        self.assertEqual(df["lokasjon"].unique().tolist(), ["Oslo/Blindern"])
+
+    def test_les_tidsfilter_og_kolonner(self):
+        self.arkiv.skriv(self.lag_henting("2025-05-27T00:00:00Z", perioder=10))
+        df = self.arkiv.les(fra="2025-05-27 02:00", til="2025-05-27 04:00", kolonner=["time"])
+        self.assertEqual(df.columns.tolist(), ["time"])
+        self.assertEqual(len(df), 3)
+
+    def test_skriv_uten_lokasjonskolonne(self):
+        df = self.lag_henting("2025-05-27T00:00:00Z").drop(columns=["lokasjon", "utstedt"])
+        self.arkiv.skriv(df, lokasjon="Bergen", utstedt="2025-05-27T00:00:00Z")
+        self.assertEqual(self.arkiv.les()["lokasjon"].iloc[0], "Bergen")
+
+    def test_skriv_mangler_time(self):
+        with self.assertRaises(KeyError):
+            self.arkiv.skriv(pd.DataFrame({"a": [1]}))
+
+    def test_les_tomt_arkiv(self):
+        self.assertTrue(self.arkiv.les().empty)
+        self.assertEqual(self.arkiv.les(kolonner=["time"]).columns.tolist(), ["time"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
 import pandas as pd
 import os
+import tempfile
+import matplotlib.pyplot as plt
 from unittest.mock import patch
-from src.data_visualisation import DataVisualisering
+from src.data_vizualisation import DataVisualisering, FigurCache, nedsample, stratifisert_utvalg
 
 class TestDataVisualisering(unittest.TestCase):
 
@@ -63,7 +65,7 @@ class TestDataVisualisering(unittest.TestCase):
         except Exception as e:
             self.fail(f"plott_jointplot feilet: {e}")
 
-    @patch("src.data_visualisation.DataVisualisering.lagre_plot")  # om du har en intern hjelpefunksjon
+    @patch("src.data_vizualisation.DataVisualisering.lagre_plot")  # om du har en intern hjelpefunksjon
     def test_plott_trend_vs_rådata(self, mock_save):
         try:
             self.viz.plott_trend_vs_rådata("Temperatur", vindu=2, save=False)
@@ -79,5 +81,132 @@ class TestDataVisualisering(unittest.TestCase):
         except Exception as e:
             self.fail(f"visualiser_manglende_verdier feilet: {e}")
 
+    def test_render_batch(self):
+        df = pd.concat([self.df.assign(Lokasjon="Oslo"), self.df.assign(Lokasjon="Bergen")], ignore_index=True)
+        viz = DataVisualisering(df)
+        specs = viz.specs_per_gruppe("tidsserie", ["Temperatur", "Trykk"]) + [
+            {"type": "histogram", "kol": "Fuktighet", "filnavn": "fukt.png"},
+            {"type": "korrelasjonsmatrise"},
+        ]
+        self.assertEqual(len(specs), 6)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for arbeidere in (None, 2):
+                stier = viz.render_batch(specs, arbeidere=arbeidere, bildemappe=tmpdir)
+                self.assertEqual(len(stier), 6)
+                self.assertTrue(all(os.path.getsize(sti) > 0 for sti in stier))
+            self.assertEqual(os.path.basename(stier[0]), "tidsserie_Temperatur_Oslo.png")
+            self.assertEqual(os.path.basename(stier[4]), "fukt.png")
+            blindern = DataVisualisering(self.df.assign(Lokasjon="Oslo/Blindern"))
+            sti, = blindern.render_batch(blindern.specs_per_gruppe("histogram", ["Temperatur"]), bildemappe=tmpdir)
+            self.assertEqual(os.path.basename(sti), "histogram_Temperatur_Oslo%2FBlindern.png")
+            self.assertTrue(os.path.isfile(sti))
+            trender = [{"type": "trend", "kol": "Temperatur", "vindu": vindu} for vindu in (2, 3)]
+            stier = viz.render_batch(trender, bildemappe=tmpdir)
+            self.assertNotEqual(stier[0], stier[1])
+            self.assertTrue(os.path.basename(stier[0]).startswith("trend_Temperatur_"))
+        with self.assertRaises(ValueError):
+            viz.render_batch([{"type": "ukjent"}])
+
+    def test_figurcache_hopper_over_uendrede(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            viz = DataVisualisering(self.df, cache=FigurCache(tmpdir))
+            viz.plott_histogram("Temperatur")
+            sti = os.path.join(tmpdir, "histogram_Temperatur.png")
+            os.utime(sti, (0, 0))
+            with patch.object(DataVisualisering, "lagre_plot", wraps=DataVisualisering.lagre_plot) as mock_lagre:
+                viz.plott_histogram("Temperatur")
+                viz.plott_histogram("Trykk")
+            self.assertEqual(mock_lagre.call_count, 1)
+
+            endret = DataVisualisering(self.df.assign(Temperatur=self.df["Temperatur"] + 1), cache=FigurCache(tmpdir))
+            endret.plott_histogram("Temperatur")
+            self.assertGreater(os.path.getmtime(sti), 0)
+
+            specs = [{"type": "tidsserie", "kol": kol} for kol in ("Temperatur", "Trykk", "Fuktighet")]
+            cache = FigurCache(tmpdir, maks_filer=2)
+            viz = DataVisualisering(self.df, cache=cache)
+            stier = viz.render_batch(specs)
+            self.assertEqual(len(stier), 3)
+            self.assertEqual(sorted(cache.manifest), ["tidsserie_Fuktighet.png", "tidsserie_Trykk.png"])
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, "histogram_Temperatur.png")))
+            with patch("src.data_vizualisation._render_spec") as mock_render:
+                viz.render_batch(specs[1:])
+            mock_render.assert_not_called()
+            with tempfile.TemporaryDirectory() as annen:
+                with self.assertRaises(ValueError):
+                    viz.render_batch(specs, bildemappe=annen)
+                self.assertEqual(os.listdir(annen), [])
+            self.assertEqual(viz.render_batch(specs[:1], bildemappe=tmpdir + os.sep), stier[:1])
+
+    def test_figurcache_filnavn_uten_endelse(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = FigurCache(tmpdir)
+            viz = DataVisualisering(self.df, cache=cache)
+            viz.plott_tidserie("Temperatur", filnavn="temp")
+            self.assertIn("temp.png", cache.manifest)
+            with patch.object(cache, "_skriv_manifest") as mock_skriv:
+                self.assertTrue(cache.er_fersk("temp", cache.manifest["temp.png"]["nøkkel"]))
+                mock_skriv.assert_not_called()
+                viz.plott_tidserie("Temperatur", filnavn="temp")
+                mock_skriv.assert_called_once()
+
+    def test_nedsample_beholder_ytterpunkter(self):
+        serie = pd.Series([float(i % 7) for i in range(1000)], index=pd.date_range("2024-01-01", periods=1000, freq="h"))
+        serie.iloc[500] = 100.0
+        for metode in ("lttb", "minmaks"):
+            utvalg = nedsample(serie, 50, metode)
+            self.assertLessEqual(len(utvalg), 50)
+            self.assertEqual(utvalg.max(), 100.0)
+            self.assertTrue(utvalg.index.is_monotonic_increasing)
+        self.assertIs(nedsample(serie, None), serie)
+        with self.assertRaises(ValueError):
+            nedsample(serie, 50, "ukjent")
+        fig = self.viz.plott_tidserie("Temperatur", save=False, maks_punkter=3)
+        self.assertEqual(len(fig.axes[0].lines[0].get_xdata()), 3)
+
+    def test_pairplot_og_jointplot_store_data(self):
+        stor = pd.DataFrame({
+            "Temperatur": [float(i % 17) for i in range(3000)],
+            "Trykk": [float(i % 11) for i in range(3000)],
+            "Lokasjon": ["Oslo"] * 2900 + ["Bergen"] * 100,
+        })
+        utvalg = stratifisert_utvalg(stor, 300, lag="Lokasjon")
+        self.assertEqual(utvalg["Lokasjon"].value_counts().to_dict(), {"Oslo": 290, "Bergen": 10})
+        liten = pd.DataFrame({"Lokasjon": ["A"] * 100_000 + ["B"] * 3, "Temperatur": 1.0})
+        self.assertEqual(stratifisert_utvalg(liten, 1000, lag="Lokasjon")["Lokasjon"].value_counts().to_dict(),
+                         {"A": 1000, "B": 1})
+        viz = DataVisualisering(stor)
+        with patch("matplotlib.pyplot.show"), patch("seaborn.pairplot") as mock_pairplot:
+            viz.plott_pairplot(hue="Lokasjon", save=False, maks_rader=1000)
+            viz.plott_jointplot("Temperatur", "Trykk", hue="Lokasjon", save=False, maks_rader=1000)
+        mock_pairplot.assert_not_called()
+        with patch("matplotlib.pyplot.show"), patch("seaborn.jointplot") as mock_jointplot:
+            viz.plott_jointplot("Temperatur", "Trykk", save=False, modus="utvalg", maks_rader=500)
+        self.assertEqual(len(mock_jointplot.call_args.kwargs["data"]), 500)
+        with self.assertRaises(ValueError):
+            viz.plott_pairplot(save=False, modus="ukjent")
+    def test_interaktiv_plot_trend_blitting(self):
+        df = pd.DataFrame({"Temperatur": [float(i % 9) for i in range(500)]},
+                          index=pd.date_range("2024-01-01", periods=500, freq="h"))
+        visning = DataVisualisering(df).interaktiv_plot_trend("Temperatur", maks_punkter=100, vis=False)
+        self.assertLessEqual(len(visning.posisjoner), 100)
+        self.assertEqual(visning.trender.shape, (30, len(visning.posisjoner)))
+        visning.fig.canvas.draw()
+        with patch.object(visning.fig.canvas, "draw_idle") as mock_draw, \
+                patch.object(visning.fig.canvas, "blit") as mock_blit:
+            visning.vis_vindu(12)
+        mock_draw.assert_not_called()
+        mock_blit.assert_called_once()
+        forventet = df["Temperatur"].rolling(12, min_periods=1).mean().to_numpy()[visning.posisjoner]
+        pd.testing.assert_series_equal(pd.Series(visning.trend_linje.get_ydata()), pd.Series(forventet))
+
+        visning.vindu_slider.set_val(5)
+        visning.vindu_slider.set_val(20)
+        visning.område_slider.set_val((100, 199))
+        visning._utfør_ventende()
+        self.assertEqual((visning.posisjoner.min(), visning.posisjoner.max()), (100, 199))
+        self.assertEqual(visning._vindu, 20)
+        plt.close(visning.fig)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,8 +1,16 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import formatdate
 import pandas as pd
-from src.fetch_data import FetchData
+from src.fetch_data import FetchData, _RateBegrenser
+from src.data_cleaning import DataRensing
 
 class TestFetchData(unittest.TestCase):
     def setUp(self):
@@ -20,25 +28,36 @@ class TestFetchData(unittest.TestCase):
                     with self.assertRaises(ValueError):
                         FetchData()
 
-    @patch("src.fetch_data.requests.get")
-    def test_hent_data_success(self, mock_get):
+    def test_hent_data_success(self):
         mock_response = MagicMock()
         mock_response.json.return_value = {"key": "value"}
         mock_response.raise_for_status.return_value = None
-        mock_get.return_value = mock_response
 
-        data = self.fetcher.hent_data(endpoint="compact", params={"lat": 63.4})
+        with patch.object(self.fetcher.session, "get", return_value=mock_response) as mock_get:
+            data = self.fetcher.hent_data(endpoint="compact", params={"lat": 63.4})
         self.assertEqual(data, {"key": "value"})
         mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["timeout"], self.fetcher.timeout)
 
-    @patch("src.fetch_data.requests.get")
-    def test_hent_data_http_error(self, mock_get):
+    def test_hent_data_http_error(self):
         mock_response = MagicMock()
         mock_response.raise_for_status.side_effect = Exception("404 error")
-        mock_get.return_value = mock_response
 
-        with self.assertRaises(Exception):
-            self.fetcher.hent_data("compact", {"lat": 63.4})
+        with patch.object(self.fetcher.session, "get", return_value=mock_response):
+            with self.assertRaises(Exception):
+                self.fetcher.hent_data("compact", {"lat": 63.4})
+
+    def test_session_headers_og_pool(self):
+        self.assertEqual(self.fetcher.session.headers["User-Agent"], self.user_agent)
+        adapter = self.fetcher.session.get_adapter(self.base_url)
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+
+    def test_latens_statistikk_tom(self):
+        stats = self.fetcher.latens_statistikk()
+        self.assertEqual(stats["antall"], 0)
+        self.assertIsNone(stats["snitt_ms"])
+        self.assertEqual(self.fetcher._latenser.maxlen, FetchData.MAKS_LATENSER)
 
     def test_flat_ut_success(self):
         nested_json = {
@@ -53,6 +72,46 @@ class TestFetchData(unittest.TestCase):
         self.assertIsInstance(df, pd.DataFrame)
         self.assertIn("time", df.columns)
 
+    def test_flat_ut_timeseries_dtyper(self):
+        timeseries = [
+            {"time": "2023-01-01T00:00:00Z", "data": {
+                "instant": {"details": {"air_temperature": 4.5, "wind_speed": 2.0}},
+                "next_1_hours": {"summary": {"symbol_code": "cloudy"}, "details": {"precipitation_amount": 0.1}}}},
+            {"time": "2023-01-01T01:00:00Z", "data": {
+                "instant": {"details": {"air_temperature": 2.1}},
+                "next_1_hours": {"summary": {"symbol_code": "rain"}, "details": {}}}},
+            {"time": "2023-01-01T02:00:00Z", "data": {
+                "instant": {"details": {"air_temperature": 1.0}}}}
+        ]
+        df = self.fetcher.flat_ut_timeseries(timeseries)
+        self.assertEqual(str(df["time"].dtype), "datetime64[ns, UTC]")
+        self.assertEqual(df["data_instant_details_air_temperature"].dtype, "float64")
+        self.assertEqual(df["data_next_1_hours_summary_symbol_code"].dtype, "category")
+        self.assertEqual(df["data_next_1_hours_summary_symbol_code"].tolist()[:2], ["cloudy", "rain"])
+        self.assertTrue(pd.isna(df["data_next_1_hours_summary_symbol_code"].iloc[2]))
+        self.assertTrue(pd.isna(df["data_instant_details_wind_speed"].iloc[1]))
+
+    def test_flat_ut_timeseries_kompakt_rundtur(self):
+        timeseries = [{"time": "2023-01-01T00:00:00Z", "data": {"instant": {"details": {
+            "air_temperature": 5.3, "relative_humidity": 81.4,
+            "air_pressure_at_sea_level": 1013.2, "wind_speed": 3.1}}}}]
+        kompakt = FetchData(base_url=self.base_url, user_agent=self.user_agent, kompakt=True)
+        for fetcher, dtype in ((self.fetcher, "float64"), (kompakt, "float32")):
+            rå = fetcher.flat_ut_timeseries(timeseries)
+            self.assertEqual(rå["data_instant_details_air_temperature"].dtype, dtype)
+            df = DataRensing(rå).bygg_renset_dataframe()
+            self.assertEqual(df["Temperatur"].iloc[0], 5.3)
+            self.assertEqual(df["Trykk"].iloc[0], 1013.2)
+
+    def test_flat_ut_timeseries_samme_kolonner_som_json_normalize(self):
+        timeseries = [
+            {"time": "2023-01-01T00:00:00Z", "data": {
+                "instant": {"details": {"air_pressure_at_sea_level": 1013.2, "air_temperature": 4.5}},
+                "next_6_hours": {"summary": {"symbol_code": "fair_day"}, "details": {"precipitation_amount": 0.0}}}}
+        ]
+        df = self.fetcher.flat_ut_timeseries(timeseries)
+        self.assertEqual(df.columns.tolist(), pd.json_normalize(timeseries, sep="_").columns.tolist())
+
     def test_flat_ut_missing_key(self):
         with self.assertRaises(KeyError):
             self.fetcher.flat_ut({}, "properties.timeseries")
@@ -68,6 +127,61 @@ class TestFetchData(unittest.TestCase):
         self.assertIsInstance(df, pd.DataFrame)
         self.assertIn("time", df.columns)
 
+    @patch.object(FetchData, "hent_data")
+    def test_hent_forecasts_samler_lokasjoner(self, mock_hent_data):
+        mock_hent_data.side_effect = lambda endpoint, params: {
+            "properties": {
+                "timeseries": [
+                    {"time": "2023-01-01", "data": {"instant": {"details": {"air_temperature": params["lat"]}}}},
+                    {"time": "2023-01-02", "data": {"instant": {"details": {"air_temperature": params["lat"]}}}}
+                ]
+            }
+        }
+        locations = {"Trondheim": (63.4295, 10.3951), "Oslo": (59.9139, 10.7522), "Bergen": (60.3913, 5.3221)}
+        df = self.fetcher.hent_forecasts(locations, max_concurrency=3, maks_per_sekund=None)
+        self.assertEqual(len(df), 6)
+        self.assertEqual(df.columns[0], "lokasjon")
+        self.assertEqual(df["lokasjon"].unique().tolist(), ["Trondheim", "Oslo", "Bergen"])
+        self.assertEqual(mock_hent_data.call_count, 3)
+
+    @patch.object(FetchData, "hent_data")
+    def test_hent_forecasts_beholder_category(self, mock_hent_data):
+        mock_hent_data.side_effect = lambda endpoint, params: {
+            "properties": {
+                "timeseries": [
+                    {"time": "2023-01-01T00:00:00Z", "data": {
+                        "next_1_hours": {"summary": {"symbol_code": "rain" if params["lat"] > 60 else "fair_day"}}}}
+                ]
+            }
+        }
+        df = self.fetcher.hent_forecasts({"Trondheim": (63.4, 10.4), "Oslo": (59.9, 10.7)},
+                                         maks_per_sekund=None)
+        kol = df["data_next_1_hours_summary_symbol_code"]
+        self.assertEqual(kol.dtype, "category")
+        self.assertEqual(sorted(kol.tolist()), ["fair_day", "rain"])
+
+    @patch.object(FetchData, "hent_forecast")
+    def test_hent_forecasts_ignorer_feil(self, mock_forecast):
+        def svar(lat, lon, endpoint, stream=False):
+            if lat > 62:
+                raise ValueError("feil")
+            return pd.DataFrame({"time": ["2023-01-01"]})
+        mock_forecast.side_effect = svar
+        df = self.fetcher.hent_forecasts([(63.4, 10.4), (59.9, 10.7)], ignorer_feil=True)
+        self.assertEqual(df["lokasjon"].tolist(), ["59.9,10.7"])
+        self.assertIn("63.4,10.4", self.fetcher.siste_feil)
+
+    def test_hent_forecasts_tom(self):
+        with self.assertRaises(ValueError):
+            self.fetcher.hent_forecasts([])
+
+    def test_rate_begrenser(self):
+        begrenser = _RateBegrenser(maks_per_sekund=50)
+        start = time.monotonic()
+        for _ in range(5):
+            begrenser.vent()
+        self.assertGreaterEqual(time.monotonic() - start, 0.07)
+
     @patch.object(FetchData, "hent_trondheim_forecast")
     def test_lagre_trondheim_forecast(self, mock_forecast):
         test_df = pd.DataFrame({"time": ["2023-01-01"], "temp": [5]})
@@ -84,6 +198,123 @@ class TestFetchData(unittest.TestCase):
         # fjern filen etter test
         os.remove(filsti)
 
+class _MetStandIn(BaseHTTPRequestHandler):
+    """
+    Lokal erstatning for MET.no som teller kall og svarer 304 ved If-Modified-Since.
+    """
+    LAST_MODIFIED = "Tue, 27 May 2025 02:00:00 GMT"
+    expires_om = 3600
+    feil_først = 0
+    kall = []
+
+    def do_GET(self):
+        type(self).kall.append(self.headers.get("If-Modified-Since"))
+        if type(self).feil_først > 0:
+            type(self).feil_først -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-Modified-Since") == self.LAST_MODIFIED:
+            self.send_response(304)
+            self.send_header("Expires", formatdate(usegmt=True))
+            self.end_headers()
+            return
+        timeseries = [
+            {"time": f"2025-05-27T0{i}:00:00Z", "data": {
+                "instant": {"details": {"air_temperature": 5.0 + i}},
+                "next_1_hours": {"summary": {"symbol_code": ["cloudy", "rain"][i % 2]}}}}
+            for i in range(5)
+        ]
+        body = json.dumps({"type": "Feature", "properties": {"meta": {"updated_at": "2025-05-27T01:45:00Z"}, "timeseries": timeseries}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", self.LAST_MODIFIED)
+        self.send_header("Expires", formatdate(usegmt=True, timeval=time.time() + self.expires_om))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFetchDataCache(unittest.TestCase):
+    def setUp(self):
+        _MetStandIn.kall = []
+        _MetStandIn.expires_om = 3600
+        _MetStandIn.feil_først = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _MetStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache_dir = tempfile.mkdtemp()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.fetcher = FetchData(base_url=base_url, user_agent="test-agent", cache_dir=self.cache_dir, backoff=0)
+
+    def tearDown(self):
+        self.fetcher.lukk()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_fersk_cache_uten_nettverk(self):
+        første = self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        andre = self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        self.assertEqual(første, andre)
+        self.assertEqual(len(_MetStandIn.kall), 1)
+
+    def test_utgått_cache_revalideres(self):
+        _MetStandIn.expires_om = -60
+        første = self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        andre = self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        self.assertEqual(første, andre)
+        self.assertEqual(_MetStandIn.kall, [None, _MetStandIn.LAST_MODIFIED])
+
+    def test_ulike_params_gir_ulike_oppføringer(self):
+        self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        self.fetcher.hent_data("compact", {"lat": 60.0, "lon": 10.4})
+        self.assertEqual(len(_MetStandIn.kall), 2)
+
+    def test_nytt_forsøk_ved_503(self):
+        _MetStandIn.feil_først = 2
+        data = self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        self.assertIn("properties", data)
+        self.assertEqual(len(_MetStandIn.kall), 3)
+
+    def test_strøm_timeseries_chunks(self):
+        chunks = list(self.fetcher.strøm_timeseries("compact", {"lat": 63.4, "lon": 10.4}, chunk_størrelse=2))
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+        df = FetchData.slå_sammen_chunks(chunks)
+        self.assertEqual(df["data_instant_details_air_temperature"].tolist(), [5.0, 6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(df["data_next_1_hours_summary_symbol_code"].dtype, "category")
+
+    def test_strøm_timeseries_bruker_cache(self):
+        første = self.fetcher.hent_forecast(63.4, 10.4, stream=True)
+        andre = self.fetcher.hent_forecast(63.4, 10.4, stream=True)
+        ikke_strøm = self.fetcher.hent_forecast(63.4, 10.4)
+        pd.testing.assert_frame_equal(første, andre)
+        pd.testing.assert_frame_equal(første, ikke_strøm)
+        self.assertEqual(første["utstedt"].iloc[0], pd.Timestamp("2025-05-27T01:45:00Z"))
+        self.assertEqual(len(_MetStandIn.kall), 1)
+
+    def test_strøm_timeseries_uten_cache(self):
+        fetcher = FetchData(base_url=self.fetcher.base_url, user_agent="test-agent")
+        df = fetcher.hent_forecast(63.4, 10.4, stream=True)
+        fetcher.lukk()
+        self.assertEqual(len(df), 5)
+
+    def test_strøm_timeseries_ugyldig_chunk(self):
+        with self.assertRaises(ValueError):
+            list(self.fetcher.strøm_timeseries("compact", {}, chunk_størrelse=0))
+
+    def test_latens_statistikk(self):
+        self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        self.fetcher.hent_data("compact", {"lat": 63.4, "lon": 10.4})
+        stats = self.fetcher.latens_statistikk()
+        self.assertEqual(stats["antall"], 1)
+        self.assertGreater(stats["maks_ms"], 0)
+
+
 if __name__ == "__main__":
     unittest.main()
 